@@ -1,7 +1,8 @@
 import os
 from langchain.tools import tool
-import os, requests, re
+import os, re
 import json
+import http_client
 
 class UnsplashAPITool:
     
@@ -15,7 +16,7 @@ class UnsplashAPITool:
             'X-API-KEY': os.environ['SERPER_API_KEY'],
             'content-type': 'application/json'
         }
-        response = requests.request("POST", url, headers=headers, data=payload)
+        response = http_client.session.post(url, headers=headers, data=payload)
         image_url = response.data[0].url
         words = query.split()[:5] 
         safe_words = [re.sub(r'[^a-zA-Z0-9_]', '', word) for word in words]  
@@ -23,7 +24,7 @@ class UnsplashAPITool:
         filepath = os.path.join(os.getcwd(), filename)
 
     # Download the image from the URL
-        image_response = requests.get(image_url)
+        image_response = http_client.session.get(image_url)
         if image_response.status_code == 200:
             with open(filepath, 'wb') as file:
              file.write(image_response.content)
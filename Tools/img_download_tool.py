@@ -1,5 +1,5 @@
-import requests
 from langchain.tools import tool
+import http_client
 from io import BytesIO
 
 class ImageDownloadTool:
@@ -9,7 +9,7 @@ class ImageDownloadTool:
         try:
             downloaded_images = []
             for url in image_urls:
-                response = requests.get(url, stream=True)
+                response = http_client.session.get(url, stream=True)
                 if response.status_code == 200:
                     image_data = BytesIO(response.content)
                     downloaded_images.append(image_data)
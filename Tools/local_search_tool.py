@@ -0,0 +1,37 @@
+import os
+
+from langchain.tools import tool
+
+import telemetry
+from search_results import format_results
+from Tools.search_tool import local_index, search_with_pages
+
+# Stored passages must match at least this share of the query's terms to count as an answer,
+# and at least LOCAL_SEARCH_MIN_HITS of them must, or the search goes to the internet instead
+LOCAL_SEARCH_MIN_COVERAGE = float(os.environ.get("LOCAL_SEARCH_MIN_COVERAGE", 0.75))
+LOCAL_SEARCH_MIN_HITS = int(os.environ.get("LOCAL_SEARCH_MIN_HITS", 2))
+LOCAL_SEARCH_RESULTS = 5
+
+
+class LocalSearchTools():
+
+    @tool("Search previous research")
+    def search_previous_research(query):
+        """Useful to look a topic up in the sources gathered for earlier notes.
+        Answers instantly from local data and searches the internet when nothing
+        relevant has been stored yet, so prefer it over searching the internet."""
+        try:
+            return search_local_first(query)
+        except LookupError:
+            return "Sorry, I couldn't find anything about that, there could be an error with you serper api key."
+
+
+def search_local_first(query):
+    """Stored passages relevant to the query in the search tool's format, else a live search_with_pages()."""
+    with telemetry.span("local_search") as fields:
+        hits = [hit for hit in local_index.search(query, limit=LOCAL_SEARCH_RESULTS)
+                if hit["coverage"] >= LOCAL_SEARCH_MIN_COVERAGE]
+        fields["hits"] = len(hits)
+    if len(hits) < LOCAL_SEARCH_MIN_HITS:
+        return search_with_pages(query)
+    return format_results((hit['title'], hit['url'], hit['text']) for hit in hits)
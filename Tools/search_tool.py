@@ -1,9 +1,24 @@
 import json
 import os
 
-import requests
 from langchain.tools import tool
 
+import http_client
+from local_index import LocalIndex
+from page_cache import PageCache, chunk_text
+from search_cache import SearchCache
+from search_results import format_results
+
+# Process-wide memo of Serper results, shared by every crew run
+search_cache = SearchCache()
+# Extracted text of the result pages, kept on disk across runs
+page_cache = PageCache()
+# Every snippet and page passage fetched so far, searchable offline (see Tools/local_search_tool.py)
+local_index = LocalIndex()
+
+# How many of the top results have their pages fetched for extracts (0 returns snippets only)
+PAGE_FETCH_RESULTS = int(os.environ.get("PAGE_FETCH_RESULTS", 3))
+
 
 class SearchTools():
 
@@ -17,27 +32,55 @@ class SearchTools():
     def search_internet(query):
         """Useful to search the internet
         about a a given topic and return relevant results"""
-        top_result_to_return = 4
-        url = "https://google.serper.dev/search"
-        payload = json.dumps({"q": query})
-        headers = {
-            'X-API-KEY': os.environ['SERPER_API_KEY'],
-            'content-type': 'application/json'
-        }
-        response = requests.request("POST", url, headers=headers, data=payload)
-        # check if there is an organic key
-        if 'organic' not in response.json():
+        # Repeated and concurrent identical queries share one Serper request
+        try:
+            return search_with_pages(query)
+        except LookupError:
             return "Sorry, I couldn't find anything about that, there could be an error with you serper api key."
-        else:
-            results = response.json()['organic']
-            string = []
-            for result in results[:top_result_to_return]:
-                try:
-                    string.append('\n'.join([
-                        f"Title: {result['title']}", f"Link: {result['link']}",
-                        f"Snippet: {result['snippet']}", "\n-----------------"
-                    ]))
-                except KeyError:
-                    next
-
-            return '\n'.join(string)
\ No newline at end of file
+
+
+def search_with_pages(query):
+    """Top Serper results plus the passages of their pages most relevant to the query (cached)."""
+    return search_cache.get_or_fetch(query, _search_and_extract)
+
+
+def _search_and_extract(query):
+    found = _serper_search(query)
+    results = format_results(found)
+    pages = page_cache.fetch_pages([link for _, link, _ in found[:PAGE_FETCH_RESULTS]])
+    local_index.add([(link, title, snippet) for title, link, snippet in found] +
+                    [(page["url"], page["title"], chunk) for page in pages for chunk in chunk_text(page["text"])])
+    extracts = page_cache.relevant_chunks(query, pages)
+    if not extracts:
+        return results
+    passages = [f"Source: {f'{title} ({url})' if title else url}\n{chunk}" for url, title, chunk in extracts]
+    return results + "\n\nRelevant passages from these pages:\n\n" + "\n\n".join(passages)
+
+
+def _serper_search(query):
+    """Top Serper results for query as (title, link, snippet); raises LookupError (never cached) when there are none."""
+    top_result_to_return = 4
+    url = "https://google.serper.dev/search"
+    payload = json.dumps({"q": query})
+    headers = {
+        'X-API-KEY': os.environ['SERPER_API_KEY'],
+        'content-type': 'application/json'
+    }
+    # Shared session: keep-alive, timeout and retries on 429/5xx
+    response = http_client.session.post(url, headers=headers, data=payload)
+    try:
+        data = response.json()
+    except ValueError:
+        data = {}
+    # check if there is an organic key
+    if 'organic' not in data:
+        raise LookupError(f"No organic results for '{query}'")
+    results = data['organic']
+    found = []
+    for result in results[:top_result_to_return]:
+        try:
+            found.append((result['title'], result['link'], result['snippet']))
+        except KeyError:
+            next
+
+    return found
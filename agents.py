@@ -5,18 +5,44 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 import os
 from Tools.pdf_gen_tool import PDFCreationTool
 from Tools.search_tool import SearchTools
+from Tools.local_search_tool import LocalSearchTools
 from Tools.text_splitter_tool import TextSplitterTool
 from Tools.image_URL_extractor_tool import UnsplashAPITool
 from Tools.json_formatter_tool import JsonFormatterTool
 import asyncio
+import functools
+import logging
+import threading
+import uuid
+import replay
+import telemetry
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-class CustomAgents:
-    def __init__(self):
-        self.llm = None # Initialize as None
+logger = logging.getLogger(__name__)
+
+
+class LLMPool:
+    """Process-wide Gemini clients, created once and shared by every request.
+
+    Building a ChatGoogleGenerativeAI sets up sync and async gRPC services (and needs an
+    event loop on the calling thread), so doing it per request is wasted work. The pool
+    builds LLM_POOL_SIZE clients lazily and hands them out round-robin; per-request state
+    such as callbacks lives on a shallow copy that shares the underlying client.
+    """
+
+    def __init__(self, size=None):
+        self.size = size or int(os.environ.get("LLM_POOL_SIZE", 2))
+        self._clients = []
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def _create_client(self, callbacks=None):
+        if replay.mode() == "replay":
+            # Answers come from recorded fixtures; no Gemini client or API key needed
+            return replay.RecordReplayChatModel(callbacks=callbacks)
         try:
             # Ensure an event loop exists for LLM initialization
             try:
@@ -31,23 +57,105 @@ class CustomAgents:
                  raise ValueError("GOOGLE_API_KEY environment variable not set.")
 
             # Now initialize the LLM within the context of an available loop
-            self.llm = ChatGoogleGenerativeAI(
+            if replay.mode() == "record":
+                llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0.5, google_api_key=google_api_key)
+                return replay.RecordReplayChatModel(inner=llm, callbacks=callbacks)
+            return ChatGoogleGenerativeAI(
                  model="gemini-1.5-flash",
                  verbose=True,
                  temperature=0.5,
                  google_api_key=google_api_key,
+                 callbacks=callbacks,
             )
         except Exception as e:
-             # Log or print the error if helpful
-             print(f"Error during CustomAgents initialization: {e}")
+             logger.error(f"Error during Gemini client initialization: {e}")
              raise Exception(f"Failed to initialize Gemini or agents: {str(e)}")
- 
+
+    def acquire(self, callbacks=None):
+        """Returns a pooled client, or a copy of one carrying this request's callbacks."""
+        with self._lock:
+            if len(self._clients) < self.size:
+                self._clients.append(self._create_client())
+                logger.info(f"Created Gemini client {len(self._clients)}/{self.size}.")
+            client = self._clients[self._next % len(self._clients)]
+            self._next += 1
+        if callbacks:
+            # construct() skips validation, so the copy reuses the client's gRPC services.
+            # (copy(update=...) would drop unset fields such as tags and metadata.)
+            return type(client).construct(**dict(client.__dict__, callbacks=callbacks))
+        return client
+
+
+llm_pool = LLMPool()
+
+# Agents built once per process, keyed by CustomAgents method name
+_agent_templates = {}
+_agent_templates_lock = threading.Lock()
+
+
+def _pooled_agent(build):
+    """Builds the agent once and returns a per-request copy of it on every later call.
+
+    A crewAI Agent carries per-run state (its executor, memory and tools handler), so
+    requests never share one: each gets a shallow copy bound to its own LLM, and the Crew
+    it joins builds that copy a fresh executor. Only the validated template is reused.
+    """
+    @functools.wraps(build)
+    def checkout(self):
+        if not self.share:
+            agent = build(self)
+        else:
+            template = _agent_templates.get(build.__name__)
+            if template is None:
+                with _agent_templates_lock:
+                    if build.__name__ not in _agent_templates:
+                        _agent_templates[build.__name__] = build(CustomAgents(llm=llm_pool.acquire()))
+                    template = _agent_templates[build.__name__]
+            agent = template.model_copy(update={"id": uuid.uuid4(), "llm": self.llm})
+        tools = [telemetry.instrument_tool(tool) for tool in agent.tools]
+        if self.budget is not None:
+            # Charge this request's tool calls against its budget (see budget.RequestBudget)
+            tools = [self.budget.wrap_tool(tool) for tool in tools]
+        agent.tools = tools
+        return agent
+    return checkout
+
+
+def warm_up_agents():
+    """Creates the pooled clients and every agent template ahead of the first request."""
+    agents = CustomAgents()
+    for name in ("note_generation_agent", "data_agent", "image_agent", "Structure_agent"):
+        getattr(agents, name)()
+    for _ in range(llm_pool.size - 1):
+        llm_pool.acquire()
+    logger.info(f"Warmed up {len(_agent_templates)} agents and {llm_pool.size} Gemini clients.")
+
+
+class CustomAgents:
+    def __init__(self, callbacks=None, llm=None, share=None, budget=None):
+        if share is None:
+            share = os.environ.get("AGENT_POOL", "1") != "0"
+        self.share = share
+        self.budget = budget
+        callbacks = list(callbacks or []) + [telemetry.LLMSpanHandler()]
+        if budget is not None:
+            callbacks.append(budget)
+        if llm is not None:
+            self.llm = llm
+        elif share:
+            self.llm = llm_pool.acquire(callbacks)
+        else:
+            # Unpooled: a dedicated client per instance, as before the pool existed
+            self.llm = llm_pool._create_client(callbacks)
+
+    @_pooled_agent
     def note_generation_agent(self):
         tools = [
             #MathEnvironmentTool.render_math,
             #PDFCreationTool.create_pdf,
             #WikipediaSearchTool.search_wikipedia,
             #TextSplitterTool.split_text,
+            LocalSearchTools.search_previous_research,
             SearchTools.search_internet,
             SearchTools.search_browser
         ]
@@ -61,9 +169,11 @@ class CustomAgents:
             llm=self.llm,
         )
  
+    @_pooled_agent
     def data_agent(self):
         tools = [
              #WikipediaSearchTool.search_wikipedia,
+             LocalSearchTools.search_previous_research,
              SearchTools.search_internet,
              #TextSplitterTool.split_text,
              SearchTools.search_browser
@@ -78,6 +188,7 @@ class CustomAgents:
             llm=self.llm,
         )
  
+    @_pooled_agent
     def image_agent(self):
         tools = [
  
@@ -93,6 +204,7 @@ class CustomAgents:
             llm=self.llm,
         )
  
+    @_pooled_agent
     def Structure_agent(self):
         tools = [
  
@@ -110,6 +222,7 @@ class CustomAgents:
             llm=self.llm,
         )
  
+    @_pooled_agent
     def pdf_agent(self):
         tools = [
             PDFCreationTool.create_pdf,
@@ -0,0 +1,133 @@
+import logging
+import os
+import threading
+import time
+import uuid
+
+from jobs import FAILED, RUNNING, SUCCEEDED
+from result_cache import normalize_topic
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_FORMATS = ("pdf", "zip")
+
+
+class Batch:
+    """A set of note jobs that finish as one combined download.
+
+    Each distinct (topic, preference) item is an ordinary job on the shared JobQueue, so
+    batch items compete for the same MAX_CONCURRENT_JOBS workers as single requests and
+    share the search, image and result caches. Items that normalise to the same topic
+    share one job. When the last job finishes, finalize(batch) builds the combined output
+    on that job's worker thread and returns its URL path.
+    """
+
+    def __init__(self, items, output, finalize):
+        self.id = uuid.uuid4().hex
+        self.items = [{"topic": topic, "preference": preference} for topic, preference in items]
+        self.output = output
+        self.status = RUNNING
+        self.output_path = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._finalize = finalize
+        self._remaining = 0
+        self._lock = threading.Lock()
+
+    def unique_items(self):
+        """Distinct (topic, preference) pairs, in first-seen order, with the item indexes they cover."""
+        unique = {}
+        for index, item in enumerate(self.items):
+            key = (normalize_topic(item["topic"]), normalize_topic(item["preference"]))
+            unique.setdefault(key, (item["topic"], item["preference"], []))[2].append(index)
+        return list(unique.values())
+
+    def attach(self, jobs_by_item):
+        """Links the queued jobs (one per unique item, same order) and starts watching them."""
+        groups = self.unique_items()
+        self._remaining = len(groups)
+        for (_, _, indexes), job in zip(groups, jobs_by_item):
+            for index in indexes:
+                self.items[index]["job"] = job
+        for job in jobs_by_item:
+            job.add_done_callback(self._item_done)
+
+    def _item_done(self, job):
+        with self._lock:
+            self._remaining -= 1
+            if self._remaining:
+                return
+        if all(item["job"].status == FAILED for item in self.items):
+            self.error = "Every item in the batch failed."
+            self.status = FAILED
+        else:
+            try:
+                self.output_path = self._finalize(self)
+                self.status = SUCCEEDED
+            except Exception as e:
+                logger.error(f"Could not assemble batch {self.id}: {e}", exc_info=True)
+                self.error = str(e)
+                self.status = FAILED
+        self.finished_at = time.time()
+        logger.info(f"Batch {self.id} finished: {self.status}")
+
+    @property
+    def done(self):
+        return self.status in (SUCCEEDED, FAILED)
+
+    def to_dict(self):
+        items = []
+        for item in self.items:
+            job = item["job"]
+            entry = {"topic": item["topic"], "preference": item["preference"], "job_id": job.id, "status": job.status}
+            if job.status == SUCCEEDED:
+                entry["pdf_path"] = job.result["pdf_path"]
+                entry["cached"] = job.result["cached"]
+                entry["degraded"] = job.result["degraded"]
+            elif job.status == FAILED:
+                entry["error"] = job.error
+            items.append(entry)
+        data = {
+            "batch_id": self.id,
+            "status": self.status,
+            "output": self.output,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "completed": sum(1 for item in self.items if item["job"].done),
+            "total": len(self.items),
+            "items": items,
+        }
+        if self.status == SUCCEEDED:
+            data["output_path"] = self.output_path
+        elif self.status == FAILED:
+            data["error"] = self.error
+        return data
+
+
+class BatchRegistry:
+    """Keeps batches for BATCH_RETENTION_SECONDS after they finish, like JobQueue does for jobs.
+
+    A batch's jobs are queued all or none, so with `max_jobs` (the queue's max_pending) the
+    item limit never exceeds what the job queue could accept even when idle.
+    """
+
+    def __init__(self, max_items=None, retention_seconds=None, max_jobs=None):
+        self.max_items = max_items or int(os.environ.get("BATCH_MAX_ITEMS", 30))
+        if max_jobs is not None:
+            self.max_items = min(self.max_items, max_jobs)
+        self.retention_seconds = retention_seconds or int(os.environ.get("JOB_RETENTION_SECONDS", 3600))
+        self._batches = {}
+        self._lock = threading.Lock()
+
+    def add(self, batch):
+        with self._lock:
+            cutoff = time.time() - self.retention_seconds
+            for batch_id in [b.id for b in self._batches.values() if b.done and b.finished_at < cutoff]:
+                del self._batches[batch_id]
+            self._batches[batch.id] = batch
+        return batch
+
+    def get(self, batch_id):
+        with self._lock:
+            return self._batches.get(batch_id)
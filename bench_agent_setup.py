@@ -0,0 +1,72 @@
+"""Measures per-request crew setup cost with and without the shared LLM pool and agent registry.
+
+Builds what CustomCrew.run builds before kickoff (LLM, agents, tasks, Crew) without calling
+Gemini, so any GOOGLE_API_KEY value works.
+Usage: python bench_agent_setup.py [--runs 50] [--mode full]
+"""
+import argparse
+import gc
+import logging
+import os
+import statistics
+import time
+import tracemalloc
+
+os.environ.setdefault("GOOGLE_API_KEY", "bench-placeholder-key")
+logging.basicConfig(level=logging.WARNING)
+
+from agents import CustomAgents, warm_up_agents  # noqa: E402
+from main import CustomCrew  # noqa: E402
+from tasks import CustomTasks  # noqa: E402
+from token_usage import TokenUsageHandler  # noqa: E402
+
+
+def build_crew(mode, share):
+    crew = CustomCrew("Photosynthesis", "short", mode=mode)
+    agents = CustomAgents(callbacks=[TokenUsageHandler()], share=share)
+    tasks = CustomTasks()
+    if mode == "fast":
+        return crew._build_fast_crew(agents, tasks, lambda *args, **kwargs: None)
+    return crew._build_full_crew(agents, tasks, lambda *args, **kwargs: None)
+
+
+def measure(mode, share, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        build_crew(mode, share)
+        timings.append(time.perf_counter() - started)
+
+    # Memory separately so tracemalloc's overhead does not skew the timings
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    crews = [build_crew(mode, share) for _ in range(10)]
+    retained = (tracemalloc.get_traced_memory()[0] - baseline) / len(crews)
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    del crews
+    return {
+        "median_ms": statistics.median(timings) * 1000,
+        "p95_ms": sorted(timings)[int(len(timings) * 0.95) - 1] * 1000,
+        "retained_kib": retained / 1024,
+        "peak_kib": peak / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--mode", choices=["full", "fast"], default="full")
+    args = parser.parse_args()
+
+    warm_up_agents()
+    print("setup     | median ms | p95 ms | KiB kept/request | peak KiB (10 requests)")
+    for label, share in (("per-call", False), ("pooled", True)):
+        stats = measure(args.mode, share, args.runs)
+        print(f"{label:<9} | {stats['median_ms']:9.2f} | {stats['p95_ms']:6.2f} | "
+              f"{stats['retained_kib']:16.1f} | {stats['peak_kib']:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Compares wall-clock time and token use of the "fast" and "full" crew modes.
+
+Runs live against Gemini and Serper, so GOOGLE_API_KEY and SERPER_API_KEY must be set.
+Usage: python bench_crew_modes.py [--modes full fast] [--preference short]
+"""
+import argparse
+import json
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+from main import CustomCrew
+from token_usage import TokenUsageHandler
+
+# Fixed topic set so runs are comparable across commits
+TOPICS = [
+    "Photosynthesis",
+    "Newton's laws of motion",
+    "The French Revolution",
+    "Binary search trees",
+    "Supply and demand",
+]
+
+
+def run_once(topic, preference, mode):
+    usage = TokenUsageHandler()
+    started = time.perf_counter()
+    result = CustomCrew(topic, preference, mode=mode, callbacks=[usage]).run()
+    elapsed = time.perf_counter() - started
+    stats = usage.to_dict()
+    stats.update({"topic": topic, "mode": mode, "seconds": elapsed, "output_chars": len(str(result))})
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["full", "fast"])
+    parser.add_argument("--preference", default="short")
+    parser.add_argument("--topics", nargs="+", default=TOPICS)
+    parser.add_argument("--json", help="Write the per-run results to this file")
+    args = parser.parse_args()
+
+    load_dotenv()
+    runs = []
+    for topic in args.topics:
+        for mode in args.modes:
+            stats = run_once(topic, args.preference, mode)
+            runs.append(stats)
+            print(f"{mode:>5} | {topic:<28} | {stats['seconds']:7.1f}s | {stats['llm_calls']:3d} calls | {stats['total_tokens']:7d} tokens")
+
+    print("\nmode  | median s | mean tokens | mean LLM calls")
+    for mode in args.modes:
+        mode_runs = [r for r in runs if r["mode"] == mode]
+        print(f"{mode:<5} | {statistics.median(r['seconds'] for r in mode_runs):8.1f} | "
+              f"{statistics.mean(r['total_tokens'] for r in mode_runs):11.0f} | "
+              f"{statistics.mean(r['llm_calls'] for r in mode_runs):14.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(runs, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
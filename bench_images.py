@@ -0,0 +1,113 @@
+"""Benchmark of image normalization: bytes and milliseconds saved per PDF.
+
+Generates synthetic downloads (a 24 MP camera JPEG with EXIF, a 3000 px PNG photo, a
+3000 px flat PNG diagram and a GIF), then for each renders a short PDF twice: with the
+original file embedded as-is (the old ensure_valid_jpeg pass-through) and with the
+output of image_normalizer.normalize_image. Reports preparation and render time, peak
+traced memory and PDF size.
+Usage: python bench_images.py [--renders 3] [--dpi 150]
+"""
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from PIL import Image, ImageDraw
+
+from image_normalizer import normalize_image
+from pdf_engine import NotesRenderer, PDFEngine
+
+NOTES = "# Benchmark\n\n## Section\nSome text about the picture.\n- one\n- two\n"
+
+
+def photo(size):
+    # Smoothed noise over a gradient compresses roughly like a real photograph
+    width, height = size
+    gradient = Image.linear_gradient("L").resize(size)
+    noise = Image.effect_noise((width // 4, height // 4), 50).resize(size, Image.Resampling.BICUBIC)
+    return Image.merge("RGB", (gradient, noise, Image.eval(gradient, lambda v: 255 - v)))
+
+
+def diagram(size):
+    img = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(img)
+    for i in range(0, size[0], 150):
+        draw.rectangle([i, i // 2, i + 120, i // 2 + 300], fill=(30, 90, 200), outline="black", width=6)
+        draw.line([0, i, size[0], size[1] - i], fill=(200, 40, 40), width=8)
+    return img
+
+
+def make_samples(directory):
+    samples = {}
+    camera = os.path.join(directory, "camera.jpg")
+    exif = Image.Exif()
+    exif[0x010F] = "Benchmark Camera"
+    exif[0x0112] = 1
+    photo((6000, 4000)).save(camera, "JPEG", quality=92, exif=exif.tobytes())
+    samples["24 MP JPEG"] = camera
+    png_photo = os.path.join(directory, "photo.png")
+    photo((3000, 2000)).save(png_photo, "PNG")
+    samples["PNG photo"] = png_photo
+    png_diagram = os.path.join(directory, "diagram.png")
+    diagram((3000, 2000)).save(png_diagram, "PNG")
+    samples["PNG diagram"] = png_diagram
+    gif = os.path.join(directory, "animation.gif")
+    diagram((1600, 1200)).convert("P").save(gif, "GIF")
+    samples["GIF"] = gif
+    return samples
+
+
+def render(engine, image_path):
+    renderer = NotesRenderer(engine, image_source=lambda title: image_path)
+    renderer.feed(NOTES)
+    return bytes(renderer.close().output())
+
+
+def measure(engine, source_path, normalize, renders, dpi):
+    prep_ms, render_ms = [], []
+    for _ in range(renders):
+        started = time.perf_counter()
+        image_path = normalize_image(source_path, dpi=dpi) if normalize else source_path
+        prep_ms.append((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        pdf_bytes = render(engine, image_path)
+        render_ms.append((time.perf_counter() - started) * 1000)
+
+    # Memory is measured on a separate run because tracemalloc slows everything down
+    tracemalloc.start()
+    image_path = normalize_image(source_path, dpi=dpi) if normalize else source_path
+    render(engine, image_path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(prep_ms), statistics.median(render_ms), peak / 2**20, len(pdf_bytes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--renders", type=int, default=3)
+    parser.add_argument("--dpi", type=int, default=None, help="Defaults to IMAGE_TARGET_DPI")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    engine = PDFEngine()
+    render(engine, None)  # warm-up; loads the shared fonts once
+    with tempfile.TemporaryDirectory() as directory:
+        samples = make_samples(directory)
+        print("image       | pipeline   | prep ms | render ms | total ms | peak MiB | PDF KiB")
+        for label, path in samples.items():
+            results = {}
+            for pipeline, normalize in (("original", False), ("normalized", True)):
+                results[pipeline] = measure(engine, path, normalize, args.renders, args.dpi)
+                prep, render_time, peak, size = results[pipeline]
+                print(f"{label:<11} | {pipeline:<10} | {prep:7.1f} | {render_time:9.1f} | {prep + render_time:8.1f} | "
+                      f"{peak:8.1f} | {size / 1024:7.1f}")
+            before, after = results["original"], results["normalized"]
+            print(f"{'':<11} | {'saved':<10} | {'':7} | {'':9} | {before[0] + before[1] - after[0] - after[1]:8.1f} | "
+                  f"{before[2] - after[2]:8.1f} | {(before[3] - after[3]) / 1024:7.1f}")
+
+
+if __name__ == "__main__":
+    main()
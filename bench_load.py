@@ -0,0 +1,79 @@
+"""Load test: requests/sec and latency for the static and PDF routes at several concurrency levels.
+
+Point it at a running server (python main.py, or gunicorn --config gunicorn.conf.py main:app).
+The PDF route needs an existing file under pdf/; generate one first or pass --pdf.
+Usage: python bench_load.py --url http://localhost:5000 --pdf notes_Photosynthesis_<digest>.pdf
+"""
+import argparse
+import statistics
+import threading
+import time
+
+import requests
+
+
+def run_level(url, concurrency, duration):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        nonlocal errors
+        session = requests.Session()
+        local_latencies = []
+        local_errors = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = session.get(url, timeout=30)
+                response.content
+                if response.status_code >= 400:
+                    local_errors += 1
+            except requests.RequestException:
+                local_errors += 1
+            local_latencies.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local_latencies)
+            errors += local_errors
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--pdf", help="File name under /pdf/ to download, e.g. notes_Photosynthesis.pdf")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per concurrency level")
+    args = parser.parse_args()
+
+    routes = {"static": f"{args.url}/"}
+    if args.pdf:
+        routes["pdf"] = f"{args.url}/pdf/{args.pdf}"
+
+    print("route  | clients | requests | errors |   req/s | p50 ms | p95 ms")
+    for name, url in routes.items():
+        for concurrency in args.concurrency:
+            stats = run_level(url, concurrency, args.duration)
+            print(f"{name:<6} | {concurrency:7d} | {stats['requests']:8d} | {stats['errors']:6d} | "
+                  f"{stats['rps']:7.1f} | {stats['p50_ms']:6.1f} | {stats['p95_ms']:6.1f}")
+
+
+if __name__ == "__main__":
+    main()
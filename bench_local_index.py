@@ -0,0 +1,74 @@
+"""Benchmark of the local retrieval index: build, restart and query cost at growing sizes.
+
+Indexes a synthetic corpus of page-sized passages (words drawn from a Zipf-like
+vocabulary) into a temporary local_index.LocalIndex, then reports the time to add the
+documents, save the index.bin snapshot, reopen the index from the snapshot and reopen
+it without one (re-tokenizing documents.jsonl), plus median and p95 query latency and
+the size of both files.
+Usage: python bench_local_index.py [--documents 1000 10000 50000] [--queries 200]
+"""
+import argparse
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from local_index import LocalIndex
+
+VOCABULARY = [f"term{i}" for i in range(20000)]
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+
+
+def passages(count, words=120):
+    rng = random.Random(count)
+    for i in range(count):
+        text = " ".join(rng.choices(VOCABULARY, WEIGHTS, k=words))
+        yield f"https://example.com/{i // 5}", f"Page {i // 5}", text
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=20, help="Documents per add() call, like one search")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print("documents | add ms | save ms | load ms | rebuild ms | query p50 ms | query p95 ms | docs MiB | index MiB")
+    for count in args.documents:
+        with tempfile.TemporaryDirectory() as directory:
+            index = LocalIndex(index_dir=directory, save_seconds=10**9, max_documents=count)
+            documents = list(passages(count))
+
+            def add_all():
+                for start in range(0, len(documents), args.batch):
+                    index.add(documents[start:start + args.batch])
+            _, add_ms = timed(add_all)
+            _, save_ms = timed(index.save)
+            _, load_ms = timed(lambda: LocalIndex(index_dir=directory, max_documents=count))
+            os.remove(index.snapshot_path)
+            _, rebuild_ms = timed(lambda: LocalIndex(index_dir=directory, max_documents=count).search("warm"))
+            index.save()
+
+            rng = random.Random(0)
+            latencies = []
+            for _ in range(args.queries):
+                query = " ".join(rng.choices(VOCABULARY[:2000], k=3))
+                latencies.append(timed(lambda: index.search(query))[1])
+            latencies.sort()
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            print(f"{count:9d} | {add_ms:6.0f} | {save_ms:7.0f} | {load_ms:7.0f} | {rebuild_ms:10.0f} | "
+                  f"{statistics.median(latencies):12.2f} | {p95:12.2f} | "
+                  f"{os.path.getsize(index.documents_path) / 2**20:8.1f} | {os.path.getsize(index.snapshot_path) / 2**20:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
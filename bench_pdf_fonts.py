@@ -0,0 +1,70 @@
+"""Micro-benchmark of PDF render time and memory with and without shared font parsing.
+
+Renders the same sample notes through create_pdf_file, first with per-render add_font
+calls (the old behaviour, same as PDF_SHARE_FONTS=0) and then with the shared PDFEngine.
+Usage: python bench_pdf_fonts.py [--renders 20]
+"""
+import argparse
+import logging
+import statistics
+import time
+import tracemalloc
+from concurrent.futures import Future
+
+import main as notes_app
+from pdf_engine import PDFEngine
+
+SAMPLE_NOTES = "\n".join(
+    ["# Photosynthesis", ""]
+    + [line for i in range(1, 16) for line in (
+        f"## Section {i}",
+        "Photosynthesis converts light energy into chemical energy stored in glucose. " * 4,
+        "- Chlorophyll absorbs mostly blue and red light",
+        "- The Calvin cycle fixes carbon dioxide into sugars",
+        "",
+    )]
+)
+
+
+def no_image():
+    # Skip the image search so only layout and font work is measured
+    future = Future()
+    future.set_result([])
+    return future
+
+
+def render():
+    return notes_app.create_pdf_file("Benchmark", SAMPLE_NOTES, image_future=no_image())
+
+
+def measure(engine, renders):
+    notes_app.pdf_engine = engine
+    render()  # warm-up; loads the shared fonts once
+    timings = []
+    for _ in range(renders):
+        started = time.perf_counter()
+        render()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    # Memory is measured on a separate render because tracemalloc slows everything down
+    tracemalloc.start()
+    render()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings), statistics.mean(timings), peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--renders", type=int, default=20)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print("engine           | median ms | mean ms | peak traced MiB")
+    for label, engine in (("per-render fonts", PDFEngine(share_fonts=False)), ("shared fonts", PDFEngine())):
+        median_ms, mean_ms, peak_mib = measure(engine, args.renders)
+        print(f"{label:<16} | {median_ms:9.1f} | {mean_ms:7.1f} | {peak_mib:15.1f}")
+
+
+if __name__ == "__main__":
+    main()
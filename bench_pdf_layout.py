@@ -0,0 +1,66 @@
+"""Benchmark of NotesRenderer layout with and without block grouping.
+
+Renders synthetic notes with 10, 100 and 1000 paragraphs (each followed by a few bullets,
+with a '##' heading every five paragraphs) with every list item written on its own (same
+as PDF_BLOCK_LAYOUT=0) and then grouped into blocks, reporting render time and PDF size.
+Usage: python bench_pdf_layout.py [--paragraphs 10 100 1000] [--renders 5]
+"""
+import argparse
+import logging
+import statistics
+import time
+
+from pdf_engine import NotesRenderer, PDFEngine
+
+
+def synthetic_notes(paragraphs):
+    lines = ["# Synthetic notes", ""]
+    for i in range(paragraphs):
+        if i % 5 == 0:
+            lines += [f"## Section {i // 5 + 1}", ""]
+        lines += [
+            f"Paragraph {i} explains how light energy becomes chemical energy in the chloroplast.",
+            "The light-dependent reactions split water and release oxygen as a by-product.",
+            "Energy carriers made there drive the Calvin cycle, which fixes carbon dioxide.",
+            "- Chlorophyll absorbs mostly blue and red light",
+            "- The Calvin cycle runs in the stroma",
+            "- Glucose is built from three-carbon sugars",
+            "",
+        ]
+    return "\n".join(lines)
+
+
+def render(engine, notes, block_layout):
+    renderer = NotesRenderer(engine, block_layout=block_layout)
+    renderer.feed(notes)
+    return bytes(renderer.close().output())
+
+
+def measure(engine, notes, block_layout, renders):
+    size = len(render(engine, notes, block_layout))  # warm-up
+    timings = []
+    for _ in range(renders):
+        started = time.perf_counter()
+        render(engine, notes, block_layout)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paragraphs", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--renders", type=int, default=5)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    engine = PDFEngine()
+    print("paragraphs | layout   | median ms | PDF KiB")
+    for paragraphs in args.paragraphs:
+        notes = synthetic_notes(paragraphs)
+        for label, block_layout in (("per-item", False), ("blocks", True)):
+            median_ms, size = measure(engine, notes, block_layout, args.renders)
+            print(f"{paragraphs:10d} | {label:<8} | {median_ms:9.1f} | {size / 1024:7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""End-to-end benchmark of POST /api/generate_notes against recorded Gemini/Serper/image fixtures.
+
+Record once with live keys, then replay offline as often as needed:
+  python bench_pipeline.py --record                  # needs GOOGLE_API_KEY, SERPER_API_KEY, ...
+  python bench_pipeline.py --concurrency 1 4 8       # replays from fixtures/replay, no network
+Reports end-to-end p50/p95 latency and throughput per concurrency level, then p50/p95 latency
+and peak RSS per pipeline stage (from the request traces and a background RSS sampler).
+--latency-scale 1 replays each call as slowly as it was recorded; the default 0 measures only
+this app's own overhead.
+"""
+import argparse
+import os
+import resource
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+TOPICS = [
+    "Photosynthesis",
+    "Newton's laws of motion",
+    "The French Revolution",
+    "Binary search trees",
+    "Supply and demand",
+]
+
+
+def current_rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # Not Linux: peak so far is the best available
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RSSSampler(threading.Thread):
+    """Samples this process's resident set size every interval seconds."""
+
+    def __init__(self, interval=0.005):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = []  # (unix time, rss bytes)
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.samples.append((time.time(), current_rss_bytes()))
+            time.sleep(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def peak_between(self, start, end):
+        # Widen by one interval so spans shorter than the sampling period still see a sample
+        inside = [rss for at, rss in self.samples if start - self.interval <= at <= end + self.interval]
+        return max(inside) if inside else None
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[max(0, int(round(len(values) * fraction)) - 1)] if values else 0.0
+
+
+def run_level(client, topics, preference, mode, concurrency, requests_per_client):
+    results = []
+    lock = threading.Lock()
+
+    def worker(offset):
+        for i in range(requests_per_client):
+            topic = topics[(offset + i) % len(topics)]
+            started = time.perf_counter()
+            response = client.post("/api/generate_notes", json={
+                "topic": topic, "preference": preference, "mode": mode, "no_cache": True, "trace": True,
+            })
+            elapsed = time.perf_counter() - started
+            with lock:
+                results.append((elapsed, response.status_code, response.get_json() or {}))
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--record", action="store_true", help="Run once per topic against the live APIs and save fixtures")
+    parser.add_argument("--fixtures", default=os.path.join("fixtures", "replay"))
+    parser.add_argument("--topics", nargs="+", default=TOPICS)
+    parser.add_argument("--preference", default="short")
+    parser.add_argument("--mode", choices=["full", "fast"], default="fast")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--requests", type=int, default=5, help="Requests per client at each level")
+    parser.add_argument("--latency-scale", type=float, default=0)
+    args = parser.parse_args()
+
+    # Must be set before the app (and its HTTP session and LLM pool) is imported
+    os.environ["REPLAY_MODE"] = "record" if args.record else "replay"
+    os.environ["REPLAY_DIR"] = args.fixtures
+    os.environ["REPLAY_LATENCY_SCALE"] = str(args.latency_scale)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("OTEL_SDK_DISABLED", "true")  # crewAI telemetry would try the network
+    # Start every run from empty stores: cached notes, images, PDFs, pages or local index entries
+    # left by earlier runs would change the prompts, and replayed prompts must match the recording
+    state_dir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    for name, subdir in (("RESULT_CACHE_DIR", "results"), ("PAGE_CACHE_DIR", "pages"), ("LOCAL_INDEX_DIR", "index"),
+                         ("IMAGE_STORE_DIR", "images"), ("PDF_STORE_DIR", "pdf")):
+        os.environ[name] = os.path.join(state_dir, subdir)
+    # The local index also fills up during the run, so repeated topics would answer from it
+    # instead of the recorded searches
+    os.environ["LOCAL_INDEX_ENABLED"] = "0"
+    try:
+        run(args)
+    finally:
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+
+def run(args):
+    import main as notes_app
+
+    client = notes_app.app.test_client()
+    if args.record:
+        for topic in args.topics:
+            response = client.post("/api/generate_notes", json={
+                "topic": topic, "preference": args.preference, "mode": args.mode, "no_cache": True,
+            })
+            print(f"recorded {topic!r}: HTTP {response.status_code}")
+        return
+
+    sampler = RSSSampler()
+    sampler.start()
+    traces = []
+    print("clients | requests | errors | req/s | p50 s | p95 s")
+    for concurrency in args.concurrency:
+        results, elapsed = run_level(client, args.topics, args.preference, args.mode, concurrency, args.requests)
+        latencies = [r[0] for r in results]
+        errors = sum(1 for r in results if r[1] != 200)
+        traces.extend(r[2]["trace"] for r in results if r[1] == 200 and "trace" in r[2])
+        print(f"{concurrency:7d} | {len(results):8d} | {errors:6d} | {len(results) / elapsed:5.2f} | "
+              f"{statistics.median(latencies):5.2f} | {percentile(latencies, 0.95):5.2f}")
+    sampler.stop()
+
+    stages = {}
+    for trace in traces:
+        for span in trace["spans"]:
+            start = trace["started_at"] + span["start"]
+            entry = stages.setdefault(span["stage"], {"durations": [], "peak_rss": 0})
+            entry["durations"].append(span["duration"])
+            peak = sampler.peak_between(start, start + span["duration"])
+            if peak:
+                entry["peak_rss"] = max(entry["peak_rss"], peak)
+
+    print("\nstage          | spans | p50 ms   | p95 ms   | peak RSS MiB")
+    for stage, entry in sorted(stages.items()):
+        durations = entry["durations"]
+        peak = f"{entry['peak_rss'] / 2**20:12.1f}" if entry["peak_rss"] else f"{'n/a':>12}"
+        print(f"{stage:<14} | {len(durations):5d} | {statistics.median(durations) * 1000:8.1f} | "
+              f"{percentile(durations, 0.95) * 1000:8.1f} | {peak}")
+    print(f"\nprocess peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Benchmark of the fanned-out research stage: wall time against the number of workers.
+
+Runs research.ResearchFanOut offline with a stand-in chat model and search that sleep
+for the given latencies (each subtopic's LLM latency is jittered so one is the slowest),
+once with a single worker, which is the old one-search-after-another behaviour, and once
+per --workers value. With enough workers the time approaches planning + the slowest
+subtopic instead of the sum of all of them.
+Usage: python bench_research.py [--subtopics 4 8] [--workers 1 4 8] [--llm-latency 1.0] [--search-latency 0.3]
+"""
+import argparse
+import logging
+import random
+import statistics
+import time
+
+from langchain_core.language_models.chat_models import SimpleChatModel
+
+from research import ResearchFanOut
+from search_results import format_results
+
+
+class SleepyChatModel(SimpleChatModel):
+    """Answers after a delay; planning prompts get a numbered list of subtopics."""
+
+    latency: float = 1.0
+    subtopics: int = 4
+
+    @property
+    def _llm_type(self):
+        return "sleepy"
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = str(messages[-1].content)
+        if "Split the topic" in prompt:
+            time.sleep(self.latency)
+            return "\n".join(f"{i}. Subtopic {i}" for i in range(1, self.subtopics + 1))
+        time.sleep(self.latency * random.uniform(0.5, 1.5))
+        return "Some findings.\n\n- **Key term**: explanation\n- Another point"
+
+
+def fake_search(latency):
+    def search(query):
+        time.sleep(latency)
+        return format_results([(query, "https://example.com", f"About {query}.")])
+    return search
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subtopics", type=int, nargs="+", default=[4, 8])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--llm-latency", type=float, default=1.0)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print("subtopics | workers | median s | sections")
+    for subtopics in args.subtopics:
+        llm = SleepyChatModel(latency=args.llm_latency, subtopics=subtopics)
+        for workers in args.workers:
+            seconds = []
+            for _ in range(args.runs):
+                fanout = ResearchFanOut(llm, subtopics=subtopics, workers=workers,
+                                        search=fake_search(args.search_latency))
+                started = time.perf_counter()
+                notes = fanout.run("Benchmark topic", "long")
+                seconds.append(time.perf_counter() - started)
+            print(f"{subtopics:9d} | {workers:7d} | {statistics.median(seconds):8.2f} | {notes.count(chr(10) + '## '):8d}")
+
+
+if __name__ == "__main__":
+    main()
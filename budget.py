@@ -0,0 +1,152 @@
+import functools
+import logging
+import os
+import time
+
+from search_results import parse_results
+from token_usage import TokenUsageHandler
+
+logger = logging.getLogger(__name__)
+
+# Server-wide caps per request; 0 disables a limit. Clients may ask for less, never more.
+DEFAULT_LIMITS = {
+    "max_seconds": float(os.environ.get("BUDGET_MAX_SECONDS", 300)),
+    "max_llm_calls": int(os.environ.get("BUDGET_MAX_LLM_CALLS", 40)),
+    "max_tokens": int(os.environ.get("BUDGET_MAX_TOKENS", 200000)),
+    "max_tool_calls": int(os.environ.get("BUDGET_MAX_TOOL_CALLS", 12)),
+}
+
+TOOL_BUDGET_MESSAGE = ("The research budget for this request is used up ({reason}). Do not use any more tools; "
+                       "write your final answer now using the information you already have.")
+
+
+class BudgetExceeded(Exception):
+    def __init__(self, reason):
+        super().__init__(f"Request budget exceeded: {reason}")
+        self.reason = reason
+
+
+class RequestBudget(TokenUsageHandler):
+    """Per-request limits on wall time, LLM calls, tokens and tool calls.
+
+    Attached as an LLM callback it stops the crew with BudgetExceeded before an LLM call
+    that would go over a limit. Tools wrapped with wrap_tool() do not raise (crewAI would
+    just retry them); once the budget is spent they tell the agent to answer with what it
+    has, and every result they return is kept so a stopped run still has material to show.
+    """
+
+    # Let BudgetExceeded propagate out of the LLM call instead of being logged and ignored
+    raise_error = True
+
+    def __init__(self, **limits):
+        super().__init__()
+        self.limits = dict(DEFAULT_LIMITS)
+        for name, value in limits.items():
+            if name not in self.limits or value is None:
+                continue
+            value = type(self.limits[name])(value)
+            if value > 0:
+                self.limits[name] = min(value, self.limits[name]) if self.limits[name] else value
+        self.started_at = time.time()
+        self.tool_calls = 0
+        self.exceeded = None
+        self.tool_limit = None
+        self.observations = []
+
+    @staticmethod
+    def limits_from_request(data):
+        """Validated limits from an optional {"budget": {...}} object in a request body."""
+        requested = data.get("budget") if isinstance(data, dict) else None
+        if requested is None:
+            return {}
+        if not isinstance(requested, dict):
+            raise ValueError(f"'budget' must be an object with any of {list(DEFAULT_LIMITS)}")
+        limits = {}
+        for name in DEFAULT_LIMITS:
+            value = requested.get(name)
+            if value is None:
+                continue
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+                raise ValueError(f"'budget.{name}' must be a non-negative number")
+            limits[name] = value
+        return limits
+
+    @property
+    def elapsed(self):
+        return time.time() - self.started_at
+
+    def _over_limit_locked(self):
+        limits = self.limits
+        if limits["max_seconds"] and self.elapsed >= limits["max_seconds"]:
+            return f"wall time reached {limits['max_seconds']:g}s"
+        if limits["max_llm_calls"] and self.llm_calls >= limits["max_llm_calls"]:
+            return f"{limits['max_llm_calls']} LLM calls"
+        if limits["max_tokens"] and self.prompt_tokens + self.completion_tokens >= limits["max_tokens"]:
+            return f"{limits['max_tokens']} tokens"
+        return None
+
+    def _record_prompt(self, tokens):
+        with self._lock:
+            reason = self.exceeded or self._over_limit_locked()
+            if reason:
+                self.exceeded = reason
+        if reason:
+            logger.warning(f"Stopping crew before LLM call {self.llm_calls + 1}: {reason}")
+            raise BudgetExceeded(reason)
+        super()._record_prompt(tokens)
+
+    def charge_tool_call(self):
+        """Counts one tool call; returns the reason when the budget no longer allows it."""
+        with self._lock:
+            reason = self._over_limit_locked()
+            if not reason and self.limits["max_tool_calls"] and self.tool_calls >= self.limits["max_tool_calls"]:
+                reason = f"{self.limits['max_tool_calls']} tool calls"
+            if reason:
+                self.tool_limit = reason
+            else:
+                self.tool_calls += 1
+            return reason
+
+    def observe(self, result):
+        """Keeps a search result for fallback_notes()."""
+        with self._lock:
+            self.observations.append(str(result))
+
+    def wrap_tool(self, tool):
+        """Returns a copy of a LangChain tool that is charged against this budget."""
+        original = tool.func
+
+        @functools.wraps(original)
+        def guarded(*args, **kwargs):
+            reason = self.charge_tool_call()
+            if reason:
+                logger.info(f"Tool '{tool.name}' refused: {reason}")
+                return TOOL_BUDGET_MESSAGE.format(reason=reason)
+            result = original(*args, **kwargs)
+            self.observe(result)
+            return result
+
+        # construct() rather than copy(update=...), which drops fields that were never set
+        return type(tool).construct(**dict(tool.__dict__, func=guarded))
+
+    def fallback_notes(self, topic):
+        """Markdown notes built from the tool results gathered so far, or None if there are none."""
+        sections = []
+        for observation in self.observations:
+            for title, link, snippet in parse_results(observation):
+                sections.append(f"## {title}\n{snippet}\n- Source: {link}")
+        if not sections:
+            return None
+        return f"# {topic}\n\n" + "\n\n".join(sections)
+
+    def to_dict(self):
+        usage = super().to_dict()
+        with self._lock:
+            usage.update({
+                "tool_calls": self.tool_calls,
+                "elapsed_seconds": round(self.elapsed, 2),
+                "limits": dict(self.limits),
+                "exceeded": self.exceeded,
+                "tool_limit": self.tool_limit,
+            })
+        return usage
@@ -0,0 +1,115 @@
+import re
+
+# Part of the result cache's PROMPT_VERSION: bump it whenever normalize_markers output changes
+NORMALIZATION_VERSION = 1
+
+# Matches any markdown heading, including ones missing the space after the hashes
+HEADING_RE = re.compile(r'^(#{1,6})\s*(.+?)\s*#*$')
+# Bullet styles the LLM tends to use instead of the '- ' marker
+BULLET_RE = re.compile(r'^(\s*)(?:[-*+•–—])\s+(.*)$')
+ORDERED_RE = re.compile(r'^(\s*)(\d+)[.)]\s+(.*)$')
+EMPHASIS_RE = re.compile(r'(\*\*|__)(.+?)\1')
+FENCE_RE = re.compile(r'^(```|~~~)\s*([\w-]*)$')
+# Fence languages that mean "this whole answer is markdown", not a code sample
+WRAPPER_FENCE_LANGUAGES = {"", "markdown", "md"}
+# Python-Markdown nests list items indented by four spaces
+LIST_INDENT = "    "
+
+
+def _strip_wrapper_fence(lines):
+    """Drops a code fence wrapping the whole answer (```markdown ... ```)."""
+    opening = FENCE_RE.match(lines[0].strip()) if lines else None
+    if (opening and opening.group(2).lower() in WRAPPER_FENCE_LANGUAGES and len(lines) > 1
+            and lines[-1].strip() == opening.group(1)):
+        return lines[1:-1]
+    return lines
+
+
+def normalize_markers(text, title=None):
+    """Deterministically tidies LLM markdown into the shape the PDF renderer lays out best.
+
+    Exactly one '# ' title; other level-1 and level-2 headings become '## ' and deeper ones
+    '### '; bullets become '- ' and numbered items 'N. ', nested by four spaces per level;
+    a single blank line between blocks. Inline bold/italic, code fences and tables are kept.
+    If no heading is present, `title` is used as the title.
+    """
+    text = str(text).strip()
+    # crewAI sometimes leaks the ReAct prefix into the final answer
+    if text.startswith("Final Answer:"):
+        text = text[len("Final Answer:"):].strip()
+
+    output = []
+    has_title = False
+    seen_heading = False
+    fence = None
+    list_indents = []  # indentation widths of the open list levels
+    for raw_line in _strip_wrapper_fence(text.split('\n')):
+        line = raw_line.rstrip()
+        stripped = line.strip()
+
+        # Code blocks are copied verbatim
+        fence_match = FENCE_RE.match(stripped)
+        if fence is not None:
+            output.append(line)
+            if fence_match and fence_match.group(1) == fence and not fence_match.group(2):
+                fence = None
+            continue
+        if fence_match:
+            if output and output[-1] != "":
+                output.append("")
+            output.append(stripped)
+            fence = fence_match.group(1)
+            list_indents = []
+            continue
+
+        if not stripped:
+            if output and output[-1] != "":
+                output.append("")
+            continue
+
+        heading = HEADING_RE.match(stripped)
+        if heading:
+            heading_text = EMPHASIS_RE.sub(r'\2', heading.group(2)).strip()
+            if not heading_text:
+                continue
+            if output and output[-1] != "":
+                output.append("")
+            level = len(heading.group(1))
+            # Only a level-1 heading that opens the document is the title
+            if not seen_heading and level == 1:
+                output.append(f"# {heading_text}")
+                has_title = True
+            elif level <= 2:
+                output.append(f"## {heading_text}")
+            else:
+                output.append(f"### {heading_text}")
+            seen_heading = True
+            list_indents = []
+            continue
+
+        bullet = BULLET_RE.match(line)
+        ordered = None if bullet else ORDERED_RE.match(line)
+        if (bullet and bullet.group(2).strip()) or (ordered and ordered.group(3).strip()):
+            width = len((bullet or ordered).group(1).expandtabs(4))
+            while list_indents and width < list_indents[-1]:
+                list_indents.pop()
+            if not list_indents or width > list_indents[-1]:
+                list_indents.append(width)
+            indent = LIST_INDENT * (len(list_indents) - 1)
+            if bullet:
+                output.append(f"{indent}- {bullet.group(2).strip()}")
+            else:
+                output.append(f"{indent}{ordered.group(2)}. {ordered.group(3).strip()}")
+            continue
+
+        if not raw_line[:1].isspace():
+            list_indents = []
+        output.append(stripped)
+
+    while output and output[-1] == "":
+        output.pop()
+
+    if not has_title and title:
+        output = [f"# {title}", ""] + output
+
+    return "\n".join(output)
@@ -0,0 +1,40 @@
+# Production server settings: gunicorn --config gunicorn.conf.py main:app
+#
+# Every value can be overridden from the environment. Job state (/api/jobs) and the
+# progress streams live in the worker process that accepted the job, so keep
+# WEB_WORKERS=1 unless the load balancer pins clients to a worker; scale with
+# WEB_THREADS and MAX_CONCURRENT_JOBS instead.
+import logging
+import os
+
+bind = os.environ.get("WEB_BIND", f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+workers = int(os.environ.get("WEB_WORKERS", 1))
+# Threaded workers: each open SSE stream and each blocking /api/generate_notes call holds a thread
+worker_class = "gthread"
+threads = int(os.environ.get("WEB_THREADS", 16))
+# Synchronous /api/generate_notes requests run a whole crew, so the request timeout must cover one
+timeout = int(os.environ.get("WEB_TIMEOUT", 600))
+# On SIGTERM, workers get this long to finish in-flight requests and drain queued crew jobs
+graceful_timeout = int(os.environ.get("WEB_GRACEFUL_TIMEOUT", 900))
+keepalive = int(os.environ.get("WEB_KEEPALIVE", 5))
+# Recycle workers now and then to bound memory growth from long-running LLM clients
+max_requests = int(os.environ.get("WEB_MAX_REQUESTS", 0))
+max_requests_jitter = int(os.environ.get("WEB_MAX_REQUESTS_JITTER", 50))
+accesslog = "-"
+errorlog = "-"
+loglevel = os.environ.get("WEB_LOG_LEVEL", "info")
+
+
+def post_worker_init(worker):
+    """Creates the pooled LLM clients and agents once per worker, before it takes requests."""
+    import main
+
+    main.warm_up()
+
+
+def worker_exit(server, worker):
+    """Lets queued and running crew jobs finish before the worker process goes away."""
+    import main
+
+    logging.getLogger(__name__).info(f"Worker {worker.pid} exiting, draining job queue...")
+    main.job_queue.shutdown(wait=True)
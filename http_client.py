@@ -0,0 +1,95 @@
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import replay
+
+logger = logging.getLogger(__name__)
+
+# (connect, read) timeouts per upstream host; anything else gets DEFAULT_TIMEOUT
+HOST_TIMEOUTS = {
+    "google.serper.dev": (5, 30),
+    "serpapi.com": (5, 30),
+    "api.unsplash.com": (5, 15),
+}
+DEFAULT_TIMEOUT = (5, 20)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class OutboundSession(requests.Session):
+    """Session shared by every outbound call: keep-alive pools, per-host timeouts, retries and metrics.
+
+    Retries use exponential backoff with jitter on connection errors and 429/5xx responses,
+    honouring Retry-After. POST is retried too because the only POST target (Serper search)
+    is a read-only query.
+    """
+
+    def __init__(self, pool_size=None, max_retries=None):
+        super().__init__()
+        pool_size = pool_size or int(os.environ.get("HTTP_POOL_SIZE", 32))
+        retry = Retry(
+            total=max_retries if max_retries is not None else int(os.environ.get("HTTP_MAX_RETRIES", 3)),
+            backoff_factor=0.5,
+            backoff_jitter=0.5,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(["GET", "HEAD", "POST"]),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        if replay.enabled():
+            # Offline fixtures for benchmarks (REPLAY_MODE=record|replay, see replay.py)
+            return replay.http_request(self._send, method, url, **kwargs)
+        return self._send(method, url, **kwargs)
+
+    def _send(self, method, url, **kwargs):
+        host = urlparse(url).netloc or "unknown"
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = HOST_TIMEOUTS.get(host, DEFAULT_TIMEOUT)
+        started = time.perf_counter()
+        try:
+            response = super().request(method, url, **kwargs)
+        except requests.RequestException as e:
+            self._record(host, time.perf_counter() - started, error=type(e).__name__)
+            raise
+        retries = getattr(getattr(response.raw, "retries", None), "history", ()) or ()
+        self._record(host, time.perf_counter() - started, status=response.status_code, retries=len(retries))
+        return response
+
+    def _record(self, host, seconds, status=None, error=None, retries=0):
+        with self._stats_lock:
+            stats = self._stats.setdefault(host, {
+                "requests": 0, "errors": 0, "retries": 0, "total_seconds": 0.0, "max_seconds": 0.0, "statuses": {},
+            })
+            stats["requests"] += 1
+            stats["retries"] += retries
+            stats["total_seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            if error:
+                stats["errors"] += 1
+                stats["statuses"][error] = stats["statuses"].get(error, 0) + 1
+            else:
+                status_class = f"{status // 100}xx"
+                stats["statuses"][status_class] = stats["statuses"].get(status_class, 0) + 1
+
+    def stats(self):
+        """Per-host request counts, retries, status classes and latency."""
+        with self._stats_lock:
+            return {host: dict(stats, statuses=dict(stats["statuses"])) for host, stats in self._stats.items()}
+
+
+# Process-wide session; import this rather than calling requests.* directly
+session = OutboundSession()
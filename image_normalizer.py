@@ -0,0 +1,95 @@
+import logging
+import math
+import os
+
+from PIL import Image, ImageOps
+
+from pdf_engine import IMAGE_WIDTH_MM
+
+logger = logging.getLogger(__name__)
+
+# Illustrations are drawn IMAGE_WIDTH_MM wide, so anything above this resolution is wasted
+IMAGE_TARGET_DPI = int(os.environ.get("IMAGE_TARGET_DPI", 150))
+# Refuse to decode images with more pixels than this (decompression bombs, absurd originals)
+IMAGE_MAX_PIXELS = int(os.environ.get("IMAGE_MAX_PIXELS", 40_000_000))
+IMAGE_JPEG_QUALITY = int(os.environ.get("IMAGE_JPEG_QUALITY", 85))
+# Tall images are drawn at the same width, so height may be a few times larger before it stops mattering
+MAX_ASPECT_RATIO = 3
+
+# Image.info keys that only carry metadata; a JPEG with any of them is re-encoded to drop them
+METADATA_KEYS = ("exif", "icc_profile", "xmp", "XML:com.adobe.xmp", "photoshop", "comment")
+EXIF_ORIENTATION = 0x0112
+
+
+class ImageRejected(ValueError):
+    """The image cannot be used in a PDF (too many pixels, unreadable)."""
+
+
+def target_width_px(dpi=None):
+    return round(IMAGE_WIDTH_MM / 25.4 * (dpi or IMAGE_TARGET_DPI))
+
+
+def _flatten(img):
+    """Returns an RGB or L image, compositing any transparency onto white."""
+    if img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info):
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel("A"))
+        return background
+    if img.mode not in ("RGB", "L"):
+        return img.convert("RGB")
+    return img
+
+
+def normalize_image(image_path, dpi=None):
+    """Downscales an image to what a IMAGE_WIDTH_MM-wide illustration needs and strips its metadata.
+
+    Returns the path to embed. JPEGs are decoded with draft(), which lets libjpeg
+    scale by 1/2 to 1/8 while decoding, so a 24-megapixel photo never exists in memory at
+    full size. The result is written next to the original as a palette PNG when the source
+    is a flat graphic with at most 256 colours, and as an optimised JPEG otherwise. A JPEG
+    that is already small enough and carries no metadata is returned untouched.
+    Raises ImageRejected for images above IMAGE_MAX_PIXELS, before any pixel is decoded.
+    The size is not returned: add_image_to_pdf reads it from the parse fpdf2 makes of the
+    file anyway to embed it, so no other step opens the image again.
+    """
+    target_w = target_width_px(dpi)
+    bounds = (target_w, target_w * MAX_ASPECT_RATIO)
+    with Image.open(image_path) as source:
+        width, height = source.size
+        if width * height > IMAGE_MAX_PIXELS:
+            raise ImageRejected(f"Image is {width}x{height} pixels, limit is {IMAGE_MAX_PIXELS}")
+        source_format = source.format
+        has_metadata = any(key in source.info for key in METADATA_KEYS)
+        if (source_format == "JPEG" and width <= bounds[0] and height <= bounds[1]
+                and source.mode in ("RGB", "L") and not has_metadata):
+            return image_path
+
+        img = source
+        if source_format == "JPEG":
+            # draft() keeps both sides at least as large as requested, so ask for the final size
+            scale = min(1, bounds[0] / width, bounds[1] / height)
+            img.draft("L" if img.mode == "L" else "RGB", (math.ceil(width * scale), math.ceil(height * scale)))
+        if img.getexif().get(EXIF_ORIENTATION, 1) != 1:
+            # Metadata is dropped below, so camera rotation has to be applied to the pixels
+            img = ImageOps.exif_transpose(img)
+        img = _flatten(img)
+        # Counted before resampling, which blends edges into many in-between colours
+        colors = img.getcolors(256) if source_format in ("PNG", "GIF") else None
+        img.thumbnail(bounds, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+        base = os.path.splitext(image_path)[0]
+        if colors is not None:
+            # Diagrams and logos: a palette PNG is smaller and sharper than any JPEG
+            normalized_path = f"{base}_normalized.png"
+            if img.mode != "L":
+                img = img.quantize(colors=len(colors))
+            img.save(normalized_path, "PNG", optimize=True)
+        else:
+            normalized_path = f"{base}_normalized.jpg"
+            img.save(normalized_path, "JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True)
+        size = img.size
+
+    logger.info(f"Normalized {image_path} ({source_format} {width}x{height}) to {normalized_path} "
+                f"({size[0]}x{size[1]}, {os.path.getsize(normalized_path)} bytes)")
+    return normalized_path
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+
+from result_cache import normalize_topic
+
+logger = logging.getLogger(__name__)
+
+BLOB_NAME_RE = re.compile(r"^[0-9a-f]{64}\.\w+$")
+# A blob no query points to yet may be one another worker is still adding
+UNREFERENCED_GRACE_SECONDS = 60
+
+
+class ImageStore:
+    """Content-addressed store of validated images with a query index, TTL and size-bounded LRU eviction.
+
+    Image bytes are stored once under their SHA-256 digest, so two queries that resolve to the
+    same picture share a file. Each normalised query has its own small JSON file under
+    queries/ naming its blob, so workers never overwrite each other's entries, and a blob's
+    last use is kept in its atime (set on every hit; mtime stays the write time). Queries
+    older than IMAGE_STORE_TTL_SECONDS are dropped, then blobs no query points to, then the
+    least recently used until the store fits in IMAGE_STORE_MAX_BYTES.
+    """
+
+    def __init__(self, root=None, ttl_seconds=None, max_bytes=None):
+        self.root = root or os.environ.get("IMAGE_STORE_DIR", os.path.join("images", "store"))
+        self.ttl_seconds = ttl_seconds or int(os.environ.get("IMAGE_STORE_TTL_SECONDS", 30 * 24 * 3600))
+        self.max_bytes = max_bytes or int(os.environ.get("IMAGE_STORE_MAX_BYTES", 500 * 1024 * 1024))
+        self.queries_dir = os.path.join(self.root, "queries")
+        self._lock = threading.Lock()
+        os.makedirs(self.queries_dir, exist_ok=True)
+
+    def _query_path(self, key):
+        return os.path.join(self.queries_dir, f"{hashlib.sha256(key.encode('utf-8')).hexdigest()}.json")
+
+    @staticmethod
+    def _touch(path):
+        """Marks a blob as used now (atime only)."""
+        try:
+            os.utime(path, (time.time(), os.stat(path).st_mtime))
+        except OSError:
+            pass
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def lookup(self, query):
+        """Returns the stored image path for this query, or None if unknown, expired or missing."""
+        query_path = self._query_path(normalize_topic(query))
+        try:
+            with open(query_path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            path = os.path.join(self.root, entry["file"])
+            expired = time.time() - entry["stored_at"] > self.ttl_seconds
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Discarding unreadable image store entry {query_path}: {e}")
+            self._remove(query_path)
+            return None
+        if expired or not os.path.exists(path):
+            self._remove(query_path)
+            return None
+        self._touch(path)
+        logger.info(f"Image store hit for query '{query}': {path}")
+        return path
+
+    def add(self, query, image_path):
+        """Moves a validated image into the store, deduplicating by content. Returns the stored path."""
+        with open(image_path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        file_name = f"{digest}{os.path.splitext(image_path)[1].lower() or '.jpg'}"
+        stored_path = os.path.join(self.root, file_name)
+
+        if os.path.exists(stored_path):
+            # Same bytes already stored under another query; drop the duplicate download
+            os.remove(image_path)
+            self._touch(stored_path)
+            logger.info(f"Image for '{query}' deduplicated against {stored_path}")
+        else:
+            shutil.move(image_path, stored_path)
+
+        key = normalize_topic(query)
+        query_path = self._query_path(key)
+        tmp_path = f"{query_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"query": key, "file": file_name, "stored_at": time.time()}, f)
+            os.replace(tmp_path, query_path)
+        except OSError as e:
+            logger.warning(f"Could not write image store entry {query_path}: {e}")
+        self._evict(keep=file_name)
+        return stored_path
+
+    def _scan(self):
+        """(query entries as (path, entry), blobs as {file name: (last used, size)}) currently on disk."""
+        entries = []
+        blobs = {}
+        with os.scandir(self.queries_dir) as it:
+            for item in it:
+                if not item.name.endswith(".json"):
+                    continue
+                try:
+                    with open(item.path, "r", encoding="utf-8") as f:
+                        entries.append((item.path, json.load(f)))
+                except (OSError, ValueError):
+                    continue
+        with os.scandir(self.root) as it:
+            for item in it:
+                if item.is_file() and BLOB_NAME_RE.match(item.name):
+                    stat = item.stat()
+                    blobs[item.name] = (max(stat.st_atime, stat.st_mtime), stat.st_size)
+        return entries, blobs
+
+    def _evict(self, keep=None):
+        with self._lock:
+            now = time.time()
+            try:
+                entries, blobs = self._scan()
+            except OSError as e:
+                logger.warning(f"Could not scan image store {self.root}: {e}")
+                return
+
+            referenced = set()
+            for path, entry in entries:
+                if now - entry.get("stored_at", 0) > self.ttl_seconds or entry.get("file") not in blobs:
+                    self._remove(path)
+                else:
+                    referenced.add(entry["file"])
+
+            # Unreferenced blobs go first, then the least recently used until under the size budget
+            order = sorted(blobs, key=lambda name: (name in referenced, blobs[name][0]))
+            total = sum(size for _, size in blobs.values())
+            for name in order:
+                last_used, size = blobs[name]
+                if name == keep:
+                    continue
+                if name in referenced:
+                    if total <= self.max_bytes:
+                        break
+                elif now - last_used <= UNREFERENCED_GRACE_SECONDS:
+                    continue
+                if self._remove(os.path.join(self.root, name)):
+                    total -= size
+                    logger.info(f"Evicted image {name} from image store")
+
+    def stats(self):
+        try:
+            entries, blobs = self._scan()
+        except OSError:
+            entries, blobs = [], {}
+        return {
+            "queries": len(entries),
+            "images": len(blobs),
+            "bytes": sum(size for _, size in blobs.values()),
+            "max_bytes": self.max_bytes,
+        }
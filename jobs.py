@@ -0,0 +1,166 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Job lifecycle states
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue cannot accept more pending jobs."""
+
+
+class Job:
+    def __init__(self, topic, preference):
+        self.id = uuid.uuid4().hex
+        self.topic = topic
+        self.preference = preference
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # Ordered progress events; an event's ID is its index in this list
+        self.events = []
+        self._events_changed = threading.Condition()
+        self._done_callbacks = []
+        self.emit("queued")
+
+    def emit(self, event, **data):
+        """Appends a progress event and wakes any streaming listeners."""
+        data.setdefault("timestamp", time.time())
+        with self._events_changed:
+            self.events.append((event, data))
+            self._events_changed.notify_all()
+
+    def wait_for_events(self, after, timeout=None):
+        """Returns events with an ID of at least `after`, blocking up to timeout seconds for new ones."""
+        with self._events_changed:
+            if len(self.events) <= after and not self.done:
+                self._events_changed.wait(timeout)
+            return [(i, self.events[i]) for i in range(after, len(self.events))]
+
+    @property
+    def done(self):
+        return self.status in (SUCCEEDED, FAILED)
+
+    def add_done_callback(self, fn):
+        """Calls fn(job) once the job has finished, straight away if it already has."""
+        with self._events_changed:
+            if not self.done:
+                self._done_callbacks.append(fn)
+                return
+        fn(self)
+
+    def _finish(self, status):
+        with self._events_changed:
+            self.status = status
+            callbacks, self._done_callbacks = self._done_callbacks, []
+            self._events_changed.notify_all()
+        for fn in callbacks:
+            try:
+                fn(self)
+            except Exception as e:
+                logger.error(f"Done callback for job {self.id} failed: {e}", exc_info=True)
+
+    def to_dict(self):
+        """Returns a JSON-serialisable view of the job for the status endpoint."""
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "topic": self.topic,
+            "preference": self.preference,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.status == SUCCEEDED:
+            data["result"] = self.result
+        elif self.status == FAILED:
+            data["error"] = self.error
+        return data
+
+
+class JobQueue:
+    """Bounded worker pool that runs note generation jobs off the request thread."""
+
+    def __init__(self, max_workers=None, max_pending=None, retention_seconds=None):
+        self.max_workers = max_workers or int(os.environ.get("MAX_CONCURRENT_JOBS", 2))
+        self.max_pending = max_pending or int(os.environ.get("MAX_PENDING_JOBS", 20))
+        self.retention_seconds = retention_seconds or int(os.environ.get("JOB_RETENTION_SECONDS", 3600))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="notes-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, target, topic, preference, *args, **kwargs):
+        """Queues target(topic, preference, *args, progress=job.emit, **kwargs) and returns the new Job immediately."""
+        return self.submit_many(target, [(topic, preference)], *args, **kwargs)[0]
+
+    def submit_many(self, target, items, *args, **kwargs):
+        """Queues one job per (topic, preference) item, all or none. Returns the new Jobs in order."""
+        jobs = [Job(topic, preference) for topic, preference in items]
+        with self._lock:
+            self._prune_locked()
+            pending = sum(1 for j in self._jobs.values() if not j.done)
+            if pending + len(jobs) > self.max_pending:
+                raise QueueFullError(f"Too many pending jobs ({pending}), try again later.")
+            for job in jobs:
+                self._jobs[job.id] = job
+        for job in jobs:
+            self._executor.submit(self._run, job, target, args, kwargs)
+            logger.info(f"Queued job {job.id} for topic: '{job.topic}'")
+        return jobs
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            counts = {QUEUED: 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 0}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        counts["max_workers"] = self.max_workers
+        return counts
+
+    def shutdown(self, wait=True):
+        """Stops accepting work; with wait=True, blocks until running jobs have drained."""
+        logger.info("Shutting down job queue...")
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _run(self, job, target, args, kwargs):
+        job.status = RUNNING
+        job.started_at = time.time()
+        job.emit("started")
+        logger.info(f"Job {job.id} started")
+        try:
+            result = target(job.topic, job.preference, *args, progress=job.emit, **kwargs)
+            job.result = result
+            job.finished_at = time.time()
+            # Emit the terminal event before flipping status so listeners never see done without it
+            job.emit("done", result=result, elapsed=job.finished_at - job.started_at)
+            job._finish(SUCCEEDED)
+            logger.info(f"Job {job.id} succeeded in {job.finished_at - job.started_at:.1f}s")
+        except Exception as e:
+            job.error = str(e)
+            job.finished_at = time.time()
+            # Not "error": EventSource reserves that name for connection errors
+            job.emit("failed", error=job.error, elapsed=job.finished_at - job.started_at)
+            job._finish(FAILED)
+            logger.error(f"Job {job.id} failed: {e}", exc_info=True)
+
+    def _prune_locked(self):
+        # Forget finished jobs once their results are past the retention window
+        cutoff = time.time() - self.retention_seconds
+        expired = [job_id for job_id, job in self._jobs.items() if job.done and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
@@ -0,0 +1,385 @@
+import bisect
+import hashlib
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import struct
+import threading
+import time
+from array import array
+from collections import defaultdict
+from contextlib import contextmanager
+
+from page_cache import tokenize
+
+try:
+    import fcntl
+except ImportError:  # Windows: file_lock() falls back to an exclusive lock file
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+SNAPSHOT_MAGIC = b"NOTESIDX1\n"
+DOCUMENTS_NAME_RE = re.compile(r"^documents\.(\d+)\.jsonl$")
+# A lock file older than this was left behind by a process that died holding it
+STALE_LOCK_SECONDS = 60
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive lock shared by every process using `path`: flock() where available, else a lock file."""
+    if fcntl is not None:
+        with open(path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) > STALE_LOCK_SECONDS:
+                    os.remove(path)
+                    continue
+            except OSError:
+                continue
+            time.sleep(0.01)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(path)
+
+
+class LocalIndex:
+    """Disk-backed BM25 index over every snippet and page passage the search tools have fetched.
+
+    Documents are appended to documents.<generation>.jsonl, which is the source of truth:
+    every process indexes the file from where it last stopped before answering a query, so
+    documents added by other workers are picked up too. Postings are kept per term as two
+    uint32 arrays (document ids and term frequencies) rather than lists of Python ints.
+    index.bin is a snapshot of those arrays plus the generation and byte offset it covers,
+    written at most every LOCAL_INDEX_SAVE_SECONDS, so a restart loads the arrays and only
+    re-tokenizes the documents appended since. Duplicate (url, text) pairs are indexed once.
+    Once more than LOCAL_INDEX_MAX_DOCUMENTS are indexed, the oldest are dropped: the newest
+    three quarters are copied into the next generation's file, the postings are renumbered
+    in place and a snapshot is saved, and the other workers reload from that snapshot.
+    """
+
+    def __init__(self, index_dir=None, save_seconds=None, max_documents=None):
+        self.index_dir = index_dir or os.environ.get("LOCAL_INDEX_DIR", os.path.join("cache", "index"))
+        self.save_seconds = save_seconds or int(os.environ.get("LOCAL_INDEX_SAVE_SECONDS", 60))
+        self.max_documents = max_documents or int(os.environ.get("LOCAL_INDEX_MAX_DOCUMENTS", 50000))
+        self.enabled = os.environ.get("LOCAL_INDEX_ENABLED", "1") != "0"
+        self.snapshot_path = os.path.join(self.index_dir, "index.bin")
+        self.lock_path = os.path.join(self.index_dir, "documents.lock")
+        self.queries = 0
+        self.compactions = 0
+        self._lock = threading.RLock()
+        self._saved_at = time.time()
+        self._generation = 0
+        self._reset()
+        os.makedirs(self.index_dir, exist_ok=True)
+        if self.enabled:
+            self._generation = self._current_generation()
+            self._load_snapshot()
+
+    def _reset(self):
+        self._covered_bytes = 0  # prefix of the documents file that is indexed
+        self._offsets = array("Q")  # doc id -> byte offset of its line in the documents file
+        self._lengths = array("I")  # doc id -> number of tokens
+        self._total_length = 0
+        self._digests = set()
+        self._digest_list = array("Q")
+        self._postings = {}  # term -> (array of doc ids, array of term frequencies)
+        self._unsaved = 0
+
+    def _documents_path(self, generation):
+        return os.path.join(self.index_dir, f"documents.{generation}.jsonl")
+
+    @property
+    def documents_path(self):
+        return self._documents_path(self._generation)
+
+    def _current_generation(self):
+        generations = [0]
+        try:
+            for name in os.listdir(self.index_dir):
+                match = DOCUMENTS_NAME_RE.match(name)
+                if match:
+                    generations.append(int(match.group(1)))
+        except OSError:
+            pass
+        return max(generations)
+
+    @staticmethod
+    def _digest(url, text):
+        return int.from_bytes(hashlib.sha256(f"{url}\n{text}".encode("utf-8")).digest()[:8], "little")
+
+    def add(self, documents):
+        """Appends (url, title, text) documents and indexes them; returns how many were new."""
+        if not self.enabled:
+            return 0
+        lines = []
+        # The file lock keeps appends from interleaving and from racing another worker's compaction
+        with self._lock, file_lock(self.lock_path):
+            self._catch_up()
+            batch = set()
+            for url, title, text in documents:
+                text = " ".join(str(text).split())
+                digest = self._digest(url, text)
+                if not text or digest in self._digests or digest in batch:
+                    continue
+                batch.add(digest)
+                lines.append(json.dumps({"url": url, "title": title, "text": text}) + "\n")
+            if not lines:
+                return 0
+            try:
+                with open(self.documents_path, "ab") as f:
+                    f.write("".join(lines).encode("utf-8"))
+            except OSError as e:
+                logger.warning(f"Could not append to local index {self.documents_path}: {e}")
+                return 0
+            self._catch_up()
+            if len(self._offsets) > self.max_documents:
+                self._compact()
+            elif time.time() - self._saved_at >= self.save_seconds:
+                self.save()
+        return len(lines)
+
+    def _catch_up(self):
+        """Indexes whatever was appended to the documents file since the last call."""
+        generation = self._current_generation()
+        if generation != self._generation:
+            # Another worker compacted the documents; start over from its snapshot
+            self._generation = generation
+            self._reset()
+            self._load_snapshot()
+        try:
+            size = os.path.getsize(self.documents_path)
+        except OSError:
+            size = 0
+        if size < self._covered_bytes:
+            logger.warning(f"{self.documents_path} shrank, rebuilding the local index")
+            self._reset()
+        if size == self._covered_bytes:
+            return
+        with open(self.documents_path, "rb") as f:
+            f.seek(self._covered_bytes)
+            data = f.read(size - self._covered_bytes)
+        offset = self._covered_bytes
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break  # a write still in progress; picked up next time
+            self._index_line(offset, line)
+            offset += len(line)
+        self._covered_bytes = offset
+
+    def _index_line(self, offset, line):
+        try:
+            document = json.loads(line)
+        except ValueError:
+            logger.warning(f"Skipping unreadable local index document at byte {offset}")
+            return
+        digest = self._digest(document["url"], document["text"])
+        if digest in self._digests:
+            return
+        tokens = tokenize(f"{document['title']} {document['text']}")
+        doc_id = len(self._offsets)
+        self._offsets.append(offset)
+        self._lengths.append(len(tokens))
+        self._total_length += len(tokens)
+        self._digests.add(digest)
+        self._digest_list.append(digest)
+        frequencies = defaultdict(int)
+        for token in tokens:
+            frequencies[token] += 1
+        for term, frequency in frequencies.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array("I"), array("I"))
+            postings[0].append(doc_id)
+            postings[1].append(frequency)
+        self._unsaved += 1
+
+    def _compact(self):
+        """Keeps the newest documents in the next generation's file. Called holding both locks."""
+        keep = self.max_documents * 3 // 4
+        first = len(self._offsets) - keep
+        old_path = self.documents_path
+        new_path = self._documents_path(self._generation + 1)
+        tmp_path = f"{new_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        offsets = array("Q")
+        position = 0
+        try:
+            with open(old_path, "rb") as source, open(tmp_path, "wb") as target:
+                for doc_id in range(first, len(self._offsets)):
+                    source.seek(self._offsets[doc_id])
+                    line = source.readline()
+                    offsets.append(position)
+                    target.write(line)
+                    position += len(line)
+            os.replace(tmp_path, new_path)
+        except OSError as e:
+            logger.warning(f"Could not compact local index {old_path}: {e}")
+            return
+
+        # Document ids are ascending in every posting list, so dropping the oldest is a slice
+        postings = {}
+        for term, (doc_ids, frequencies) in self._postings.items():
+            start = bisect.bisect_left(doc_ids, first)
+            if start < len(doc_ids):
+                postings[term] = (array("I", (doc_id - first for doc_id in doc_ids[start:])), frequencies[start:])
+        self._postings = postings
+        self._offsets = offsets
+        self._lengths = self._lengths[first:]
+        self._total_length = sum(self._lengths)
+        self._digest_list = self._digest_list[first:]
+        self._digests = set(self._digest_list)
+        self._covered_bytes = position
+        self._generation += 1
+        self.compactions += 1
+        self.save()
+        try:
+            os.remove(old_path)
+        except OSError:
+            pass
+        logger.info(f"Compacted local index to {keep} documents (generation {self._generation})")
+
+    def search(self, query, limit=5):
+        """Best BM25 matches as dicts with url, title, text, score and coverage (share of query terms matched)."""
+        if not self.enabled:
+            return []
+        terms = set(tokenize(query))
+        with self._lock:
+            self._catch_up()
+            self.queries += 1
+            if not terms or not self._offsets:
+                return []
+            documents = len(self._offsets)
+            average_length = self._total_length / documents
+            scores = defaultdict(float)
+            matched = defaultdict(int)
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                doc_ids, frequencies = postings
+                idf = math.log(1 + (documents - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+                for doc_id, frequency in zip(doc_ids, frequencies):
+                    norm = K1 * (1 - B + B * self._lengths[doc_id] / average_length)
+                    scores[doc_id] += idf * frequency * (K1 + 1) / (frequency + norm)
+                    matched[doc_id] += 1
+            best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+            hits = []
+            try:
+                with open(self.documents_path, "rb") as f:
+                    for doc_id, score in best:
+                        f.seek(self._offsets[doc_id])
+                        document = json.loads(f.readline())
+                        document.update(score=round(score, 3), coverage=matched[doc_id] / len(terms))
+                        hits.append(document)
+            except OSError as e:
+                # Compacted away by another worker between catching up and reading
+                logger.info(f"Local index documents moved while searching: {e}")
+            return hits
+
+    def save(self):
+        """Writes the arrays to index.bin (atomically) so the next start does not re-tokenize everything."""
+        with self._lock:
+            self._catch_up()
+            terms = {}
+            postings = array("I")
+            for term, (doc_ids, frequencies) in self._postings.items():
+                terms[term] = [len(postings), len(doc_ids)]
+                postings.extend(doc_ids)
+                postings.extend(frequencies)
+            header = json.dumps({
+                "generation": self._generation,
+                "covered_bytes": self._covered_bytes,
+                "documents": len(self._offsets),
+                "total_length": self._total_length,
+                "postings": len(postings),
+                "terms": terms,
+            }).encode("utf-8")
+            tmp_path = f"{self.snapshot_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, "wb") as f:
+                    f.write(SNAPSHOT_MAGIC)
+                    f.write(struct.pack("<Q", len(header)))
+                    f.write(header)
+                    for values in (self._offsets, self._lengths, self._digest_list, postings):
+                        values.tofile(f)
+                os.replace(tmp_path, self.snapshot_path)
+            except OSError as e:
+                logger.warning(f"Could not write local index snapshot {self.snapshot_path}: {e}")
+                return
+            self._saved_at = time.time()
+            self._unsaved = 0
+            logger.info(f"Saved local index: {len(self._offsets)} documents, {len(terms)} terms")
+
+    def _load_snapshot(self):
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logger.warning(f"Could not read local index snapshot {self.snapshot_path}: {e}")
+            return
+        try:
+            if not data.startswith(SNAPSHOT_MAGIC):
+                raise ValueError("not a local index snapshot")
+            position = len(SNAPSHOT_MAGIC)
+            (header_length,) = struct.unpack_from("<Q", data, position)
+            position += 8
+            header = json.loads(data[position:position + header_length])
+            position += header_length
+            if header["generation"] != self._generation:
+                raise ValueError(f"snapshot is of generation {header['generation']}, not {self._generation}")
+            documents = header["documents"]
+            if documents > self.max_documents:
+                raise ValueError(f"snapshot holds {documents} documents, limit is {self.max_documents}")
+            arrays = []
+            for typecode, count in (("Q", documents), ("I", documents), ("Q", documents), ("I", header["postings"])):
+                values = array(typecode)
+                end = position + count * values.itemsize
+                values.frombytes(data[position:end])
+                arrays.append(values)
+                position = end
+            if os.path.getsize(self.documents_path) < header["covered_bytes"]:
+                raise ValueError(f"{self.documents_path} is shorter than the snapshot")
+        except (ValueError, KeyError, struct.error, OSError) as e:
+            logger.warning(f"Ignoring local index snapshot {self.snapshot_path}: {e}")
+            return
+
+        self._offsets, self._lengths, self._digest_list, postings = arrays
+        self._digests = set(self._digest_list)
+        self._total_length = header["total_length"]
+        self._covered_bytes = header["covered_bytes"]
+        self._postings = {term: (postings[start:start + count], postings[start + count:start + 2 * count])
+                          for term, (start, count) in header["terms"].items()}
+        logger.info(f"Loaded local index: {documents} documents, {len(self._postings)} terms")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "documents": len(self._offsets),
+                "max_documents": self.max_documents,
+                "terms": len(self._postings),
+                "queries": self.queries,
+                "compactions": self.compactions,
+                "unsaved": self._unsaved,
+            }
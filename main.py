@@ -1,25 +1,40 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_file
 from crewai import Crew
 from textwrap import dedent
-from agents import CustomAgents
+from agents import CustomAgents, warm_up_agents
 from tasks import CustomTasks
-from fpdf import FPDF
 import os
 from dotenv import load_dotenv
-import requests
-from serpapi import GoogleSearch
+import http_client
 import re
 from colorama import Fore, Style
-from PIL import Image
 import logging
 import json # Import json for potential agent output parsing
 import asyncio # Import asyncio
+import time
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed
+from urllib.parse import urlparse
+from jobs import JobQueue, QueueFullError, FAILED, SUCCEEDED
+from batches import Batch, BatchRegistry, OUTPUT_FORMATS
+from result_cache import ResultCache
+from similarity import SimilarNotes
+from formatting import normalize_markers
+from budget import BudgetExceeded, RequestBudget
+from image_normalizer import ImageRejected, normalize_image
+from image_store import ImageStore
+from pdf_engine import NotesRenderer, PDFEngine
+from pdf_store import PdfStore
+from research import ResearchFanOut, wants_fanout
+import telemetry
+from Tools.search_tool import local_index, page_cache, search_cache
 
 load_dotenv()
  
 # Setup logging
 logging.basicConfig(
-    level=logging.DEBUG,  # Changed from INFO to DEBUG
+    level=os.environ.get("LOG_LEVEL", "DEBUG").upper(),  # Set LOG_LEVEL=INFO in production
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
@@ -29,8 +44,40 @@ logger = logging.getLogger(__name__)
 # static_url_path='' means requests like /assets/file.js map to dist/assets/file.js
 app = Flask(__name__, static_folder='dist', static_url_path='')
 
+# Background worker pool for note generation (size with MAX_CONCURRENT_JOBS)
+job_queue = JobQueue()
+# Multi-topic requests (/api/batches); their items run as ordinary jobs on job_queue
+batch_registry = BatchRegistry(max_jobs=job_queue.max_pending)
+
+# Image search/download runs here concurrently with the crew (see prefetch_image)
+image_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("IMAGE_PREFETCH_WORKERS", 4)), thread_name_prefix="image-prefetch")
+# How long the PDF stage waits for a prefetched image that is still downloading
+IMAGE_WAIT_SECONDS = float(os.environ.get("IMAGE_WAIT_SECONDS", 5))
+
+# Validated images shared across requests, deduplicated by content
+image_store = ImageStore()
+
+# Shared font state for every PDF render
+pdf_engine = PDFEngine()
+# Rendered PDFs and batch zips, named by content and served from /pdf/<name>
+pdf_store = PdfStore()
+
+# On-disk cache of finished notes keyed on (topic, preference, prompt version)
+result_cache = ResultCache()
+# Earlier notes on near-identical topics ("photosynthesis basics" vs "Photosynthesis")
+similar_notes = SimilarNotes(result_cache)
+
 def search_unsplash(query, num_images=1):
-    """Searches for images using both SerpAPI and Unsplash."""
+    """Searches for images using both SerpAPI and Unsplash, reusing the image store when possible."""
+    with telemetry.span("image_search") as fields:
+        stored_path = image_store.lookup(query)
+        fields["store_hit"] = bool(stored_path)
+        if stored_path:
+            return [stored_path]
+        return _search_image_apis(query)
+
+def _search_image_apis(query):
+    """Queries SerpAPI, then Unsplash, and stores the first candidate that downloads and validates."""
     validated_image_paths = []
     try:
         # Try SerpAPI first
@@ -45,8 +92,8 @@ def search_unsplash(query, num_images=1):
                 "num": 5
             }
             
-            search = GoogleSearch(params)
-            results = search.get_dict()
+            # Same request serpapi's GoogleSearch.get_dict() makes, over the shared pooled session
+            results = http_client.session.get("https://serpapi.com/search.json", params=params).json()
             
             if "error" in results:
                 logger.error(f"SerpAPI error: {results['error']}")
@@ -67,343 +114,754 @@ def search_unsplash(query, num_images=1):
                     "per_page": 5
                 }
                 
-                response = requests.get(url, headers=headers, params=params)
+                response = http_client.session.get(url, headers=headers, params=params)
                 if response.status_code == 200:
                     results = response.json()
                     if results.get("results"):
                         logger.info(f"Found {len(results['results'])} images from Unsplash")
-                        for photo in results["results"]:
-                            image_url = photo.get("urls", {}).get("regular")
-                            if image_url:
-                                validated_image_paths.extend(process_image_results([{"original": image_url}], query))
-                                break
+                        candidates = [{"original": photo.get("urls", {}).get("regular")} for photo in results["results"]]
+                        validated_image_paths.extend(process_image_results(candidates, query))
 
         if not validated_image_paths:
             logger.warning("No images found from either API")
+        else:
+            # Move the winner into the content-addressed store so later requests reuse it
+            validated_image_paths = [image_store.add(query, validated_image_paths[0])]
             
     except Exception as e:
         logger.error(f"Error during image search process: {e}", exc_info=True)
 
     return validated_image_paths
 
-def process_image_results(image_results, query):
-    """Process and validate image results from either API."""
-    validated_paths = []
-    images_dir = os.path.join(os.getcwd(), "images")
-    os.makedirs(images_dir, exist_ok=True)
+IMAGE_DOWNLOAD_WORKERS = int(os.environ.get("IMAGE_DOWNLOAD_WORKERS", 5))
+IMAGE_MAX_BYTES = int(os.environ.get("IMAGE_MAX_BYTES", 10 * 1024 * 1024))
+IMAGE_DOWNLOAD_TIMEOUT = (5, 20)  # (connect, read) seconds
+# Some image hosts serve images with a generic binary type; ensure_valid_jpeg checks the bytes anyway
+ALLOWED_IMAGE_CONTENT_TYPES = ("application/octet-stream", "binary/octet-stream")
+
+# Per-host download latency, exposed at /api/images/stats
+image_host_stats = {}
+image_host_stats_lock = threading.Lock()
+
+def _record_image_download(image_url, seconds, outcome, size=0):
+    host = urlparse(image_url).netloc or "unknown"
+    telemetry.record("image_download", seconds, outcome, bytes=size, host=host)
+    with image_host_stats_lock:
+        stats = image_host_stats.setdefault(host, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0, "outcomes": {}})
+        stats["count"] += 1
+        stats["total_seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+        stats["outcomes"][outcome] = stats["outcomes"].get(outcome, 0) + 1
+    logger.info(f"Image candidate {image_url} finished in {seconds:.2f}s ({outcome})")
+
+class DownloadCancelled(Exception):
+    pass
+
+class _ImageRace:
+    """Shared state for one set of candidate downloads; the first validated image wins."""
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._claimed = False
+
+    def claim(self):
+        """Returns True for the first caller only and cancels the other downloads."""
+        with self._lock:
+            if self._claimed:
+                return False
+            self._claimed = True
+            self.cancelled.set()
+            return True
+
+def _remove_quietly(path):
+    if path and os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
 
-    for image_info in image_results:
-        image_url = image_info.get("original")
-        if not image_url:
-            continue
+def _download_candidate(image_url, query, images_dir, race):
+    """Streams one candidate to disk, validates it and tries to claim the race. Returns the final path or None."""
+    if race.cancelled.is_set():
+        return None
 
-        downloaded_filepath = None
-        try:
-            file_extension = os.path.splitext(image_url)[1]
-            if not file_extension or file_extension.lower() not in ['.jpg', '.jpeg', '.png', '.gif']:
-                file_extension = '.jpg'
-            safe_query = re.sub(r'[^a-zA-Z0-9_]', '', query)[:30]
-            temp_filename = f"temp_{safe_query}_{os.urandom(4).hex()}{file_extension}"
-            filepath = os.path.join(images_dir, temp_filename)
-
-            logger.info(f"Attempting to download image from URL: {image_url}")
-            response = requests.get(image_url, timeout=20)
+    file_extension = os.path.splitext(urlparse(image_url).path)[1]
+    if not file_extension or file_extension.lower() not in ['.jpg', '.jpeg', '.png', '.gif']:
+        file_extension = '.jpg'
+    safe_query = re.sub(r'[^a-zA-Z0-9_]', '', query)[:30]
+    temp_filename = f"temp_{safe_query}_{os.urandom(4).hex()}{file_extension}"
+    downloaded_filepath = os.path.join(images_dir, temp_filename)
+    validated_path = None
+    started = time.time()
+    outcome = "error"
+    size = 0
+    try:
+        logger.info(f"Attempting to download image from URL: {image_url}")
+        with http_client.session.get(image_url, timeout=IMAGE_DOWNLOAD_TIMEOUT, stream=True) as response:
             response.raise_for_status()
-            with open(filepath, 'wb') as file:
-                file.write(response.content)
-            logger.info(f"Successfully downloaded candidate image: {filepath}")
-            downloaded_filepath = filepath
-
-            # Validate the downloaded image
+            content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+            if content_type and not content_type.startswith("image/") and content_type not in ALLOWED_IMAGE_CONTENT_TYPES:
+                outcome = "bad_content_type"
+                raise ValueError(f"Unexpected content type '{content_type}'")
+            content_length = response.headers.get("Content-Length")
+            if content_length and content_length.isdigit() and int(content_length) > IMAGE_MAX_BYTES:
+                outcome = "too_large"
+                raise ValueError(f"Image is {content_length} bytes, limit is {IMAGE_MAX_BYTES}")
+
+            size = 0
+            with open(downloaded_filepath, 'wb') as file:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    if race.cancelled.is_set():
+                        raise DownloadCancelled()
+                    size += len(chunk)
+                    if size > IMAGE_MAX_BYTES:
+                        outcome = "too_large"
+                        raise ValueError(f"Image exceeded {IMAGE_MAX_BYTES} bytes")
+                    file.write(chunk)
+        logger.info(f"Successfully downloaded candidate image: {downloaded_filepath}")
+
+        # Validate the downloaded image
+        with telemetry.span("image_validate", bytes=size) as fields:
             validated_path = ensure_valid_jpeg(downloaded_filepath)
             if validated_path:
-                logger.info(f"Image validated successfully: {validated_path}")
-                safe_query = re.sub(r'[^a-zA-Z0-9_]', '', query)[:30]
-                final_filename = f"{safe_query}{os.path.splitext(validated_path)[1]}"
-                final_filepath = os.path.join(images_dir, final_filename)
-                if os.path.exists(final_filepath) and final_filepath != validated_path:
-                    final_filename = f"{safe_query}_{os.urandom(4).hex()}{os.path.splitext(validated_path)[1]}"
-                    final_filepath = os.path.join(images_dir, final_filename)
-
-                try:
-                    os.rename(validated_path, final_filepath)
-                    logger.info(f"Validated and finalized image: {final_filepath}")
-                    validated_paths.append(final_filepath)
-                    if validated_path != downloaded_filepath and os.path.exists(downloaded_filepath):
-                        try:
-                            os.remove(downloaded_filepath)
-                        except OSError:
-                            pass
-                    break
-                except OSError as e:
-                    logger.warning(f"Could not rename validated image: {e}")
-                    if os.path.exists(validated_path):
-                        try:
-                            os.remove(validated_path)
-                        except OSError:
-                            pass
+                fields["output_bytes"] = os.path.getsize(validated_path)
+        if not validated_path:
+            outcome = "invalid_image"
+            return None
+        if not race.claim():
+            outcome = "lost_race"
+            return None
+        outcome = "ok"
+        logger.info(f"Image validated successfully: {validated_path}")
+
+        final_filename = f"{safe_query}{os.path.splitext(validated_path)[1]}"
+        final_filepath = os.path.join(images_dir, final_filename)
+        if os.path.exists(final_filepath) and final_filepath != validated_path:
+            final_filename = f"{safe_query}_{os.urandom(4).hex()}{os.path.splitext(validated_path)[1]}"
+            final_filepath = os.path.join(images_dir, final_filename)
+        try:
+            os.rename(validated_path, final_filepath)
+        except OSError as e:
+            logger.warning(f"Could not rename validated image: {e}")
+            outcome = "error"
+            return None
+        logger.info(f"Validated and finalized image: {final_filepath}")
+        validated_path = final_filepath
+        return final_filepath
+
+    except DownloadCancelled:
+        outcome = "cancelled"
+        return None
+    except Exception as e:
+        logger.warning(f"Error processing image {image_url}: {e}")
+        return None
+    finally:
+        _record_image_download(image_url, time.time() - started, outcome, size)
+        if outcome != "ok":
+            _remove_quietly(validated_path)
+        if validated_path != downloaded_filepath:
+            _remove_quietly(downloaded_filepath)
 
-        except Exception as e:
-            logger.warning(f"Error processing image: {e}")
-            if downloaded_filepath and os.path.exists(downloaded_filepath):
-                try:
-                    os.remove(downloaded_filepath)
-                except OSError:
-                    pass
+def process_image_results(image_results, query):
+    """Downloads all candidates concurrently and keeps the first one that validates."""
+    images_dir = os.path.join(os.getcwd(), "images")
+    os.makedirs(images_dir, exist_ok=True)
+
+    image_urls = [info.get("original") for info in image_results if info.get("original")]
+    if not image_urls:
+        return []
+
+    race = _ImageRace()
+    pool = ThreadPoolExecutor(max_workers=min(len(image_urls), IMAGE_DOWNLOAD_WORKERS), thread_name_prefix="image-download")
+    download = telemetry.in_context(_download_candidate)  # keep the downloads in the request's trace
+    futures = [pool.submit(download, url, query, images_dir, race) for url in image_urls]
+    validated_paths = []
+    try:
+        for future in as_completed(futures):
+            final_path = future.result()
+            if final_path:
+                validated_paths.append(final_path)
+                break
+    finally:
+        # Losers notice race.cancelled between chunks and clean up after themselves
+        race.cancelled.set()
+        pool.shutdown(wait=False, cancel_futures=True)
 
     return validated_paths
 
-# Add image validation and conversion function
 def ensure_valid_jpeg(image_path):
+    """Checks a downloaded image and normalizes it for the PDF. Returns the path to embed, or None."""
     if not image_path or not os.path.exists(image_path):
         logger.warning(f"Image path does not exist or is empty: {image_path}")
         return None
     try:
-        # Try to open the image with PIL
-        img = Image.open(image_path)
-        
-        # Check if format is already supported by FPDF (JPG, PNG, GIF)
-        if img.format in ('JPEG', 'PNG', 'GIF'):
-            logger.info(f"Image {image_path} is already in a supported format ({img.format}).")
-            return image_path # Return original path, no conversion needed
-
-        # If not supported or format is unknown/different, proceed to convert to JPEG
-        logger.info(f"Image format ({img.format}) not directly supported or needs conversion. Converting to JPEG.")
-        jpeg_path = os.path.splitext(image_path)[0] + '_converted.jpg'
-
-        # Convert to RGB mode if necessary (e.g., for PNG with transparency, GIF)
-        if img.mode in ('RGBA', 'LA', 'P'):
-            # Create a white background image
-            background = Image.new('RGB', img.size, (255, 255, 255))
-            try:
-                # Paste the image onto the background using the alpha channel if available
-                background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
-            except IndexError:
-                # Handle cases where split doesn't work as expected (e.g., non-alpha palette)
-                background.paste(img)
-            img = background
-        else:
-            # Ensure it is RGB before saving as JPEG
-            img = img.convert('RGB')
-
-        img.save(jpeg_path, 'JPEG', quality=95)
-        logger.info(f"Converted image {image_path} to {jpeg_path}")
-        return jpeg_path
-
+        # Downscaled to the drawn size, metadata stripped, re-encoded as JPEG or palette PNG
+        return normalize_image(image_path)
+    except ImageRejected as e:
+        logger.warning(f"Rejected image {image_path}: {e}")
+        return None
     except Exception as e:
         logger.error(f"Error processing image {image_path}: {str(e)}", exc_info=True)
         return None
 
+def _no_progress(event, **data):
+    pass
+
+# "full" chains research -> structuring; "fast" does research and formatting in one agent
+# pass. In full mode, long-preference requests research their subtopics concurrently (see
+# research.ResearchFanOut). Either way normalize_markers tidies the markdown locally and
+# NotesRenderer lays it out directly, so no LLM pass is spent on PDF formatting
+CREW_MODES = ("full", "fast")
+DEFAULT_CREW_MODE = os.environ.get("CREW_MODE", "full")
+
 class CustomCrew:
-    def __init__(self, topic, preference):
+    def __init__(self, topic, preference, mode=DEFAULT_CREW_MODE, callbacks=None, budget=None, seed=None):
+        if mode not in CREW_MODES:
+            raise ValueError(f"Unknown crew mode '{mode}', expected one of {CREW_MODES}")
         self.topic = topic
         self.preference = preference
- 
-    def run(self):
-        # Define your custom agents and tasks in agents.py and tasks.py
-        agents = CustomAgents()
-        tasks = CustomTasks()
- 
+        self.mode = mode
+        self.callbacks = callbacks
+        self.budget = budget
+        self.seed = seed  # (topic, markdown) of earlier notes to build on, see SimilarNotes
+        self.degraded = False
+        self._stage_started = None
+        self._stage_tokens = 0
+        self._last_output = None
+
+    def _finish_stage(self, task_name, text, progress):
+        """Reports a finished stage's output and duration and starts timing the next one."""
+        now = time.time()
+        self._last_output = text
+        tokens = None
+        if self.budget is not None:
+            tokens = self.budget.total_tokens - self._stage_tokens
+            self._stage_tokens = self.budget.total_tokens
+        telemetry.record("crew_task", now - self._stage_started, task_name,
+                         bytes=len(text.encode("utf-8")), tokens=tokens)
+        progress("task_completed", task=task_name, duration=now - self._stage_started, markdown=text)
+        self._stage_started = now
+
+    def _task_callback(self, task_name, progress):
+        """Builds a crewAI task callback that reports the finished task's output and duration."""
+        def callback(output):
+            self._finish_stage(task_name, str(output.result), progress)
+        return callback
+
+    def _build_full_crew(self, agents, tasks, progress):
         # Define your custom agents
         data_agent = agents.data_agent()
         structure_agent = agents.Structure_agent()
-        pdf_agent = agents.pdf_agent()
  
         # Define your custom tasks
-        data_task = tasks.generate_notes_task(data_agent, self.topic, self.preference)
+        data_task = tasks.generate_notes_task(data_agent, self.topic, self.preference, seed=self.seed)
         structuring_task = tasks.structure_content_task(structure_agent, data_task)
-        pdf_task = tasks.generate_pdf_task(pdf_agent, structuring_task)
+
+        data_task.callback = self._task_callback("data_task", progress)
+        structuring_task.callback = self._task_callback("structuring_task", progress)
  
         # Define your custom crew
-        crew = Crew(
-            agents=[data_agent, structure_agent, pdf_agent],
-            tasks=[data_task, structuring_task, pdf_task],
+        return Crew(
+            agents=[data_agent, structure_agent],
+            tasks=[data_task, structuring_task],
+            verbose=True,
+        )
+
+    def _build_fanout_crew(self, agents, tasks, progress):
+        """Full mode with the research stage fanned out over subtopics; None if it found nothing."""
+        research = ResearchFanOut(agents.llm, budget=self.budget).run(self.topic, self.preference)
+        if research is None:
+            return None
+        # Reported as data_task: it replaces that task and the dashboard labels it as such
+        self._finish_stage("data_task", research, progress)
+
+        structure_agent = agents.Structure_agent()
+        structuring_task = tasks.structure_content_task(structure_agent, research)
+        structuring_task.callback = self._task_callback("structuring_task", progress)
+        return Crew(
+            agents=[structure_agent],
+            tasks=[structuring_task],
+            verbose=True,
+        )
+
+    def _build_fast_crew(self, agents, tasks, progress):
+        data_agent = agents.data_agent()
+        notes_task = tasks.generate_formatted_notes_task(data_agent, self.topic, self.preference, seed=self.seed)
+        notes_task.callback = self._task_callback("notes_task", progress)
+        return Crew(
+            agents=[data_agent],
+            tasks=[notes_task],
             verbose=True,
         )
+ 
+    def run(self, progress=_no_progress):
+        # Define your custom agents and tasks in agents.py and tasks.py
+        agents = CustomAgents(callbacks=self.callbacks, budget=self.budget)
+        tasks = CustomTasks()
+
         try:
+            self._stage_started = time.time()
+            crew = None
+            if self.mode == "fast":
+                crew = self._build_fast_crew(agents, tasks, progress)
+            elif wants_fanout(self.preference) and not self.seed:
+                # Seeded runs adapt earlier notes and search little, so they stay serial
+                crew = self._build_fanout_crew(agents, tasks, progress)
+                if crew is None:
+                    logger.warning(f"Fanned-out research found nothing for '{self.topic}', researching serially.")
+            if crew is None:
+                crew = self._build_full_crew(agents, tasks, progress)
             result = crew.kickoff()
-            logger.info("CrewAI process completed successfully.")
-            return result
+            logger.info(f"CrewAI process completed successfully ({self.mode} mode).")
+            return normalize_markers(result, title=self.topic)
+        except BudgetExceeded as e:
+            # Degrade to the furthest finished task, else to the raw search results
+            result = self._last_output or self.budget.fallback_notes(self.topic)
+            progress("budget_exceeded", reason=e.reason, partial=bool(result))
+            if not result:
+                raise
+            logger.warning(f"{e}; returning the best content so far ({self.mode} mode).")
+            self.degraded = True
+            return normalize_markers(result, title=self.topic)
         except Exception as e:
             logger.error(f"CrewAI kickoff failed: {e}", exc_info=True)
             raise # Re-raise the exception to be caught by the API endpoint
 
-# Helper function to add the image
-def _add_image_to_pdf(pdf, image_path):
-    """Adds a single centered image to the PDF, handling page breaks."""
-    try:
-        img = Image.open(image_path)
-        img_w, img_h = img.size
-        aspect_ratio = img_h / img_w
-        display_w = 120 # Keep the width consistent
-        display_h = display_w * aspect_ratio
-        page_height = pdf.h - pdf.t_margin - pdf.b_margin
-
-        pdf.ln(7) # Add vertical space before the image
-        current_y = pdf.get_y()
-
-        # Check if image fits on the current page
-        if current_y + display_h > page_height:
-            pdf.add_page()
-            current_y = pdf.t_margin # Reset Y to top margin on new page
-
-        # Calculate centered X position
-        image_x = (pdf.w - display_w) / 2
-
-        pdf.image(image_path, x=image_x, y=current_y, w=display_w)
-        pdf.set_y(current_y + display_h) # Move cursor below the image
-        logger.info(f"Added image {image_path} to PDF.")
-        return True # Indicate success
-    except Exception as e:
-        logger.error(f"Error adding image {image_path} to PDF: {str(e)}", exc_info=True)
-        return False # Indicate failure
+def prefetch_image(query, progress=_no_progress):
+    """Starts the image search/download on the prefetch pool so it overlaps with the crew run."""
+    started = time.time()
+    future = image_executor.submit(telemetry.in_context(search_unsplash), query, num_images=1)
+
+    def report(done_future):
+        found = not done_future.exception() and bool(done_future.result())
+        progress("image_search", duration=time.time() - started, found=found)
+
+    future.add_done_callback(report)
+    return future
+
+def create_pdf_file(topic, result_text, progress=_no_progress, image_future=None):
+    """Renders notes into the PDF store as notes_<topic>_<digest>.pdf and returns its URL path, or None on failure.
+
+    result_text may be the whole markdown string or any iterable of markdown chunks; chunks
+    are laid out as they arrive, so rendering overlaps with whatever is producing them.
+    """
+    timings = {"image_wait": 0.0}
+
+    def image_source(document_title):
+        started = time.time()
+        validated_image_paths = []
+        if image_future is not None:
+            # Image was prefetched while the crew ran; only wait up to the deadline for it
+            try:
+                validated_image_paths = image_future.result(timeout=IMAGE_WAIT_SECONDS)
+            except FuturesTimeoutError:
+                logger.warning(f"Prefetched image not ready after {IMAGE_WAIT_SECONDS}s, rendering without it.")
+            except Exception as e:
+                logger.error(f"Image prefetch failed: {e}", exc_info=True)
+        else:
+            # No prefetch: search now, using the generated title when one has been rendered
+            search_term = document_title or topic
+            logger.info(f"Searching for single validated image using base term: {search_term}")
+            validated_image_paths = search_unsplash(search_term, num_images=1)
+            progress("image_search", duration=time.time() - started, found=bool(validated_image_paths))
+        timings["image_wait"] = time.time() - started
+        return validated_image_paths[0] if validated_image_paths else None
 
-def create_pdf_file(topic, result_text):
-    pdf_file_path = ""
     try:
-        main_content = result_text.strip()
-        document_title = topic
-        first_line = main_content.split('\n', 1)[0].strip()
-        if first_line.startswith('# '):
-            document_title = first_line[2:].strip()
-
-        pdf = FPDF()
-        default_font_size = 11
-        font_name = "Helvetica"
-        use_fallback_encoding = True
-        try:
-            pdf.add_font("DejaVu", "", "DejaVuSans.ttf")
-            pdf.add_font("DejaVu", "B", "DejaVuSans-Bold.ttf")
-            pdf.add_font("DejaVu", "I", "DejaVuSans-Oblique.ttf")
-            font_name = "DejaVu"
-            pdf.set_font(font_name, size=default_font_size)
-            use_fallback_encoding = False
-            logger.info("Using DejaVu font (with Italic) for PDF.")
-        except RuntimeError:
-            logger.warning("DejaVu font not found or Italic style missing. Falling back to Helvetica.")
-            pdf.set_font(font_name, size=default_font_size)
-
-        pdf.add_page()
-        line_height = pdf.font_size_pt * 1.25
-
-        # Fetch and Validate Image Info EARLY (Validation now happens IN search_unsplash)
-        logger.info(f"Searching for single validated image using base term: {document_title}")
-        validated_image_paths = search_unsplash(document_title, num_images=1)
-        valid_image_path = None
-        if validated_image_paths:
-            valid_image_path = validated_image_paths[0]
-            logger.info(f"Using validated image path: {valid_image_path}")
-
-        # Write Main Content (Add image after FIRST H2)
-        lines = main_content.split('\n')
-        is_first_line = True
-        image_added = False
-        first_h2_found = False
-
-        for line in lines:
-            stripped_line = line.strip()
-            if use_fallback_encoding:
-                processed_line = stripped_line.encode('latin-1', 'replace').decode('latin-1')
-            else:
-                processed_line = stripped_line
-
-            is_h2_block = False
-
-            if not processed_line:
-                if not is_first_line:
-                    pdf.ln(line_height * 0.5)
-            elif processed_line.startswith('# '):
-                pdf.set_font(family=font_name, style='', size=default_font_size + 5)
-                pdf.ln(line_height * 0.7)
-                pdf.multi_cell(w=pdf.epw, h=line_height, text=processed_line[2:], ln=1, new_x="LMARGIN", new_y="NEXT")
-                pdf.set_font(family=font_name, style='', size=default_font_size)
-            elif processed_line.startswith('## '):
-                pdf.set_font(family=font_name, style='', size=default_font_size + 3)
-                pdf.ln(line_height * 0.5)
-                pdf.multi_cell(w=pdf.epw, h=line_height, text=processed_line[3:], ln=1, new_x="LMARGIN", new_y="NEXT")
-                pdf.set_font(family=font_name, style='', size=default_font_size)
-                if not first_h2_found:
-                    is_h2_block = True
-            elif processed_line.startswith('- ') or processed_line.startswith('* '):
-                bullet = "\u2022" if not use_fallback_encoding else "*"
-                bullet_point_text = processed_line[2:]
-                full_bullet_line = f"{bullet} {bullet_point_text}"
-                original_l_margin = pdf.l_margin
-                indent = 5
-                pdf.set_left_margin(original_l_margin + indent)
-                pdf.set_x(original_l_margin + indent)
-                pdf.multi_cell(w=pdf.epw - indent, h=line_height, text=full_bullet_line, ln=1, new_x="LMARGIN", new_y="NEXT")
-                pdf.set_left_margin(original_l_margin)
-                pdf.set_x(original_l_margin)
-            else:
-                pdf.set_x(pdf.l_margin)
-                pdf.multi_cell(w=pdf.epw, h=line_height, text=processed_line, ln=1, new_x="LMARGIN", new_y="NEXT")
-                pdf.set_x(pdf.l_margin)
-
-            if is_h2_block and not image_added and valid_image_path:
-                logger.info("Adding image after the first H2 heading.")
-                image_added = _add_image_to_pdf(pdf, valid_image_path)
-                first_h2_found = True
-
-            is_first_line = False
-
-        if valid_image_path and not image_added:
-            logger.info("No H2 found or image failed to add earlier. Adding image at the end.")
-            _add_image_to_pdf(pdf, valid_image_path)
-
-        pdf_dir = "pdf"
-        os.makedirs(pdf_dir, exist_ok=True)
+        render_started = time.time()
+        # Fonts are parsed once per process by pdf_engine and shared across renders
+        renderer = NotesRenderer(pdf_engine, image_source=image_source)
+        chunks = [str(result_text).strip()] if isinstance(result_text, str) else result_text
+        for chunk in chunks:
+            renderer.feed(chunk)
+        pdf = renderer.close()
+        pdf_bytes = bytes(pdf.output())
+
         safe_topic = re.sub(r'[^a-zA-Z0-9_]', '', topic).replace(' ', '_')
-        pdf_file_name = f"notes_{safe_topic}.pdf"
-        pdf_file_path = os.path.join(pdf_dir, pdf_file_name)
-        pdf.output(pdf_file_path, 'F')
-        logger.info(f"PDF file created: {pdf_file_path}")
+        # Written to a temp file and renamed, so concurrent renders of one topic never clash
+        pdf_file_name = pdf_store.put(f"notes_{safe_topic}", pdf_bytes)
+        logger.info(f"PDF file created: {pdf_file_name}")
+        render_seconds = time.time() - render_started - timings["image_wait"]
+        telemetry.record("pdf_render", render_seconds, bytes=len(pdf_bytes), pages=pdf.page)
+        progress("pdf_render", duration=render_seconds, pdf_path=f"/pdf/{pdf_file_name}")
 
     except Exception as e:
         logger.error(f"Failed to create PDF: {e}", exc_info=True)
         return None
 
-    return f"/{pdf_dir}/{pdf_file_name}"
-
-@app.route('/api/generate_notes', methods=['POST'])
-def handle_generate_notes():
+    return f"/pdf/{pdf_file_name}"
+
+def _pdf_available(pdf_relative_path):
+    """True if the stored PDF has not been evicted; counts as a use for eviction."""
+    file_name = os.path.basename(pdf_relative_path)
+    if not pdf_store.path(file_name):
+        return False
+    pdf_store.touch(file_name)
+    return True
+
+def generate_notes(topic, preference, mode=DEFAULT_CREW_MODE, use_cache=True, budget_limits=None, trace=False,
+                   include_markdown=False, progress=_no_progress):
+    """Runs the crew and renders the PDF. Returns the response payload or raises on failure.
+
+    budget_limits lowers the server's per-request limits (see budget.DEFAULT_LIMITS); when
+    one is hit the notes are built from whatever the crew had produced by then. With
+    trace=True the payload also carries every span recorded for the request, and with
+    include_markdown=True the notes themselves.
+    """
+    with telemetry.trace_request(topic=topic, preference=preference, mode=mode) as request_trace:
+        with telemetry.span("request", mode) as fields:
+            payload = _generate_notes(topic, preference, mode, use_cache, budget_limits, progress)
+            fields["cached"] = payload["cached"]
+    if not include_markdown:
+        del payload["markdown"]
+    if trace:
+        payload["trace"] = request_trace.to_dict()
+    return payload
+
+def _generate_notes(topic, preference, mode, use_cache, budget_limits, progress):
+    seed = None
+    similar_to = None
+    if use_cache:
+        cached = result_cache.get(topic, preference, mode)
+        if not cached:
+            match = similar_notes.find(topic, preference, mode)
+            if match:
+                score, entry = match
+                similar_to = {"topic": entry["topic"], "score": round(score, 3)}
+                if similar_notes.can_reuse(topic, score, entry):
+                    cached = entry
+                    progress("similar_reused", **similar_to)
+                    # Alias this wording to the same notes so the next request is an exact hit
+                    result_cache.put(topic, preference, entry["markdown"], entry["pdf_path"], mode,
+                                     similar_to=entry["topic"])
+                elif score >= similar_notes.seed_threshold:
+                    seed = (entry["topic"], entry["markdown"])
+                    progress("similar_seeded", **similar_to)
+        if cached:
+            pdf_relative_path = cached["pdf_path"]
+            # Stored PDFs never change, but the store may have evicted this one since it was cached
+            if not _pdf_available(pdf_relative_path):
+                logger.info(f"Cached PDF for '{topic}' was evicted, re-rendering from cached notes.")
+                pdf_relative_path = create_pdf_file(topic, cached["markdown"], progress=progress)
+                if not pdf_relative_path:
+                    raise RuntimeError("Failed to generate PDF file")
+                result_cache.put(topic, preference, cached["markdown"], pdf_relative_path, mode)
+            logger.info(f"Serving cached notes for topic: '{topic}'")
+            progress("cache_hit", markdown=cached["markdown"])
+            return {"pdf_path": pdf_relative_path, "cached": True, "degraded": False, "budget": None,
+                    "similar_to": similar_to, "markdown": cached["markdown"]}
+
+    # Search for the illustration with the user's topic while the crew is still working
+    image_future = prefetch_image(topic, progress=progress)
+
+    budget = RequestBudget(**(budget_limits or {}))
+    custom_crew = CustomCrew(topic, preference, mode=mode, budget=budget, seed=seed)
+    result_text = custom_crew.run(progress=progress)
+
+    if not result_text:
+        raise ValueError("CrewAI returned empty result.")
+
+    pdf_relative_path = create_pdf_file(topic, result_text, progress=progress, image_future=image_future)
+    if not pdf_relative_path:
+        raise RuntimeError("Failed to generate PDF file")
+
+    logger.info(f"Successfully generated PDF: {pdf_relative_path}")
+    # Partial notes from a run that hit its budget are not worth serving to the next request
+    if not custom_crew.degraded:
+        result_cache.put(topic, preference, str(result_text), pdf_relative_path, mode)
+        similar_notes.add(topic, preference, mode)
+    return {"pdf_path": pdf_relative_path, "cached": False, "degraded": custom_crew.degraded, "budget": budget.to_dict(),
+            "similar_to": similar_to, "markdown": str(result_text)}
+
+def _parse_generate_request():
+    """Validates the JSON body shared by the note generation endpoints."""
     if not request.is_json:
-        return jsonify({"error": "Request must be JSON"}), 400
+        return None, (jsonify({"error": "Request must be JSON"}), 400)
 
     data = request.get_json()
     topic = data.get('topic')
     preference = data.get('preference')
 
     if not topic or not preference:
-        return jsonify({"error": "Missing 'topic' or 'preference' in request body"}), 400
+        return None, (jsonify({"error": "Missing 'topic' or 'preference' in request body"}), 400)
 
-    logger.info(f"Received request to generate notes for topic: '{topic}', preference: '{preference}'")
+    error_response = _validate_generation_options(data)
+    if error_response:
+        return None, error_response
 
-    try:
-        custom_crew = CustomCrew(topic, preference)
-        result_text = custom_crew.run()
+    return data, None
+
+def _validate_generation_options(data):
+    """Checks the optional fields _generation_options reads; returns an error response or None."""
+    if data.get('mode', DEFAULT_CREW_MODE) not in CREW_MODES:
+        return jsonify({"error": f"'mode' must be one of {list(CREW_MODES)}"}), 400
 
-        if not result_text:
-            raise ValueError("CrewAI returned empty result.")
+    try:
+        RequestBudget.limits_from_request(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return None
+
+def _generation_options(data):
+    """Maps optional request fields onto generate_notes keyword arguments."""
+    return {
+        "mode": data.get('mode', DEFAULT_CREW_MODE),
+        "use_cache": not data.get('no_cache', False),
+        "budget_limits": RequestBudget.limits_from_request(data),
+        "trace": bool(data.get('trace', False)),
+    }
 
-        pdf_relative_path = create_pdf_file(topic, result_text)
+@app.route('/api/generate_notes', methods=['POST'])
+def handle_generate_notes():
+    data, error_response = _parse_generate_request()
+    if error_response:
+        return error_response
+    topic = data['topic']
+    preference = data['preference']
 
-        if pdf_relative_path:
-            logger.info(f"Successfully generated PDF: {pdf_relative_path}")
-            return jsonify({"pdf_path": pdf_relative_path})
-        else:
-            return jsonify({"error": "Failed to generate PDF file"}), 500
+    logger.info(f"Received request to generate notes for topic: '{topic}', preference: '{preference}'")
 
+    try:
+        return jsonify(generate_notes(topic, preference, **_generation_options(data)))
     except Exception as e:
         logger.error(f"Error during note generation: {e}", exc_info=True)
         return jsonify({"error": f"An internal error occurred: {str(e)}"}), 500
 
+# Asynchronous variant: returns a job ID immediately and runs the crew on the worker pool
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    data, error_response = _parse_generate_request()
+    if error_response:
+        return error_response
+    topic = data['topic']
+    preference = data['preference']
+
+    logger.info(f"Received job for topic: '{topic}', preference: '{preference}'")
+
+    try:
+        job = job_queue.submit(generate_notes, topic, preference, **_generation_options(data))
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 503
+
+    return jsonify({
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/api/jobs/{job.id}",
+        "result_url": f"/api/jobs/{job.id}/result",
+    }), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({"error": "Unknown job ID"}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({"error": "Unknown job ID"}), 404
+    if job.status == FAILED:
+        return jsonify({"error": f"An internal error occurred: {job.error}"}), 500
+    if not job.done:
+        # Not ready yet: tell the client to keep polling
+        return jsonify({"job_id": job.id, "status": job.status}), 202
+    return jsonify(job.result)
+
+def _stream_job_events(job, start=0):
+    """Yields the job's progress events as server-sent events until it finishes."""
+    next_id = start
+    while True:
+        events = job.wait_for_events(next_id, timeout=15)
+        if not events:
+            if job.done:
+                return
+            # Comment line keeps proxies from closing an idle stream
+            yield ": keepalive\n\n"
+            continue
+        for event_id, (event, data) in events:
+            yield f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+            next_id = event_id + 1
+            if event in ("done", "failed"):
+                return
+
+def _event_stream_response(stream):
+    return Response(stream, mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # Disable nginx response buffering
+    })
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({"error": "Unknown job ID"}), 404
+    # EventSource reconnects send the last ID they saw; resume right after it
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    start = int(last_event_id) + 1 if last_event_id.isdigit() else 0
+    return _event_stream_response(_stream_job_events(job, start))
+
+# Submits a job and streams its progress on the same response (for fetch()-based clients)
+@app.route('/api/generate_notes/stream', methods=['POST'])
+def stream_generate_notes():
+    data, error_response = _parse_generate_request()
+    if error_response:
+        return error_response
+    topic = data['topic']
+    preference = data['preference']
+
+    logger.info(f"Received streaming request for topic: '{topic}', preference: '{preference}'")
+
+    try:
+        job = job_queue.submit(generate_notes, topic, preference, **_generation_options(data))
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 503
+
+    def stream():
+        yield f"event: job\ndata: {json.dumps({'job_id': job.id})}\n\n"
+        yield from _stream_job_events(job)
+
+    return _event_stream_response(stream())
+
+@app.route('/api/images/stats', methods=['GET'])
+def image_stats():
+    with image_host_stats_lock:
+        hosts = dict(image_host_stats)
+    return jsonify({"hosts": hosts, "store": image_store.stats()})
+
+@app.route('/api/http/stats', methods=['GET'])
+def http_stats():
+    return jsonify(http_client.session.stats())
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(dict(result_cache.stats(), similarity=similar_notes.stats(), pdf_store=pdf_store.stats()))
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Per-stage latency, bytes and token histograms in the Prometheus text format."""
+    return Response(telemetry.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/api/search/stats', methods=['GET'])
+def search_stats():
+    return jsonify(dict(search_cache.stats(), pages=page_cache.stats(), local_index=local_index.stats()))
+
+def assemble_batch(batch):
+    """Builds a finished batch's download from its successful items and returns its URL path.
+
+    "pdf" renders every item's notes into one document, each starting on a new page with
+    its own illustration; "zip" packs the item PDFs as they are, numbered in batch order so
+    items whose names would clash (same topic, different preference) all keep their entry.
+    An item PDF already evicted from the store is rendered again from its markdown.
+    """
+    finished = []
+    for item in batch.items:
+        job = item["job"]
+        if job.status == SUCCEEDED and all(job is not other["job"] for other in finished):
+            finished.append(item)
+
+    prefix = f"batch_{batch.id}"
+    with telemetry.span("batch_assemble", batch.output) as fields:
+        if batch.output == "zip":
+            tmp_path = pdf_store.temp_path(prefix, "zip")
+            with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as archive:
+                for number, item in enumerate(finished, start=1):
+                    item_pdf = os.path.basename(item["job"].result["pdf_path"])
+                    entry_name = f"{number:02d}_{pdf_store.download_name(item_pdf)}"
+                    item_path = pdf_store.path(item_pdf)
+                    if item_path:
+                        archive.write(item_path, entry_name)
+                        continue
+                    logger.info(f"{item_pdf} was evicted, rendering it again for batch {batch.id}")
+                    renderer = NotesRenderer(pdf_engine, image_source=lambda title, topic=item["topic"]: image_store.lookup(topic))
+                    renderer.feed(item["job"].result["markdown"].strip() + "\n")
+                    archive.writestr(entry_name, bytes(renderer.close().output()))
+            file_name = pdf_store.put_file(prefix, tmp_path, "zip")
+        else:
+            renderer = None
+            for item in finished:
+                # Illustrations were stored under the item's topic when the item ran
+                image_source = lambda title, topic=item["topic"]: image_store.lookup(topic)
+                if renderer is None:
+                    renderer = NotesRenderer(pdf_engine, image_source=image_source)
+                else:
+                    renderer.new_section(image_source)
+                renderer.feed(item["job"].result["markdown"].strip() + "\n")
+            file_name = pdf_store.put(prefix, bytes(renderer.close().output()))
+        fields["bytes"] = os.path.getsize(pdf_store.path(file_name))
+        fields["items"] = len(finished)
+    logger.info(f"Assembled batch {batch.id} into {file_name}")
+    return f"/pdf/{file_name}"
+
+# Many topics in one request; each item runs as a job and the results come back as one PDF or zip
+@app.route('/api/batches', methods=['POST'])
+def submit_batch():
+    if not request.is_json:
+        return jsonify({"error": "Request must be JSON"}), 400
+    data = request.get_json()
+
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "'items' must be a non-empty list of {topic, preference} objects"}), 400
+    if len(items) > batch_registry.max_items:
+        return jsonify({"error": f"A batch may hold at most {batch_registry.max_items} items"}), 400
+    pairs = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get('topic') or not item.get('preference'):
+            return jsonify({"error": f"Item {index} is missing 'topic' or 'preference'"}), 400
+        pairs.append((item['topic'], item['preference']))
+    output = data.get('output', 'pdf')
+    if output not in OUTPUT_FORMATS:
+        return jsonify({"error": f"'output' must be one of {list(OUTPUT_FORMATS)}"}), 400
+    error_response = _validate_generation_options(data)
+    if error_response:
+        return error_response
+
+    batch = Batch(pairs, output, assemble_batch)
+    unique_items = [(topic, preference) for topic, preference, _ in batch.unique_items()]
+    logger.info(f"Received batch of {len(pairs)} items ({len(unique_items)} distinct), output: {output}")
+    try:
+        jobs = job_queue.submit_many(generate_notes, unique_items, include_markdown=True, **_generation_options(data))
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 503
+    # Attached before it is registered, so a status request never sees items without jobs
+    batch.attach(jobs)
+    batch_registry.add(batch)
+
+    return jsonify({
+        "batch_id": batch.id,
+        "status": batch.status,
+        "status_url": f"/api/batches/{batch.id}",
+        # Per-item progress streams at /api/jobs/<job_id>/events
+        "items": [{"topic": item["topic"], "job_id": item["job"].id} for item in batch.items],
+    }), 202
+
+@app.route('/api/batches/<batch_id>', methods=['GET'])
+def batch_status(batch_id):
+    batch = batch_registry.get(batch_id)
+    if not batch:
+        return jsonify({"error": "Batch not found"}), 404
+    return jsonify(batch.to_dict())
+
 # Route to serve generated PDF files
 @app.route('/pdf/<filename>')
 def serve_pdf(filename):
+    file_path = pdf_store.path(filename)
+    if not file_path:
+        return jsonify({"error": "File not found"}), 404
     logger.info(f"Serving PDF file: {filename} as attachment")
-    # Add as_attachment=True to force download
-    return send_from_directory('pdf', filename, as_attachment=True)
+    pdf_store.touch(filename)
+    etag = pdf_store.etag(filename)
+    # conditional=True answers If-None-Match/If-Modified-Since with 304 and Range with 206.
+    # Stored names change whenever the content does, so clients and CDNs may keep them for good
+    response = send_file(file_path, as_attachment=True, download_name=pdf_store.download_name(filename),
+                         conditional=True, etag=etag or True, max_age=365 * 24 * 3600 if etag else None)
+    if etag:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    return response
 
 # Route to serve frontend static files (index.html)
 # Serve index.html specifically for the root path
@@ -413,15 +871,23 @@ def serve_index():
     # Use the configured static_folder from Flask app
     return app.send_static_file('index.html')
 
+# Make sure necessary directories exist before serving (also under gunicorn, which never runs __main__)
+os.makedirs("images", exist_ok=True)
+
+def warm_up():
+    """Builds the shared Gemini clients and agent templates before traffic arrives."""
+    try:
+        warm_up_agents()
+    except Exception as e:
+        logger.warning(f"Agent warm-up failed ({e}); agents will be built on first use.")
+
 if __name__ == "__main__":
-    print(Fore.CYAN + "Starting Flask server..." + Style.RESET_ALL)
+    # Development server only; production runs gunicorn with gunicorn.conf.py (see Dockerfile)
+    print(Fore.CYAN + "Starting Flask development server..." + Style.RESET_ALL)
     # Removed the ASCII art and CLI input sections
-
-    # Make sure necessary directories exist before starting
-    os.makedirs("pdf", exist_ok=True)
-    os.makedirs("images", exist_ok=True)
+    warm_up()
 
     # Run the Flask app
     # Use host='0.0.0.0' to make it accessible externally (e.g., from Docker)
-    # Use debug=True for development (auto-reloads), but turn off for production
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # FLASK_DEBUG=1 turns on the reloader and debugger for local development
+    app.run(host='0.0.0.0', port=int(os.environ.get("PORT", 5000)), debug=os.environ.get("FLASK_DEBUG") == "1", threaded=True)
@@ -0,0 +1,294 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+from bs4 import BeautifulSoup
+
+import http_client
+import telemetry
+
+logger = logging.getLogger(__name__)
+
+PAGE_FETCH_WORKERS = int(os.environ.get("PAGE_FETCH_WORKERS", 4))
+# The search tool hands back whatever pages finished within this many seconds; fetches give up then
+PAGE_FETCH_DEADLINE = float(os.environ.get("PAGE_FETCH_DEADLINE", 8))
+PAGE_MAX_BYTES = int(os.environ.get("PAGE_MAX_BYTES", 2 * 1024 * 1024))
+PAGE_FETCH_TIMEOUT = (5, 10)  # (connect, read) seconds
+# Chunks of about this many characters are ranked; the best ones up to PAGE_CONTEXT_CHARS are kept
+PAGE_CHUNK_CHARS = int(os.environ.get("PAGE_CHUNK_CHARS", 800))
+PAGE_CONTEXT_CHARS = int(os.environ.get("PAGE_CONTEXT_CHARS", 3000))
+
+# Elements that never hold the main text of a page
+BOILERPLATE_TAGS = ["script", "style", "noscript", "template", "svg", "iframe", "form", "button",
+                    "nav", "header", "footer", "aside"]
+TEXT_TAGS = ["h1", "h2", "h3", "h4", "p", "li", "pre", "blockquote", "td", "dd"]
+TOKEN_RE = re.compile(r"\w+")
+# Shared by every search in the process, so concurrent searches cannot multiply the fetch threads
+fetch_executor = ThreadPoolExecutor(max_workers=PAGE_FETCH_WORKERS, thread_name_prefix="page-fetch")
+
+STOPWORDS = frozenset("""a an and are as at be by for from has have how in is it its of on or that the this to
+                         was were what when where which who why will with""".split())
+
+
+def tokenize(text):
+    """Lowercased word tokens without stopwords and single characters."""
+    return [t for t in TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+def extract_main_text(html, content_type=""):
+    """(title, text) of an HTML page: the blocks of its <article> or <main>, else of <body>, minus boilerplate."""
+    charset = re.search(r"charset=([\w-]+)", content_type)
+    soup = BeautifulSoup(html, "html.parser", from_encoding=charset.group(1) if charset else None)
+    title = soup.title.get_text(" ", strip=True) if soup.title else ""
+    for element in soup(BOILERPLATE_TAGS):
+        element.decompose()
+    root = soup.find("article") or soup.find("main") or soup.body or soup
+
+    blocks = []
+    for element in root.find_all(TEXT_TAGS):
+        # Nested text tags (a <p> inside an <li>) are covered by the outer one
+        if element.find_parent(TEXT_TAGS) is not None:
+            continue
+        text = " ".join(element.get_text(" ", strip=True).split())
+        # Menus and share buttons that survived: too short to carry information
+        if len(text) >= 40 or (element.name in ("h1", "h2", "h3", "h4", "pre") and text):
+            blocks.append(text)
+    if not blocks:
+        blocks = [" ".join(root.get_text(" ", strip=True).split())]
+    return title, "\n".join(block for block in blocks if block)
+
+
+def chunk_text(text, size=None):
+    """Splits extracted text on block boundaries into chunks of about `size` characters."""
+    size = size or PAGE_CHUNK_CHARS
+    chunks, current = [], ""
+    for block in text.split("\n"):
+        while len(block) > size:
+            # An overlong block is cut at the last space before the limit
+            cut = block.rfind(" ", 0, size)
+            cut = cut if cut > 0 else size
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(block[:cut])
+            block = block[cut:].strip()
+        if current and len(current) + len(block) + 1 > size:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n{block}" if current else block
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def rank_chunks(query, chunks):
+    """Chunks sorted by relevance to the query (tf-idf over the given chunks), unrelated ones dropped."""
+    terms = set(tokenize(query))
+    if not terms:
+        return []
+    counts = [Counter(tokenize(chunk)) for chunk in chunks]
+    document_frequency = Counter(term for count in counts for term in terms if count[term])
+    scores = []
+    for count in counts:
+        scores.append(sum((1 + math.log(count[term])) * math.log(1 + len(chunks) / document_frequency[term])
+                          for term in terms if count[term]))
+    # Best first; ties keep page order
+    order = sorted((i for i in range(len(chunks)) if scores[i] > 0), key=lambda i: -scores[i])
+    return [chunks[i] for i in order]
+
+
+class PageCache:
+    """On-disk cache of extracted page text keyed by URL, revalidated with conditional GETs.
+
+    A page fetched less than PAGE_CACHE_FRESH_SECONDS ago is served without touching the
+    network. After that it is revalidated with If-None-Match / If-Modified-Since from the
+    stored ETag and Last-Modified, so an unchanged page costs a 304 and no re-extraction.
+    Pages that fail or are not HTML are cached too (with empty text) so they are not
+    retried on every search. Least recently used entries beyond PAGE_CACHE_MAX_ENTRIES are
+    evicted.
+    """
+
+    def __init__(self, cache_dir=None, fresh_seconds=None, max_entries=None):
+        self.cache_dir = cache_dir or os.environ.get("PAGE_CACHE_DIR", os.path.join("cache", "pages"))
+        self.fresh_seconds = fresh_seconds or int(os.environ.get("PAGE_CACHE_FRESH_SECONDS", 24 * 3600))
+        self.max_entries = max_entries or int(os.environ.get("PAGE_CACHE_MAX_ENTRIES", 5000))
+        self.enabled = os.environ.get("PAGE_CACHE_ENABLED", "1") != "0"
+        self.hits = 0
+        self.revalidated = 0
+        self.fetched = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_path(self, url):
+        return os.path.join(self.cache_dir, f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.json")
+
+    def _load(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable page cache entry {path}: {e}")
+            return None
+
+    def _store(self, path, entry):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write page cache entry {path}: {e}")
+
+    def _count(self, outcome):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def get(self, url, deadline=None):
+        """Returns {"url", "title", "text", ...} for the page; text is empty if it could not be used.
+
+        With a `deadline` (a time.monotonic() value) a page that cannot be fetched by then
+        returns None and nothing is cached for it.
+        """
+        path = self._entry_path(url)
+        entry = self._load(path) if self.enabled else None
+        if entry and time.time() - entry["checked_at"] <= self.fresh_seconds:
+            self._count("hits")
+            try:
+                # Bump the access time; eviction drops the least recently used files first
+                os.utime(path)
+            except OSError:
+                pass
+            return entry
+        if deadline is not None and time.monotonic() >= deadline:
+            return None
+
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        with telemetry.span("page_fetch", host=urlparse(url).netloc) as fields:
+            entry = self._fetch(url, headers, entry, deadline)
+            fields["outcome"] = entry.get("outcome") if entry else "timeout"
+            fields["bytes"] = len(entry["text"].encode("utf-8")) if entry else 0
+        if entry is None:
+            return None
+        if self.enabled:
+            self._store(path, entry)
+            self._evict()
+        return entry
+
+    def _fetch(self, url, headers, previous, deadline=None):
+        now = time.time()
+        entry = {"url": url, "title": "", "text": "", "etag": None, "last_modified": None,
+                 "fetched_at": now, "checked_at": now}
+        timeout = PAGE_FETCH_TIMEOUT
+        if deadline is not None:
+            remaining = max(deadline - time.monotonic(), 0.01)
+            timeout = tuple(min(limit, remaining) for limit in PAGE_FETCH_TIMEOUT)
+        try:
+            with http_client.session.get(url, headers=headers, timeout=timeout, stream=True) as response:
+                if response.status_code == 304 and previous:
+                    self._count("revalidated")
+                    return dict(previous, checked_at=now, outcome="revalidated")
+                response.raise_for_status()
+                content_type = response.headers.get("Content-Type", "")
+                if "html" not in content_type.lower():
+                    raise ValueError(f"Unexpected content type '{content_type}'")
+                body = bytearray()
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    if deadline is not None and time.monotonic() >= deadline:
+                        raise TimeoutError("fetch deadline reached")
+                    body.extend(chunk)
+                    if len(body) > PAGE_MAX_BYTES:
+                        # The main text is near the top; the rest is rarely worth downloading
+                        break
+                entry["title"], entry["text"] = extract_main_text(bytes(body), content_type)
+                entry["etag"] = response.headers.get("ETag")
+                entry["last_modified"] = response.headers.get("Last-Modified")
+            self._count("fetched")
+            entry["outcome"] = "fetched"
+        except Exception as e:
+            if deadline is not None and time.monotonic() >= deadline:
+                # Out of time rather than broken; not cached, so the next search tries again
+                logger.info(f"Gave up on page {url} at the fetch deadline: {e}")
+                return None
+            logger.info(f"Could not use page {url}: {e}")
+            self._count("errors")
+            if previous:
+                # Keep serving the last good copy; it is retried once it goes stale again
+                return dict(previous, checked_at=now, outcome="stale")
+            entry["outcome"] = "error"
+        return entry
+
+    def fetch_pages(self, urls, deadline=None):
+        """Fetches the pages on the shared pool and returns the entries of those that finished in time.
+
+        Every fetch gets the same total limit of `deadline` seconds, counted from this call
+        and including time spent queued behind other searches; pages not done by then are
+        left out and abandoned, so they never hold a pool worker past the deadline.
+        """
+        if not urls:
+            return []
+        seconds = deadline or PAGE_FETCH_DEADLINE
+        deadline_at = time.monotonic() + seconds
+        get = telemetry.in_context(self.get)
+        futures = [fetch_executor.submit(get, url, deadline_at) for url in urls]
+        done, _ = wait(futures, timeout=seconds)
+        return [future.result() for future in futures
+                if future in done and not future.exception() and future.result() is not None]
+
+    @staticmethod
+    def relevant_chunks(query, pages, max_chars=None):
+        """[(url, title, chunk)] of the pages most relevant to the query, at most `max_chars` of text."""
+        max_chars = max_chars or PAGE_CONTEXT_CHARS
+        candidates = []
+        for page in pages:
+            candidates.extend((page["url"], page["title"], chunk) for chunk in chunk_text(page["text"]))
+        ranked = rank_chunks(query, [chunk for _, _, chunk in candidates])
+        by_text = {chunk: (url, title) for url, title, chunk in reversed(candidates)}
+
+        selected, used = [], 0
+        for chunk in ranked:
+            if used + len(chunk) > max_chars or any(chunk == picked for _, _, picked in selected):
+                continue
+            selected.append((*by_text[chunk], chunk))
+            used += len(chunk)
+        return selected
+
+    def _evict(self):
+        with self._lock:
+            try:
+                names = [n for n in os.listdir(self.cache_dir) if n.endswith(".json")]
+            except OSError:
+                return
+            if len(names) <= self.max_entries:
+                return
+            paths = [os.path.join(self.cache_dir, n) for n in names]
+            paths.sort(key=lambda p: os.path.getmtime(p) if os.path.exists(p) else 0)
+            for path in paths[:len(paths) - self.max_entries]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "revalidated": self.revalidated,
+                "fetched": self.fetched,
+                "errors": self.errors,
+            }
@@ -0,0 +1,589 @@
+import html
+import io
+import logging
+import os
+import re
+import threading
+
+import markdown
+from fontTools import ttLib
+from fpdf import FPDF
+from fpdf.fonts import SubsetMap, TTFFont
+from fpdf.image_parsing import preload_image
+from markdown.util import HTML_PLACEHOLDER_RE
+
+logger = logging.getLogger(__name__)
+
+# Width every illustration is drawn at; image_normalizer sizes downloads for it
+IMAGE_WIDTH_MM = 120
+
+DEJAVU_FONT_FILES = {
+    "": "DejaVuSans.ttf",
+    "B": "DejaVuSans-Bold.ttf",
+    "I": "DejaVuSans-Oblique.ttf",
+}
+
+
+class SharedFontPDF(FPDF):
+    """FPDF that pulls fonts from its PDFEngine the first time a style is selected."""
+
+    def __init__(self, engine, *args, **kwargs):
+        self._engine = engine
+        super().__init__(*args, **kwargs)
+
+    def set_font(self, family=None, style="", size=0):
+        fontkey = (family or self.font_family).lower() + "".join(sorted(style.upper().replace("U", "")))
+        if fontkey not in self.fonts:
+            self._engine.attach_font(self, fontkey)
+        super().set_font(family, style, size)
+
+
+class PDFEngine:
+    """Parses the TTF fonts once per process and shares the parsed metrics across PDF renders.
+
+    fpdf2's add_font reads the whole TTF and walks every glyph to build width tables, which
+    costs ~100 ms per document for the three DejaVu files. Here that work happens once; each
+    document gets a lightweight TTFFont that reuses the width and glyph tables and only owns
+    what fpdf2 mutates while writing: the subset map and a lazily loaded fontTools object,
+    which output() subsets in place. Styles are attached on first use, so unused fonts are
+    neither copied nor embedded.
+    """
+
+    def __init__(self, family="DejaVu", font_files=None, share_fonts=None):
+        self.family = family
+        self.font_files = font_files or DEJAVU_FONT_FILES
+        if share_fonts is None:
+            share_fonts = os.environ.get("PDF_SHARE_FONTS", "1") != "0"
+        self.share_fonts = share_fonts
+        self._prototypes = None  # fontkey -> (parsed TTFFont, raw font bytes)
+        self._lock = threading.Lock()
+
+    @property
+    def fonts_available(self):
+        return bool(self._load_fonts())
+
+    def _load_fonts(self):
+        if self._prototypes is not None:
+            return self._prototypes
+        with self._lock:
+            if self._prototypes is None:
+                prototypes = {}
+                scratch = FPDF()
+                try:
+                    for style, file_name in self.font_files.items():
+                        scratch.add_font(self.family, style, file_name)
+                        fontkey = f"{self.family.lower()}{style}"
+                        font = scratch.fonts[fontkey]
+                        with open(font.ttffile, "rb") as f:
+                            prototypes[fontkey] = (font, f.read())
+                    logger.info(f"Loaded {len(prototypes)} {self.family} fonts for PDF rendering.")
+                except (RuntimeError, OSError, ValueError) as e:
+                    logger.warning(f"{self.family} fonts unavailable ({e}). PDFs will fall back to Helvetica.")
+                    prototypes = {}
+                self._prototypes = prototypes
+        return self._prototypes
+
+    def new_document(self):
+        """Returns a fresh FPDF; the engine's font family is available through set_font()."""
+        fonts = self._load_fonts()
+        if not self.share_fonts:
+            pdf = FPDF()
+            if fonts:
+                for style, file_name in self.font_files.items():
+                    pdf.add_font(self.family, style, file_name)
+            return pdf
+        return SharedFontPDF(self)
+
+    def attach_font(self, pdf, fontkey):
+        """Registers a per-document copy of a cached font on pdf. Unknown keys are left to FPDF."""
+        prototype = self._load_fonts().get(fontkey)
+        if not prototype:
+            return
+        parsed, raw = prototype
+        try:
+            font = TTFFont.__new__(TTFFont)
+            for slot in TTFFont.__slots__:
+                if hasattr(parsed, slot):
+                    setattr(font, slot, getattr(parsed, slot))
+            font.i = len(pdf.fonts) + 1
+            font.ttfont = ttLib.TTFont(io.BytesIO(raw), recalcTimestamp=False, fontNumber=0, lazy=True)
+            font.missing_glyphs = []
+            # Same reserved characters TTFFont.__init__ maps 1:1 in the subset
+            reserved = "\x00 \r\n"
+            if pdf.str_alias_nb_pages:
+                reserved += "0123456789" + pdf.str_alias_nb_pages
+            font.subset = SubsetMap(font, [ord(char) for char in reserved])
+            pdf.fonts[fontkey] = font
+        except Exception as e:
+            # fpdf2 internals changed under us; parse the file the slow way instead
+            logger.warning(f"Could not reuse cached font {fontkey} ({e}), loading it from disk.")
+            pdf.fonts.pop(fontkey, None)
+            style = fontkey[len(self.family):].upper()
+            pdf.add_font(self.family, style, self.font_files[style])
+
+
+def add_image_to_pdf(pdf, image_path):
+    """Adds a single centered image to the PDF, handling page breaks."""
+    try:
+        # fpdf2 parses the file once here and image() below reuses the parsed copy
+        _, _, info = preload_image(pdf.image_cache, image_path)
+        aspect_ratio = info["h"] / info["w"]
+        display_w = IMAGE_WIDTH_MM # Keep the width consistent
+        display_h = display_w * aspect_ratio
+        page_height = pdf.h - pdf.t_margin - pdf.b_margin
+
+        pdf.ln(7) # Add vertical space before the image
+        current_y = pdf.get_y()
+
+        # Check if image fits on the current page
+        if current_y + display_h > page_height:
+            pdf.add_page()
+            current_y = pdf.t_margin # Reset Y to top margin on new page
+
+        # Calculate centered X position
+        image_x = (pdf.w - display_w) / 2
+
+        pdf.image(image_path, x=image_x, y=current_y, w=display_w)
+        pdf.set_y(current_y + display_h) # Move cursor below the image
+        logger.info(f"Added image {image_path} to PDF.")
+        return True # Indicate success
+    except Exception as e:
+        logger.error(f"Error adding image {image_path} to PDF: {str(e)}", exc_info=True)
+        return False # Indicate failure
+
+
+# Block-level tags that are laid out on their own rather than as part of the inline text around them
+BLOCK_TAGS = {"p", "ul", "ol", "pre", "table", "blockquote", "hr", "div",
+              "h1", "h2", "h3", "h4", "h5", "h6"}
+
+FENCE_LINE_RE = re.compile(r'^\s*(`{3,}|~{3,})')
+LIST_LINE_RE = re.compile(r'^\s*(?:[-*+]|\d+\.)\s+')
+TABLE_LINE_RE = re.compile(r'^\s*\|')
+HEADING_LINE_RE = re.compile(r'^\s{0,3}#{1,6}\s')
+HTML_TAG_RE = re.compile(r'<[^>]+>')
+
+# fpdf2's inline markup markers (multi_cell(markdown=True)) are swapped for control characters
+# that cannot appear in the notes, so literal '**', '__' or '--' in the text stays literal
+BOLD_MARKER = "\x0e\x0e"
+ITALICS_MARKER = "\x0f\x0f"
+UNDERLINE_MARKER = "\x10\x10"
+INLINE_MARKERS = (BOLD_MARKER, ITALICS_MARKER, UNDERLINE_MARKER)
+MARKER_CHARS_RE = re.compile(r'[\x0e\x0f\x10]')
+NEVER_MATCHES_RE = re.compile(r'(?!)')
+
+LIST_INDENT = 5
+
+_markdown_parsers = threading.local()
+
+
+def _markdown_parser():
+    # Building a Markdown instance loads every extension, so each thread keeps one
+    parser = getattr(_markdown_parsers, "parser", None)
+    if parser is None:
+        parser = markdown.Markdown(extensions=["tables", "sane_lists", "nl2br"])
+        _markdown_parsers.parser = parser
+    return parser
+
+
+def parse_markdown(text):
+    """Parses markdown into Python-Markdown's element tree (inline markup included) and its HTML stash.
+
+    This runs the same preprocessors, block parser and tree processors as Markdown.convert()
+    but stops before serialising, since the renderer walks the tree directly.
+    """
+    md = _markdown_parser()
+    md.reset()
+    lines = text.split("\n")
+    for preprocessor in md.preprocessors:
+        lines = preprocessor.run(lines)
+    root = md.parser.parseDocument(lines).getroot()
+    for treeprocessor in md.treeprocessors:
+        new_root = treeprocessor.run(root)
+        if new_root is not None:
+            root = new_root
+    return root, list(md.htmlStash.rawHtmlBlocks)
+
+
+class NotesRenderer:
+    """Lays out markdown notes into a PDF as chunks arrive.
+
+    Understands '#' to '######' headings, paragraphs with inline bold, italic, code and
+    links, bulleted and numbered (nested) lists, fenced and indented code blocks, pipe
+    tables, block quotes and rules. feed() accepts arbitrary pieces of text; complete lines
+    are grouped into markdown blocks (a paragraph, a list, a table, a code fence) and each
+    block is parsed with Python-Markdown and drawn in one pass over its element tree as soon
+    as the next block starts, so rendering keeps pace with streamed output.
+
+    Paragraphs, and all items of a list level, are written with a single multi_cell call
+    and the font is only changed when it actually differs (block_layout=False, or
+    PDF_BLOCK_LAYOUT=0, writes every list item on its own). The illustration is requested
+    from image_source(title) when the first '##' heading is laid out (or at close() if
+    there is none), which lets a slow image download overlap with the rest of the generation.
+    """
+
+    def __init__(self, engine, image_source=None, default_font_size=11, block_layout=None):
+        self.pdf = engine.new_document()
+        self.pdf.MARKDOWN_BOLD_MARKER = BOLD_MARKER
+        self.pdf.MARKDOWN_ITALICS_MARKER = ITALICS_MARKER
+        self.pdf.MARKDOWN_UNDERLINE_MARKER = UNDERLINE_MARKER
+        self.pdf.MARKDOWN_LINK_REGEX = NEVER_MATCHES_RE
+        self.default_font_size = default_font_size
+        self.font_name = "Helvetica"
+        self.use_fallback_encoding = True
+        if engine.fonts_available:
+            self.font_name = engine.family
+            self.use_fallback_encoding = False
+        else:
+            logger.warning("DejaVu font not found or Italic style missing. Falling back to Helvetica.")
+        self.pdf.set_font(self.font_name, size=default_font_size)
+        self._font = (self.font_name, "", default_font_size)
+        self.pdf.add_page()
+        self.line_height = self.pdf.font_size_pt * 1.25
+        if block_layout is None:
+            block_layout = os.environ.get("PDF_BLOCK_LAYOUT", "1") != "0"
+        self.block_layout = block_layout
+        self._html_stash = []
+
+        self._reset_section(image_source)
+
+    def _reset_section(self, image_source):
+        self.title = None
+        self._image_source = image_source
+        self._image_path = None
+        self._image_resolved = False
+        self._image_added = False
+        self._first_h2_found = False
+        self._buffer = ""
+        self._started = False
+        self._pending_blank_lines = 0
+        self._block_kind = None  # "text", "list", "table" or "code"
+        self._block_lines = []
+        self._fence = None
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split('\n')
+        for line in lines:
+            self._add_line(line)
+
+    def new_section(self, image_source=None):
+        """Finishes the current notes and starts another set on a new page, with its own title and image."""
+        self._finish_section()
+        self.pdf.add_page()
+        self._reset_section(image_source)
+
+    def close(self):
+        """Renders any buffered text, places the image if no '##' took it, and returns the FPDF."""
+        self._finish_section()
+        return self.pdf
+
+    def _finish_section(self):
+        if self._buffer:
+            self._add_line(self._buffer)
+            self._buffer = ""
+        self._flush_block()
+        image_path = self._resolve_image()
+        if image_path and not self._image_added:
+            logger.info("No H2 found or image failed to add earlier. Adding image at the end.")
+            self._image_added = add_image_to_pdf(self.pdf, image_path)
+
+    def _resolve_image(self):
+        if not self._image_resolved:
+            self._image_resolved = True
+            if self._image_source is not None:
+                self._image_path = self._image_source(self.title)
+                if self._image_path:
+                    logger.info(f"Using validated image path: {self._image_path}")
+        return self._image_path
+
+    # Block grouping
+
+    def _add_line(self, line):
+        stripped = line.strip()
+        if self._block_kind == "code":
+            # Inside a fence everything is kept verbatim until the closing fence
+            if stripped.startswith(self._fence) and not stripped.strip(self._fence[0]):
+                self._flush_block()
+            else:
+                self._block_lines.append(line.rstrip())
+            return
+
+        # Blank lines only add spacing between blocks: skip leading ones and hold the rest
+        # until more content arrives so trailing blank lines never reach the page
+        if not stripped:
+            if self._started or self._block_lines:
+                self._pending_blank_lines += 1
+            return
+
+        fence = FENCE_LINE_RE.match(line)
+        if fence:
+            kind = "code"
+        elif HEADING_LINE_RE.match(line):
+            kind = "heading"
+        elif LIST_LINE_RE.match(line):
+            kind = "list"
+        elif TABLE_LINE_RE.match(line):
+            kind = "table"
+        else:
+            kind = "text"
+
+        if self._continues_block(kind, line):
+            self._block_lines.extend([""] * self._pending_blank_lines)
+            self._block_lines.append(line.rstrip())
+            self._pending_blank_lines = 0
+            return
+
+        self._flush_block()
+        if self._pending_blank_lines:
+            self.pdf.ln(self.line_height * 0.5 * self._pending_blank_lines)
+            self._pending_blank_lines = 0
+        if kind == "heading":
+            self._render_markdown([stripped])
+        elif kind == "code":
+            self._block_kind = kind
+            self._fence = fence.group(1)
+        else:
+            self._block_kind = kind
+            self._block_lines = [line.rstrip()]
+
+    def _continues_block(self, kind, line):
+        current = self._block_kind
+        if current is None or kind in ("heading", "code"):
+            return False
+        if self._pending_blank_lines:
+            # Only an indented line keeps a list item going across a blank line
+            return current == "list" and line[:1] in (" ", "\t")
+        if current == "list":
+            if kind == "list" and line[:1] not in (" ", "\t"):
+                # Python-Markdown only starts a new list at a blank line, so a switch between
+                # bullets and numbers at the top level has to start a block of its own
+                return line[:1].isdigit() == self._block_lines[0].lstrip()[:1].isdigit()
+            return kind in ("list", "text")
+        # A list or table straight after paragraph text starts a new block, as LLM output expects
+        return kind == current
+
+    def _flush_block(self):
+        lines, kind = self._block_lines, self._block_kind
+        self._block_lines = []
+        self._block_kind = None
+        if kind == "code":
+            self._render_code("\n".join(lines))
+        elif lines:
+            self._render_markdown(lines)
+
+    # Rendering the element tree
+
+    def _render_markdown(self, lines):
+        root, self._html_stash = parse_markdown("\n".join(lines))
+        for element in root:
+            self._render_element(element, 0)
+        self._started = True
+
+    def _render_element(self, element, indent):
+        tag = element.tag
+        if tag in ("h1", "h2", "h3", "h4", "h5", "h6"):
+            self._render_heading(int(tag[1]), self._inline_text(element, plain=True))
+        elif tag in ("ul", "ol"):
+            self._render_list(element, indent)
+        elif tag == "pre":
+            code = element.find("code")
+            self._render_code(html.unescape("".join((code if code is not None else element).itertext())).rstrip("\n"), indent)
+        elif tag == "table":
+            self._render_table(element)
+        elif tag == "hr":
+            self._render_rule()
+        elif tag in ("blockquote", "div"):
+            for child in element:
+                self._render_element(child, indent + LIST_INDENT if tag == "blockquote" else indent)
+        else:
+            text = self._inline_text(element)
+            if text:
+                self._write_lines([text], indent)
+
+    def _render_heading(self, level, text):
+        pdf = self.pdf
+        line_height = self.line_height
+        if not text:
+            return
+        if level == 1:
+            if not self._started:
+                self.title = text
+            self._set_font(self.default_font_size + 5)
+            pdf.ln(line_height * 0.7)
+            pdf.multi_cell(w=pdf.epw, h=line_height, text=text, ln=1, new_x="LMARGIN", new_y="NEXT")
+            return
+        if level > 2:
+            self._set_font(self.default_font_size + 1, "B")
+            pdf.ln(line_height * 0.4)
+            pdf.multi_cell(w=pdf.epw, h=line_height, text=text, ln=1, new_x="LMARGIN", new_y="NEXT")
+            return
+
+        self._set_font(self.default_font_size + 3)
+        pdf.ln(line_height * 0.5)
+        pdf.multi_cell(w=pdf.epw, h=line_height, text=text, ln=1, new_x="LMARGIN", new_y="NEXT")
+        if not self._first_h2_found and not self._image_added:
+            image_path = self._resolve_image()
+            if image_path:
+                logger.info("Adding image after the first H2 heading.")
+                self._image_added = add_image_to_pdf(pdf, image_path)
+                self._first_h2_found = True
+
+    def _render_list(self, element, indent):
+        ordered = element.tag == "ol"
+        number = int(element.get("start", 1))
+        bullet = "\u2022" if not self.use_fallback_encoding else "*"
+        lines = []
+        for item in element:
+            if item.tag != "li":
+                continue
+            label = f"{number}." if ordered else bullet
+            number += 1
+            # Loose items wrap their text in <p>; the first paragraph goes on the label's line
+            blocks = [child for child in item if child.tag in BLOCK_TAGS]
+            text = self._inline_text(item)
+            if not text and blocks and blocks[0].tag == "p":
+                text = self._inline_text(blocks.pop(0))
+            lines.append(f"{label} {text}")
+            if blocks or not self.block_layout:
+                self._write_lines(lines, indent + LIST_INDENT)
+                lines = []
+            for block in blocks:
+                self._render_element(block, indent + LIST_INDENT)
+        self._write_lines(lines, indent + LIST_INDENT)
+
+    def _render_code(self, code, indent=0):
+        pdf = self.pdf
+        if not code.strip():
+            return
+        # Core Courier only covers latin-1, which is what code samples are in practice
+        code = code.expandtabs(4).encode('latin-1', 'replace').decode('latin-1')
+        self._set_font(self.default_font_size - 1, family="Courier")
+        pdf.set_fill_color(242)
+        original_l_margin = pdf.l_margin
+        pdf.set_left_margin(original_l_margin + indent)
+        pdf.set_x(original_l_margin + indent)
+        pdf.ln(self.line_height * 0.2)
+        pdf.multi_cell(w=pdf.epw, h=self.line_height * 0.9, text=code, fill=True, ln=1,
+                       new_x="LMARGIN", new_y="NEXT")
+        pdf.set_left_margin(original_l_margin)
+        pdf.set_x(original_l_margin)
+
+    def _render_table(self, element):
+        pdf = self.pdf
+        rows = []
+        has_header = element.find("thead") is not None
+        for row in element.iter("tr"):
+            plain = has_header and not rows
+            rows.append([self._inline_text(cell, plain=plain) for cell in row if cell.tag in ("th", "td")])
+        columns = max((len(row) for row in rows), default=0)
+        if not columns:
+            return
+        self._set_font(self.default_font_size - 1)
+        pdf.ln(self.line_height * 0.3)
+        with pdf.table(first_row_as_headings=has_header, markdown=True, text_align="LEFT",
+                       line_height=self.line_height * 0.9) as table:
+            for cells in rows:
+                table_row = table.row()
+                for text in cells + [""] * (columns - len(cells)):
+                    table_row.cell(text)
+        # Heading rows switch to bold behind our back
+        self._font = None
+
+    def _render_rule(self):
+        pdf = self.pdf
+        pdf.ln(self.line_height * 0.3)
+        y = pdf.get_y()
+        pdf.line(pdf.l_margin, y, pdf.w - pdf.r_margin, y)
+        pdf.ln(self.line_height * 0.3)
+
+    def _write_lines(self, lines, indent=0):
+        """Writes lines of inline-marked text with one multi_cell call, indented by indent."""
+        if not lines:
+            return
+        pdf = self.pdf
+        text = "\n".join(lines)
+        self._set_font(self.default_font_size)
+        original_l_margin = pdf.l_margin
+        if indent:
+            pdf.set_left_margin(original_l_margin + indent)
+        pdf.set_x(original_l_margin + indent)
+        has_markup = MARKER_CHARS_RE.search(text) is not None
+        pdf.multi_cell(w=pdf.epw, h=self.line_height, text=text, markdown=has_markup, ln=1,
+                       new_x="LMARGIN", new_y="NEXT")
+        if indent:
+            pdf.set_left_margin(original_l_margin)
+        pdf.set_x(original_l_margin)
+
+    def _set_font(self, size, style="", family=None):
+        font = (family or self.font_name, style, size)
+        if font != self._font:
+            self.pdf.set_font(family=font[0], style=style, size=size)
+            self._font = font
+
+    # Inline text
+
+    def _inline_text(self, element, plain=False):
+        """The element's inline content as text with fpdf2 markers for bold, italic and links."""
+        runs = [run for run in self._runs(element, False, False, False) if run[0]]
+        while runs and not runs[0][0].strip():
+            runs.pop(0)
+        while runs and not runs[-1][0].strip():
+            runs.pop()
+        if not runs:
+            return ""
+        runs[0] = (runs[0][0].lstrip(),) + runs[0][1:]
+        runs[-1] = (runs[-1][0].rstrip(),) + runs[-1][1:]
+        if plain:
+            return "".join(run[0] for run in runs)
+
+        parts = []
+        state = [False, False, False]
+        for text, bold, italic, underline in runs:
+            # No bold-italic face is registered, so bold wins
+            wanted = (bold, italic and not bold, underline)
+            for i, marker in enumerate(INLINE_MARKERS):
+                if wanted[i] != state[i]:
+                    parts.append(marker)
+                    state[i] = wanted[i]
+            parts.append(text)
+        parts.extend(marker for marker, active in zip(INLINE_MARKERS, state) if active)
+        return "".join(parts)
+
+    def _runs(self, element, bold, italic, underline):
+        """Yields (text, bold, italic, underline) for the element's text, skipping nested blocks."""
+        tag = element.tag
+        if tag in ("strong", "b"):
+            bold = True
+        elif tag in ("em", "i"):
+            italic = True
+        elif tag == "a":
+            underline = True
+        elif tag == "code":
+            yield self._clean(html.unescape("".join(element.itertext()))), bold, italic, underline
+            return
+        if element.text:
+            yield self._clean(element.text), bold, italic, underline
+        for child in element:
+            if child.tag in BLOCK_TAGS:
+                continue
+            if child.tag == "img":
+                yield self._clean(child.get("alt", "")), bold, italic, underline
+            elif child.tag != "br":  # nl2br keeps the newline itself in the tail
+                yield from self._runs(child, bold, italic, underline)
+            if child.tail:
+                yield self._clean(child.tail), bold, italic, underline
+
+    def _clean(self, text):
+        if "\x02" in text:
+            # Raw HTML and entities are stashed by Python-Markdown; keep only their text
+            text = HTML_PLACEHOLDER_RE.sub(self._unstash, text)
+        text = MARKER_CHARS_RE.sub("", text)
+        if self.use_fallback_encoding:
+            text = text.encode('latin-1', 'replace').decode('latin-1')
+        return text
+
+    def _unstash(self, match):
+        index = int(match.group(1))
+        if index >= len(self._html_stash):
+            return ""
+        return html.unescape(HTML_TAG_RE.sub("", str(self._html_stash[index])))
@@ -0,0 +1,146 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DIGEST_CHARS = 16
+ARTIFACT_NAME_RE = re.compile(rf"^(?P<prefix>[A-Za-z0-9_]+)_(?P<digest>[0-9a-f]{{{DIGEST_CHARS}}})\.(?P<ext>pdf|zip)$")
+# Temp files older than this belong to a writer that died mid-write
+STALE_TMP_SECONDS = 3600
+
+
+class PdfStore:
+    """Content-addressed store of rendered PDFs and batch zips, bounded by age and total size.
+
+    Artifacts are named <prefix>_<first 16 hex digits of their SHA-256>.<ext>, so a name
+    always denotes the same bytes: they are written to a temp file and renamed into place,
+    two renders for the same topic never touch each other's file, and the digest doubles as
+    a strong ETag. Last use is kept in the file's atime (set by touch(), mtime stays the
+    write time) and drives eviction: files unused for PDF_STORE_TTL_SECONDS are removed,
+    then the least recently used until the store fits in PDF_STORE_MAX_BYTES.
+    """
+
+    def __init__(self, root=None, ttl_seconds=None, max_bytes=None):
+        self.root = root or os.environ.get("PDF_STORE_DIR", "pdf")
+        self.ttl_seconds = ttl_seconds or int(os.environ.get("PDF_STORE_TTL_SECONDS", 7 * 24 * 3600))
+        self.max_bytes = max_bytes or int(os.environ.get("PDF_STORE_MAX_BYTES", 1024 * 1024 * 1024))
+        self.evicted = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _tmp_path(self, path):
+        return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    def put(self, prefix, data, extension="pdf"):
+        """Stores the bytes and returns the artifact's file name."""
+        name = f"{prefix}_{hashlib.sha256(data).hexdigest()[:DIGEST_CHARS]}.{extension}"
+        path = os.path.join(self.root, name)
+        if os.path.exists(path):
+            self.touch(name)
+        else:
+            tmp_path = self._tmp_path(path)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        self._evict()
+        return name
+
+    def put_file(self, prefix, source_path, extension):
+        """Moves a finished file (written under temp_path()) into the store and returns its name."""
+        digest = hashlib.sha256()
+        with open(source_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        name = f"{prefix}_{digest.hexdigest()[:DIGEST_CHARS]}.{extension}"
+        path = os.path.join(self.root, name)
+        if os.path.exists(path):
+            os.remove(source_path)
+            self.touch(name)
+        else:
+            os.replace(source_path, path)
+        self._evict()
+        return name
+
+    def temp_path(self, prefix, extension):
+        """A private path inside the store to build a large artifact in before put_file()."""
+        return self._tmp_path(os.path.join(self.root, f"{prefix}.{extension}"))
+
+    def path(self, name):
+        """Filesystem path of a stored artifact, or None if the name is not a plain file in the store."""
+        if os.path.basename(name) != name or name.startswith("."):
+            return None
+        path = os.path.join(self.root, name)
+        return path if os.path.isfile(path) else None
+
+    def touch(self, name):
+        """Marks the artifact as used now (atime only, so Last-Modified stays the write time)."""
+        path = os.path.join(self.root, name)
+        try:
+            os.utime(path, (time.time(), os.stat(path).st_mtime))
+        except OSError:
+            pass
+
+    @staticmethod
+    def etag(name):
+        match = ARTIFACT_NAME_RE.match(name)
+        return match.group("digest") if match else None
+
+    @staticmethod
+    def download_name(name):
+        """The name a browser should save the artifact as, without the digest."""
+        match = ARTIFACT_NAME_RE.match(name)
+        return f"{match.group('prefix')}.{match.group('ext')}" if match else name
+
+    def _evict(self):
+        with self._lock:
+            now = time.time()
+            artifacts = []
+            try:
+                with os.scandir(self.root) as entries:
+                    for entry in entries:
+                        if not entry.is_file():
+                            continue
+                        stat = entry.stat()
+                        if entry.name.endswith(".tmp"):
+                            if now - stat.st_mtime > STALE_TMP_SECONDS:
+                                self._remove(entry.path)
+                        elif entry.name.endswith((".pdf", ".zip")):
+                            artifacts.append((max(stat.st_atime, stat.st_mtime), stat.st_size, entry.path))
+            except OSError as e:
+                logger.warning(f"Could not scan PDF store {self.root}: {e}")
+                return
+
+            artifacts.sort()
+            total = sum(size for _, size, _ in artifacts)
+            for last_used, size, path in artifacts:
+                if now - last_used <= self.ttl_seconds and total <= self.max_bytes:
+                    break
+                if self._remove(path):
+                    total -= size
+                    self.evicted += 1
+                    logger.info(f"Evicted PDF artifact {path}")
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def stats(self):
+        files = 0
+        total = 0
+        try:
+            with os.scandir(self.root) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.endswith((".pdf", ".zip")):
+                        files += 1
+                        total += entry.stat().st_size
+        except OSError:
+            pass
+        return {"files": files, "bytes": total, "max_bytes": self.max_bytes, "evicted": self.evicted}
@@ -0,0 +1,155 @@
+# Record/replay of every external call the pipeline makes, for reproducible offline runs.
+#
+# REPLAY_MODE=record passes calls through to Gemini and the HTTP APIs and saves each
+# response under REPLAY_DIR; REPLAY_MODE=replay answers from those fixtures only and never
+# touches the network (API keys are not needed). Gemini calls are captured by
+# RecordReplayChatModel (see agents.LLMPool); Serper, SerpAPI, Unsplash and image
+# downloads by http_client.OutboundSession. REPLAY_LATENCY_SCALE=1 makes replay wait as
+# long as the recorded call took (default 0: answer immediately).
+import base64
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+from typing import Any
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "record", "replay")
+
+# Query parameters that carry credentials; dropped from fixture keys and never written to disk
+SECRET_PARAMS = {"api_key", "key", "client_id", "access_key"}
+
+
+class ReplayMiss(requests.ConnectionError):
+    """No fixture for a call made in replay mode. Subclasses ConnectionError so callers treat it as offline."""
+
+
+def mode():
+    value = os.environ.get("REPLAY_MODE", "off").lower()
+    if value not in MODES:
+        raise ValueError(f"REPLAY_MODE must be one of {MODES}, got '{value}'")
+    return value
+
+
+def enabled():
+    return mode() != "off"
+
+
+class FixtureStore:
+    """JSON fixtures under <root>/<kind>/<sha256 of the request key>.json, written atomically."""
+
+    def __init__(self, root=None):
+        self.root = root or os.environ.get("REPLAY_DIR", os.path.join("fixtures", "replay"))
+
+    def _path(self, kind, key):
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, kind, f"{digest}.json")
+
+    def load(self, kind, key):
+        try:
+            with open(self._path(kind, key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, kind, key, fixture):
+        path = self._path(kind, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(dict(fixture, key=key), f)
+        os.replace(tmp_path, path)
+
+
+def _replay_delay(fixture):
+    scale = float(os.environ.get("REPLAY_LATENCY_SCALE", 0))
+    if scale > 0:
+        time.sleep(fixture.get("seconds", 0) * scale)
+
+
+class RecordReplayChatModel(BaseChatModel):
+    """Chat model that records the wrapped model's answers, or replays them without it."""
+
+    inner: Any = None
+    store: Any = None
+
+    @property
+    def _llm_type(self):
+        return "record-replay"
+
+    @staticmethod
+    def _key(messages, stop):
+        return json.dumps({"messages": [[m.type, str(m.content)] for m in messages], "stop": stop or []})
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        store = self.store or FixtureStore()
+        key = self._key(messages, stop)
+        if mode() == "replay":
+            fixture = store.load("llm", key)
+            if fixture is None:
+                raise ReplayMiss(f"No recorded LLM response for a {len(messages)}-message prompt")
+            _replay_delay(fixture)
+            text = fixture["text"]
+        else:
+            started = time.perf_counter()
+            result = self.inner._generate(messages, stop=stop, **kwargs)
+            text = "".join(str(g.message.content) for g in result.generations)
+            store.save("llm", key, {"text": text, "seconds": time.perf_counter() - started})
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+
+def _http_key(method, url, params=None, data=None, json_body=None):
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query) + list((params or {}).items())
+    query = sorted((k, str(v)) for k, v in query if k.lower() not in SECRET_PARAMS)
+    body = data if json_body is None else json.dumps(json_body, sort_keys=True)
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", "replace")
+    return json.dumps({
+        "method": method.upper(),
+        "url": urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), "")),
+        "body": body or "",
+    })
+
+
+def _build_response(fixture, url):
+    response = requests.Response()
+    response.status_code = fixture["status"]
+    response.headers.update(fixture["headers"])
+    response.raw = io.BytesIO(base64.b64decode(fixture["body"]))
+    response.url = url
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    return response
+
+
+def http_request(send, method, url, store=None, **kwargs):
+    """Runs one HTTP call through record/replay; send(method, url, **kwargs) performs the real request."""
+    store = store or FixtureStore()
+    key = _http_key(method, url, kwargs.get("params"), kwargs.get("data"), kwargs.get("json"))
+    if mode() == "replay":
+        fixture = store.load("http", key)
+        if fixture is None:
+            raise ReplayMiss(f"No recorded response for {method.upper()} {urlsplit(url).netloc}{urlsplit(url).path}")
+        _replay_delay(fixture)
+        return _build_response(fixture, url)
+
+    started = time.perf_counter()
+    response = send(method, url, **kwargs)
+    body = response.content  # reads streamed bodies too; iter_content() then serves the cached bytes
+    headers = {k: v for k, v in response.headers.items() if k.lower() in ("content-type", "content-length", "retry-after")}
+    store.save("http", key, {
+        "status": response.status_code,
+        "headers": headers,
+        "body": base64.b64encode(body).decode("ascii"),
+        "seconds": time.perf_counter() - started,
+    })
+    return response
@@ -0,0 +1,169 @@
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from textwrap import dedent
+
+import telemetry
+from budget import BudgetExceeded
+from formatting import FENCE_RE, HEADING_RE, normalize_markers
+from search_results import parse_results
+from Tools.local_search_tool import search_local_first
+
+logger = logging.getLogger(__name__)
+
+# "long" fans research out for long-preference requests only; "always" or "off" to force it
+RESEARCH_FANOUT = os.environ.get("RESEARCH_FANOUT", "long")
+RESEARCH_SUBTOPICS = int(os.environ.get("RESEARCH_SUBTOPICS", 4))
+# Per request: at most this many subtopics search and summarize at the same time
+RESEARCH_WORKERS = int(os.environ.get("RESEARCH_WORKERS", 4))
+
+# Used when the planning call returns nothing usable
+DEFAULT_SUBTOPICS = ["Overview and key concepts", "How it works", "Examples and applications",
+                     "Common mistakes and limitations", "History and context", "Further details"]
+PLAN_PROMPT = dedent("""
+    Split the topic '{topic}' into {count} distinct subtopics that together cover
+    what notes tailored to the preference '{preference}' need.
+    Answer with one short subtopic title per line and nothing else.
+""")
+SUBTOPIC_PROMPT = dedent("""
+    You are writing the '{subtopic}' section of notes on '{topic}', tailored to the preference '{preference}'.
+    Using the search results below and your own knowledge, write the body of that section in markdown:
+    short paragraphs, '-' bullets or '1.' numbered lists, **bold** for key terms, fenced code blocks
+    and pipe tables where useful, and '###' for any subsections. Do not repeat the section title and
+    do not add introductory or concluding remarks.
+    Search results:
+    ------------
+""") + "{results}\n------------"
+PLAN_LINE_RE = re.compile(r'^\s*(?:[-*+•]|\d+[.)])?\s*(.+?)\s*$')
+
+
+def wants_fanout(preference):
+    if RESEARCH_FANOUT == "always":
+        return True
+    if RESEARCH_FANOUT == "long":
+        return "long" in str(preference).lower()
+    return False
+
+
+def _snippet_section(results):
+    """The raw search results as markdown bullets, for when summarization is not possible."""
+    lines = []
+    for title, link, snippet in parse_results(results):
+        lines.append(f"- **{title}**: {snippet} ({link})")
+    return "\n".join(lines)
+
+
+class ResearchFanOut:
+    """Researches a topic as independent subtopics instead of one agent's serial tool loop.
+
+    One LLM call splits the topic into up to RESEARCH_SUBTOPICS subtopics; each is then
+    searched (the local index first, then the web) and summarized by one LLM call, with up
+    to RESEARCH_WORKERS subtopics in flight, so wall time follows the slowest subtopic
+    rather than the sum. The sections are merged, in plan order, into markdown notes for the
+    structuring task. Searches are charged to the request budget like tool calls; a
+    subtopic whose summary the budget no longer allows keeps its raw search results.
+    """
+
+    def __init__(self, llm, budget=None, subtopics=None, workers=None, search=None):
+        self.llm = llm
+        self.budget = budget
+        self.subtopics = subtopics or RESEARCH_SUBTOPICS
+        self.workers = workers or RESEARCH_WORKERS
+        self.search = search or search_local_first
+
+    def _ask(self, prompt):
+        return str(self.llm.invoke(prompt).content).strip()
+
+    def plan(self, topic, preference):
+        """Up to self.subtopics distinct subtopic titles for the topic."""
+        with telemetry.span("research", "plan") as fields:
+            try:
+                answer = self._ask(PLAN_PROMPT.format(topic=topic, count=self.subtopics, preference=preference))
+            except BudgetExceeded:
+                raise
+            except Exception as e:
+                logger.warning(f"Subtopic planning failed, using default subtopics: {e}")
+                answer = ""
+            titles = []
+            for line in answer.split("\n"):
+                title = PLAN_LINE_RE.match(line).group(1).strip("*#: ")
+                if title and title.lower() not in (t.lower() for t in titles):
+                    titles.append(title)
+            if len(titles) < 2:
+                titles = DEFAULT_SUBTOPICS
+            titles = titles[:self.subtopics]
+            fields["subtopics"] = len(titles)
+        return titles
+
+    def research_subtopic(self, topic, preference, subtopic):
+        """Markdown body of one subtopic's section, or None if nothing was found."""
+        with telemetry.span("research", "subtopic", subtopic=subtopic) as fields:
+            if self.budget is not None:
+                reason = self.budget.charge_tool_call()
+                if reason:
+                    logger.info(f"Skipping search for subtopic '{subtopic}': {reason}")
+                    fields["skipped"] = reason
+                    return None
+            try:
+                results = self.search(f"{topic} {subtopic}")
+            except LookupError:
+                logger.info(f"No search results for subtopic '{subtopic}'")
+                return None
+            except Exception as e:
+                logger.warning(f"Search for subtopic '{subtopic}' failed: {e}")
+                fields["error"] = type(e).__name__
+                return None
+            if self.budget is not None:
+                self.budget.observe(results)
+            fields["bytes"] = len(results.encode("utf-8"))
+
+            try:
+                summary = self._ask(SUBTOPIC_PROMPT.format(subtopic=subtopic, topic=topic, preference=preference,
+                                                           results=results))
+            except BudgetExceeded as e:
+                logger.info(f"Keeping raw search results for subtopic '{subtopic}': {e}")
+                fields["summarized"] = False
+                return _snippet_section(results) or None
+            except Exception as e:
+                logger.warning(f"Summarizing subtopic '{subtopic}' failed, keeping raw results: {e}")
+                fields["summarized"] = False
+                return _snippet_section(results) or None
+            fields["summarized"] = True
+            return self._section_body(summary, subtopic)
+
+    @staticmethod
+    def _section_body(text, subtopic):
+        """Tidied summary with a repeated section title dropped and its own headings made subsections."""
+        lines = normalize_markers(text).split("\n")
+        heading = HEADING_RE.match(lines[0]) if lines else None
+        if heading and heading.group(2).lower() == subtopic.lower():
+            lines = lines[1:]
+        body = []
+        fence = None
+        for line in lines:
+            fence_match = FENCE_RE.match(line)
+            if fence is not None:
+                if fence_match and fence_match.group(1) == fence and not fence_match.group(2):
+                    fence = None
+            elif fence_match:
+                fence = fence_match.group(1)
+            elif line.startswith(("# ", "## ")):
+                line = "### " + line.split(" ", 1)[1]
+            body.append(line)
+        return "\n".join(body).strip()
+
+    def run(self, topic, preference):
+        """Merged markdown notes on the topic, or None if no subtopic found anything."""
+        subtopics = self.plan(topic, preference)
+        research = telemetry.in_context(self.research_subtopic)  # keep the spans in the request's trace
+        with ThreadPoolExecutor(max_workers=min(len(subtopics), self.workers),
+                                thread_name_prefix="research") as pool:
+            futures = [pool.submit(research, topic, preference, subtopic) for subtopic in subtopics]
+            bodies = [future.result() for future in futures]
+
+        sections = [f"## {subtopic}\n\n{body}" for subtopic, body in zip(subtopics, bodies) if body]
+        logger.info(f"Researched {len(sections)}/{len(subtopics)} subtopics of '{topic}'")
+        if not sections:
+            return None
+        return normalize_markers("\n\n".join(sections), title=topic)
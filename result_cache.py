@@ -0,0 +1,163 @@
+import hashlib
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+
+import research
+from agents import CustomAgents
+from formatting import NORMALIZATION_VERSION
+from tasks import CustomTasks
+
+logger = logging.getLogger(__name__)
+
+# Any edit to the task prompts, the agents' roles, goals and backstories, the fan-out research
+# prompts or the markdown normalization version changes this hash, which invalidates older cached notes
+PROMPT_VERSION = hashlib.sha256(json.dumps([
+    inspect.getsource(CustomTasks),
+    [inspect.getsource(getattr(CustomAgents, name)) for name in sorted(vars(CustomAgents)) if name.endswith("_agent")],
+    research.PLAN_PROMPT,
+    research.SUBTOPIC_PROMPT,
+    NORMALIZATION_VERSION,
+]).encode("utf-8")).hexdigest()[:16]
+
+# Trailing "?" or quotes around a topic do not change what the notes should cover
+TOPIC_EDGE_PUNCTUATION = " .,;:!?'\"`"
+
+
+def normalize_topic(topic):
+    """Casefolds the topic and collapses whitespace so trivial variants share a key.
+
+    Only sentence punctuation around the topic is dropped; symbols inside it are kept, so
+    "C", "C++" and "C#" stay three different topics.
+    """
+    return " ".join(topic.casefold().split()).strip(TOPIC_EDGE_PUNCTUATION)
+
+
+class ResultCache:
+    """Persistent on-disk cache of crew output and rendered PDFs with TTL and LRU eviction."""
+
+    def __init__(self, cache_dir=None, ttl_seconds=None, max_entries=None):
+        self.cache_dir = cache_dir or os.environ.get("RESULT_CACHE_DIR", os.path.join("cache", "results"))
+        self.ttl_seconds = ttl_seconds or int(os.environ.get("RESULT_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+        self.max_entries = max_entries or int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", 500))
+        self.enabled = os.environ.get("RESULT_CACHE_ENABLED", "1") != "0"
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, topic, preference, mode="full"):
+        raw = json.dumps([normalize_topic(topic), preference.strip().lower(), mode, PROMPT_VERSION])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, topic, preference, mode="full", count=True):
+        """Returns the cached entry dict, or None on a miss or expired entry.
+
+        count=False leaves the hit/miss counters alone, for lookups that are not requests.
+        """
+        if not self.enabled:
+            return None
+        path = self._entry_path(self.make_key(topic, preference, mode))
+        entry = None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            if time.time() - entry["created_at"] > self.ttl_seconds:
+                logger.info(f"Result cache entry expired for topic: '{topic}'")
+                os.remove(path)
+                entry = None
+            else:
+                # Bump the access time; eviction drops the least recently used files first
+                os.utime(path)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Discarding unreadable result cache entry {path}: {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            entry = None
+
+        if count:
+            with self._lock:
+                if entry:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+        return entry
+
+    def put(self, topic, preference, markdown, pdf_path, mode="full", **extra):
+        """Stores the crew markdown and rendered PDF path; extra keys are saved alongside."""
+        if not self.enabled:
+            return
+        key = self.make_key(topic, preference, mode)
+        entry = {
+            "topic": topic,
+            "preference": preference,
+            "mode": mode,
+            "prompt_version": PROMPT_VERSION,
+            "markdown": markdown,
+            "pdf_path": pdf_path,
+            "created_at": time.time(),
+        }
+        entry.update(extra)
+        path = self._entry_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write result cache entry {path}: {e}")
+            return
+        self._evict()
+
+    def iter_entries(self):
+        """Yields every live entry written with the current prompt version (used to rebuild indexes)."""
+        if not self.enabled:
+            return
+        try:
+            names = [n for n in os.listdir(self.cache_dir) if n.endswith(".json")]
+        except OSError:
+            return
+        for name in names:
+            try:
+                with open(os.path.join(self.cache_dir, name), "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if entry.get("prompt_version") == PROMPT_VERSION and time.time() - entry.get("created_at", 0) <= self.ttl_seconds:
+                yield entry
+
+    def _evict(self):
+        with self._lock:
+            try:
+                names = [n for n in os.listdir(self.cache_dir) if n.endswith(".json")]
+            except OSError:
+                return
+            if len(names) <= self.max_entries:
+                return
+            paths = [os.path.join(self.cache_dir, n) for n in names]
+            paths.sort(key=lambda p: os.path.getmtime(p) if os.path.exists(p) else 0)
+            for path in paths[:len(paths) - self.max_entries]:
+                try:
+                    os.remove(path)
+                    logger.info(f"Evicted result cache entry {path}")
+                except OSError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "prompt_version": PROMPT_VERSION,
+            }
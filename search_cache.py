@@ -0,0 +1,93 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query):
+    """Case and whitespace-insensitive form of a search query; punctuation such as "C++" vs "C#" matters."""
+    return " ".join(str(query).casefold().split())
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SearchCache:
+    """In-memory TTL + LRU memo for search results with single-flight request coalescing.
+
+    Concurrent lookups of the same normalised query share one upstream call: the first
+    caller fetches, the others wait for its result (or its exception). Exceptions are
+    never cached.
+    """
+
+    def __init__(self, ttl_seconds=None, max_entries=None):
+        self.ttl_seconds = ttl_seconds or int(os.environ.get("SEARCH_CACHE_TTL_SECONDS", 3600))
+        self.max_entries = max_entries or int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", 1000))
+        self.enabled = os.environ.get("SEARCH_CACHE_ENABLED", "1") != "0"
+        self._entries = OrderedDict()  # key -> (stored_at, result), least recently used first
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get_or_fetch(self, query, fetch):
+        """Returns the cached result for query, or calls fetch(query) once for all concurrent callers."""
+        if not self.enabled:
+            return fetch(query)
+
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.time() - entry[0] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            in_flight = self._in_flight.get(key)
+            if in_flight:
+                self.coalesced += 1
+                leader = False
+            else:
+                in_flight = self._in_flight[key] = _InFlight()
+                self.misses += 1
+                leader = True
+
+        if not leader:
+            logger.info(f"Search for '{query}' joined an in-flight request")
+            in_flight.done.wait()
+            if in_flight.error:
+                raise in_flight.error
+            return in_flight.result
+
+        try:
+            in_flight.result = fetch(query)
+        except Exception as e:
+            in_flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+                if in_flight.error is None:
+                    self._entries[key] = (time.time(), in_flight.result)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            in_flight.done.set()
+        return in_flight.result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+            }
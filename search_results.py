@@ -0,0 +1,24 @@
+import re
+
+# The one text format search results are handed to agents in, and parsed back from.
+# Fields are flattened to a single line when formatted, so a title or snippet holding a
+# newline cannot break a parse.
+RESULT_SEPARATOR = "-----------------"
+RESULT_RE = re.compile(r"^Title: (.*)\nLink: (.*)\nSnippet: (.*)$", re.MULTILINE)
+
+
+def _one_line(value):
+    return " ".join(str(value).split())
+
+
+def format_results(results):
+    """Text of (title, link, snippet) results, each followed by a separator line."""
+    return "\n".join(
+        f"Title: {_one_line(title)}\nLink: {_one_line(link)}\nSnippet: {_one_line(snippet)}\n\n{RESULT_SEPARATOR}"
+        for title, link, snippet in results
+    )
+
+
+def parse_results(text):
+    """(title, link, snippet) tuples of every result found in text produced by format_results()."""
+    return [tuple(part.strip() for part in match.groups()) for match in RESULT_RE.finditer(str(text))]
@@ -0,0 +1,209 @@
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+from result_cache import normalize_topic
+
+logger = logging.getLogger(__name__)
+
+# Words that make "intro to photosynthesis" and "photosynthesis basics" different strings
+# without changing what the notes should cover
+FILLER_WORDS = {
+    "a", "an", "the", "to", "of", "on", "about", "for", "in", "into", "and",
+    "intro", "introduction", "basic", "basics", "overview", "fundamentals", "notes",
+    "beginner", "beginners", "guide", "explained", "summary",
+}
+
+NGRAM_SIZE = 3
+# Prefixes that turn a word into a different subject ("organic"/"inorganic", "micro"/"macro")
+CONTRASTING_PREFIXES = ("in", "im", "il", "ir", "un", "non", "anti", "micro", "macro")
+ROMAN_NUMERAL_RE = re.compile(r"^(?=[ivxlc]+$)c{0,3}(?:xc|xl|l?x{0,3})(?:ix|iv|v?i{0,3})$")
+WORD_EDGE_PUNCTUATION = ",.;:!?()[]\"'"
+# Notes cached by other worker processes are picked up when the index is refreshed this often
+SIMILAR_REFRESH_SECONDS = float(os.environ.get("SIMILAR_REFRESH_SECONDS", 300))
+
+
+def topic_terms(topic):
+    """Normalised topic with filler words removed (kept as-is if nothing else is left)."""
+    words = [w for w in (word.strip(WORD_EDGE_PUNCTUATION) for word in normalize_topic(topic).split()) if w]
+    meaningful = [w for w in words if w not in FILLER_WORDS]
+    return " ".join(meaningful or words)
+
+
+def topic_ngrams(topic):
+    """Set of character trigrams of the topic's meaningful words, padded so word edges count."""
+    text = f" {topic_terms(topic)} "
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+def _is_number(word):
+    return any(c.isdigit() for c in word) or bool(ROMAN_NUMERAL_RE.match(word))
+
+
+def _stem(word):
+    for prefix in CONTRASTING_PREFIXES:
+        if word.startswith(prefix) and len(word) - len(prefix) >= 3:
+            return word[len(prefix):]
+    return word
+
+
+def topics_contrast(topic, other):
+    """True if the topics name different subjects despite looking alike as character trigrams.
+
+    That is when they differ by a number ("World War I"/"II", "Type 1"/"Type 2"), by a word
+    carrying a symbol ("C"/"C++"/"C#") or by a contrasting prefix ("organic"/"inorganic",
+    "microeconomics"/"macroeconomics").
+    """
+    words, other_words = set(topic_terms(topic).split()), set(topic_terms(other).split())
+    if {w for w in words if _is_number(w)} != {w for w in other_words if _is_number(w)}:
+        return True
+    only, other_only = words - other_words, other_words - words
+    if any(re.search(r"[^\w]", word) for word in only | other_only):
+        return True
+    return any(_stem(a) == _stem(b) for a in only for b in other_only)
+
+
+class TopicIndex:
+    """In-memory inverted index of character trigrams over topics with cached notes.
+
+    Entries are partitioned by (preference, mode), because notes are only interchangeable
+    for the same preference and crew mode. A query scores just the entries that share at
+    least one trigram (cosine over trigram sets), so lookups stay well under a millisecond
+    for the few hundred topics the result cache holds.
+    """
+
+    def __init__(self):
+        self._entries = {}  # entry id -> (topic, preference, mode, ngram count)
+        self._postings = {}  # (preference, mode) -> {ngram: set of entry ids}
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.matches = 0
+
+    @staticmethod
+    def _partition(preference, mode):
+        return (normalize_topic(preference), mode)
+
+    def add(self, topic, preference, mode):
+        partition = self._partition(preference, mode)
+        entry_id = (topic_terms(topic),) + partition
+        ngrams = topic_ngrams(topic)
+        with self._lock:
+            if entry_id in self._entries:
+                return
+            self._entries[entry_id] = (topic, preference, mode, len(ngrams))
+            postings = self._postings.setdefault(partition, {})
+            for ngram in ngrams:
+                postings.setdefault(ngram, set()).add(entry_id)
+
+    def remove(self, topic, preference, mode):
+        partition = self._partition(preference, mode)
+        entry_id = (topic_terms(topic),) + partition
+        with self._lock:
+            if self._entries.pop(entry_id, None) is None:
+                return
+            postings = self._postings.get(partition, {})
+            for ngram in topic_ngrams(topic):
+                ids = postings.get(ngram)
+                if ids:
+                    ids.discard(entry_id)
+                    if not ids:
+                        del postings[ngram]
+
+    def query(self, topic, preference, mode, min_score, limit=3):
+        """Most similar indexed topics as (score, topic, preference, mode), best first, scoring at least min_score."""
+        ngrams = topic_ngrams(topic)
+        partition = self._partition(preference, mode)
+        with self._lock:
+            self.queries += 1
+            postings = self._postings.get(partition, {})
+            overlaps = Counter()
+            for ngram in ngrams:
+                overlaps.update(postings.get(ngram, ()))
+            scored = []
+            for entry_id, overlap in overlaps.items():
+                entry_topic, entry_preference, entry_mode, size = self._entries[entry_id]
+                score = overlap / math.sqrt(len(ngrams) * size)
+                if score >= min_score:
+                    scored.append((score, entry_topic, entry_preference, entry_mode))
+            scored.sort(key=lambda match: match[0], reverse=True)
+            if scored:
+                self.matches += 1
+        return scored[:limit]
+
+    def stats(self):
+        with self._lock:
+            return {"topics": len(self._entries), "queries": self.queries, "matches": self.matches}
+
+
+class SimilarNotes:
+    """Finds earlier notes on a near-identical topic, to reuse outright or to seed the crew with.
+
+    SIMILAR_REUSE_THRESHOLD (default 0.9) is the score at which an earlier result is served
+    as-is; SIMILAR_SEED_THRESHOLD (default 0.6) the score at which it is handed to the crew
+    as a starting point. Scores run from 0 to 1; a threshold above 1 disables that use.
+    Topics that differ by a number, a symbol or a contrasting prefix are never reused
+    outright, however high they score (see topics_contrast).
+
+    The index lives in this process: add() makes new notes findable here at once, and notes
+    cached by other workers are picked up when it is refreshed from the result cache, every
+    SIMILAR_REFRESH_SECONDS.
+    """
+
+    def __init__(self, result_cache, reuse_threshold=None, seed_threshold=None):
+        self.result_cache = result_cache
+        if reuse_threshold is None:
+            reuse_threshold = float(os.environ.get("SIMILAR_REUSE_THRESHOLD", 0.9))
+        if seed_threshold is None:
+            seed_threshold = float(os.environ.get("SIMILAR_SEED_THRESHOLD", 0.6))
+        self.reuse_threshold = reuse_threshold
+        self.seed_threshold = seed_threshold
+        self.index = TopicIndex()
+        self._loaded_at = None
+        self._load_lock = threading.Lock()
+
+    def _is_fresh(self):
+        return self._loaded_at is not None and time.time() - self._loaded_at < SIMILAR_REFRESH_SECONDS
+
+    def _ensure_loaded(self):
+        if self._is_fresh():
+            return
+        with self._load_lock:
+            if not self._is_fresh():
+                # add() skips topics already indexed; ones gone from the cache are dropped by find()
+                count = 0
+                for entry in self.result_cache.iter_entries():
+                    self.index.add(entry["topic"], entry["preference"], entry.get("mode", "full"))
+                    count += 1
+                logger.info(f"Indexed {count} cached topics for similarity lookups.")
+                self._loaded_at = time.time()
+
+    def add(self, topic, preference, mode):
+        self._ensure_loaded()
+        self.index.add(topic, preference, mode)
+
+    def find(self, topic, preference, mode):
+        """Returns (score, cached entry) for the best live match above the seed threshold, or None."""
+        self._ensure_loaded()
+        threshold = min(self.reuse_threshold, self.seed_threshold)
+        if threshold > 1:
+            return None
+        for score, match_topic, match_preference, match_mode in self.index.query(topic, preference, mode, threshold):
+            # Not a cache request of its own, so it must not count towards the hit rate
+            entry = self.result_cache.get(match_topic, match_preference, match_mode, count=False)
+            if entry:
+                logger.info(f"Topic '{topic}' resembles cached '{match_topic}' (score {score:.2f})")
+                return score, entry
+            # Expired or evicted since it was indexed
+            self.index.remove(match_topic, match_preference, match_mode)
+        return None
+
+    def can_reuse(self, topic, score, entry):
+        """Whether a match found by find() may be served as-is rather than only seed the crew."""
+        return score >= self.reuse_threshold and not topics_contrast(topic, entry["topic"])
+
+    def stats(self):
+        return dict(self.index.stats(), reuse_threshold=self.reuse_threshold, seed_threshold=self.seed_threshold)
@@ -12,6 +12,7 @@ export function Dashboard() {
   const [noteLength, setNoteLength] = useState<'short' | 'long'>('short');
   const [notes, setNotes] = useState<string>('');
   const [pdfPath, setPdfPath] = useState<string | null>(null);
+  const [imageStatus, setImageStatus] = useState<string | null>(null);
   const [loading, setLoading] = useState(false);
   const [activeSection, setActiveSection] = useState<'notes' | 'profile'>('notes');
   const [isEditingName, setIsEditingName] = useState(false);
@@ -24,13 +25,20 @@ export function Dashboard() {
     resetToLightMode();
   }, []);
 
+  const stageLabels: Record<string, string> = {
+    data_task: 'Research finished, structuring notes...',
+    structuring_task: 'Notes structured, rendering PDF...',
+    notes_task: 'Notes written, rendering PDF...',
+  };
+
   const handleGenerate = async () => {
     setLoading(true);
-    setNotes('');
+    setNotes('Queued...');
     setPdfPath(null);
+    setImageStatus(null);
 
     try {
-      const response = await fetch('/api/generate_notes', {
+      const response = await fetch('/api/jobs', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -44,19 +52,46 @@ export function Dashboard() {
         throw new Error(data.error || 'Failed to generate notes');
       }
 
-      if (data.pdf_path) {
-        setPdfPath(data.pdf_path);
+      // Follow the job's progress events instead of holding the request open
+      const events = new EventSource(`/api/jobs/${data.job_id}/events`);
+      events.addEventListener('started', () => setNotes('Researching your topic...'));
+      events.addEventListener('task_completed', (event) => {
+        const { task } = JSON.parse((event as MessageEvent).data);
+        setNotes(stageLabels[task] || 'Working...');
+      });
+      // The illustration is searched alongside the crew, so it is its own step, not a stage
+      events.addEventListener('image_search', (event) => {
+        const { found } = JSON.parse((event as MessageEvent).data);
+        setImageStatus(found ? 'Illustration found.' : 'No illustration found, the PDF will have none.');
+      });
+      events.addEventListener('done', (event) => {
+        events.close();
+        const { result } = JSON.parse((event as MessageEvent).data);
+        setPdfPath(result.pdf_path);
         setNotes('PDF generated successfully! Click the link below to download.');
         incrementNotesCount();
-      } else {
-        throw new Error(data.error || 'PDF path not found in response.');
-      }
+        setLoading(false);
+      });
+      const fail = (message: string) => {
+        events.close();
+        setNotes(`Failed to generate notes: ${message}`);
+        setPdfPath(null);
+        setLoading(false);
+      };
+      events.addEventListener('failed', (event) => {
+        fail(JSON.parse((event as MessageEvent).data).error);
+      });
+      // Connection errors: EventSource reconnects and resumes on its own unless it has given up
+      events.addEventListener('error', () => {
+        if (events.readyState === EventSource.CLOSED) {
+          fail('Lost connection to the server');
+        }
+      });
 
     } catch (error: any) {
       console.error('Error generating notes:', error);
       setNotes(`Failed to generate notes: ${error.message}`);
       setPdfPath(null);
-    } finally {
       setLoading(false);
     }
   };
@@ -181,6 +216,11 @@ export function Dashboard() {
                       <p className="text-sm text-[#374151] dark:text-gray-300">
                         {notes}
                       </p>
+                      {imageStatus && (
+                        <p className="mt-2 text-sm text-[#374151]/70 dark:text-gray-400">
+                          {imageStatus}
+                        </p>
+                      )}
                       {pdfPath && (
                         <a
                           href={pdfPath}
@@ -7,16 +7,29 @@ class CustomTasks:
     def __tip_section(self):
         return "If you do your BEST WORK, I'll give you a $10,000 commission!"
 
-    def generate_notes_task(self, agent, topic, preference):
+    def __seed_section(self, seed):
+        # seed: (earlier topic, earlier notes) from a cached request on a near-identical topic
+        if not seed:
+            return ""
+        seed_topic, seed_notes = seed
+        return dedent(f"""
+                Notes were already written for the closely related topic '{seed_topic}':
+                ------------
+                {seed_notes}
+                ------------
+                Start from these notes: keep what applies, correct or adapt anything that does not fit this topic and preference, and only search the web for what is missing.
+            """)
+
+    def generate_notes_task(self, agent, topic, preference, seed=None):
         return Task(
             description=dedent(f"""
                 Generate comprehensive, well-structured notes on the given topic: '{topic}'.
                 Focus on clarity, accuracy, and detail, tailored to the preference: '{preference}'.
                 Consult multiple reliable web sources to gather information.
-                Structure the notes logically with clear headings (using '#' for main title, '##' for subheadings) and bullet points ('-' or '*') where appropriate.
-                Ensure the final output is coherent, informative, and ready for structuring and PDF generation.
+                Structure the notes logically in markdown: '#' for the main title, '##' for sections and '###' for subsections, '-' bullets or '1.' numbered lists where appropriate, and **bold** or *italic* for key terms. Use fenced code blocks for code or formulas and pipe tables for comparisons when they help.
+                Ensure the final output is coherent, informative, and ready for structuring.
                 Do not include any introductory or concluding remarks like "Here are the notes..." or "I hope this helps.". Just provide the structured text content.
-            """),
+            """) + self.__seed_section(seed),
             expected_output=dedent("""
                 Well-structured, detailed text content about the topic, formatted with markdown-style headings (#, ##) and bullet points (- or *).
                 Example:
@@ -37,6 +50,37 @@ class CustomTasks:
             async_execution=False,
         )
     
+    def generate_formatted_notes_task(self, agent, topic, preference, seed=None):
+        # Fast mode: research and PDF formatting in a single agent pass
+        return Task(
+            description=dedent(f"""
+                Research the topic '{topic}' using multiple reliable web sources and write comprehensive, accurate notes tailored to the preference: '{preference}'.
+                Format the notes in markdown:
+                1.  **Main Title:** Start the main title line exactly with `# ` (use only once).
+                2.  **Headings:** Use `## ` for sections and `### ` for subsections.
+                3.  **Lists:** Use `- ` for bullet points and `1. ` for numbered steps, indenting nested items by four spaces.
+                4.  **Emphasis:** Use `**bold**` and `*italic*` sparingly for key terms.
+                5.  **Code and tables:** Use fenced code blocks for code or formulas and pipe tables for comparisons.
+                6.  **Paragraphs:** Separate paragraphs with a blank line.
+                Do not include any introductory or concluding remarks like "Here are the notes..." or "I hope this helps.". Just provide the formatted notes.
+            """) + self.__seed_section(seed),
+            expected_output=dedent("""
+                Detailed notes about the topic in markdown.
+                Example:
+                # Main Title about Topic
+
+                ## Introduction
+                Some introductory text.
+
+                ## Key Concept 1
+                Explanation of the first key concept.
+                - Bullet point 1
+                - Bullet point 2
+            """),
+            agent=agent,
+            async_execution=False,
+        )
+
     def gather_information_task(self, agent, topic):
      return Task(
         description=dedent(f"""
@@ -69,6 +113,7 @@ class CustomTasks:
             ------------
             If the input content is JSON, use the JsonFormatterTool to convert it into well-formatted text.
             If it's already text, ensure it is well-structured for a PDF document.
+            Return markdown: exactly one '# ' main title, '##' sections and '###' subsections, '-' bullets or '1.' numbered lists, **bold** or *italic* for key terms, fenced code blocks and pipe tables where useful, and a blank line between paragraphs. The markdown is rendered to the PDF as-is.
             Structure the final text content according to the user's preferred format, enabling the generation of a well-organized PDF document.
             {self.__tip_section()}
             Ensure the structured content is readable, visually appealing, and follows the specified formatting guidelines.
@@ -76,27 +121,3 @@ class CustomTasks:
         agent=agent,
     )
 
-    def generate_pdf_task(self, agent, structured_content):
-     return Task(
-        description=dedent(f"""
-            **Task:** Format the provided content for PDF generation using specific markers.
-
-            **Input Content:**
-            ------------
-            {structured_content}
-            ------------
-
-            **Formatting Rules (Apply these markers to the text):**
-            1.  **Main Title:** Start the main title line **exactly** with `# ` (Use only once).
-            2.  **Section Headings:** Start major section heading lines **exactly** with `## `.
-            3.  **Bullet Points:** Start bullet point lines **exactly** with `- ` or `* `.
-            4.  **Paragraphs:** Separate paragraphs with a blank line.
-            5.  **DO NOT USE:** `###` headings or inline bold (`**`).
-
-            **Output:** Return the fully formatted text using only the allowed markers (#, ##, -/*).
-            {self.__tip_section()}
-        """),
-        agent=agent,
-        # Simplified expected output - focus on markers
-        expected_output="Well-structured text using only #, ##, -/* markers for formatting."
-    )
\ No newline at end of file
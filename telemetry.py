@@ -0,0 +1,223 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from token_usage import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+TOKENS_BUCKETS = (100, 500, 1000, 2000, 5000, 10000, 20000, 50000)
+
+# When set, every finished request trace is also written here as JSON
+TRACE_DIR = os.environ.get("TRACE_DIR")
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, rendered in the Prometheus text format."""
+
+    def __init__(self, name, help_text, buckets, label_names=("stage", "name")):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.label_names = label_names
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.setdefault(label_values, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for label_values, values in sorted(series.items()):
+            labels = ",".join(f'{key}="{_escape(value)}"' for key, value in zip(self.label_names, label_values))
+            for bound, count in zip(self.buckets, values):
+                lines.append(f'{self.name}_bucket{{{labels},le="{_format_number(bound)}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {values[-2]}')
+            lines.append(f"{self.name}_sum{{{labels}}} {_format_number(values[-1])}")
+            lines.append(f"{self.name}_count{{{labels}}} {values[-2]}")
+        return "\n".join(lines)
+
+
+def _format_number(value):
+    """Exact text for a sample value or bucket bound (":g" would round to 6 significant digits)."""
+    value = float(value)
+    if value.is_integer() and abs(value) < 2**53:
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+stage_seconds = Histogram("notes_stage_duration_seconds", "Time spent per pipeline stage.", DURATION_BUCKETS)
+stage_bytes = Histogram("notes_stage_bytes", "Bytes produced or transferred per pipeline stage.", BYTES_BUCKETS)
+stage_tokens = Histogram("notes_stage_tokens", "LLM tokens (prompt + completion) per pipeline stage.", TOKENS_BUCKETS)
+
+
+class Trace:
+    """Spans recorded for one request, in the order they finished."""
+
+    def __init__(self, **attrs):
+        self.attrs = attrs
+        self.started_at = time.time()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self):
+        with self._lock:
+            spans = list(self.spans)
+        return dict(self.attrs, started_at=self.started_at, duration=time.time() - self.started_at, spans=spans)
+
+
+_current_trace = contextvars.ContextVar("notes_trace", default=None)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def trace_request(**attrs):
+    """Collects every span recorded in this context (and in contexts copied from it) into one Trace."""
+    trace = Trace(**attrs)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        if TRACE_DIR:
+            _dump(trace)
+
+
+def _dump(trace):
+    try:
+        os.makedirs(TRACE_DIR, exist_ok=True)
+        label = re.sub(r"[^a-zA-Z0-9_]", "", str(trace.attrs.get("topic", "")))[:40]
+        path = os.path.join(TRACE_DIR, f"{int(trace.started_at * 1000)}_{label}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(trace.to_dict(), f, indent=2, default=str)
+    except OSError as e:
+        logger.warning(f"Could not write trace dump: {e}")
+
+
+def record(stage, seconds, name="", bytes=None, tokens=None, **attrs):
+    """Records a finished span: histograms always, the current request's trace if there is one."""
+    stage_seconds.observe(seconds, stage, name)
+    if bytes is not None:
+        stage_bytes.observe(bytes, stage, name)
+    if tokens is not None:
+        stage_tokens.observe(tokens, stage, name)
+    trace = _current_trace.get()
+    if trace is not None:
+        span = {"stage": stage, "name": name, "start": round(time.time() - seconds - trace.started_at, 4),
+                "duration": round(seconds, 4)}
+        if bytes is not None:
+            span["bytes"] = bytes
+        if tokens is not None:
+            span["tokens"] = tokens
+        span.update(attrs)
+        trace.add(span)
+
+
+@contextmanager
+def span(stage, name="", **attrs):
+    """Times the block as a span. The yielded dict may be filled with bytes, tokens or other attributes."""
+    started = time.perf_counter()
+    fields = dict(attrs)
+    try:
+        yield fields
+    except Exception as e:
+        fields["error"] = type(e).__name__
+        raise
+    finally:
+        record(stage, time.perf_counter() - started, name, **fields)
+
+
+def in_context(fn):
+    """Binds fn to the caller's context so spans recorded on executor threads join the caller's trace."""
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        # A Context can only be entered by one thread at a time, so each call gets its own copy
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run
+
+
+def instrument_tool(tool):
+    """Returns a copy of a LangChain tool whose calls are recorded as tool spans."""
+    original = tool.func
+
+    @functools.wraps(original)
+    def traced(*args, **kwargs):
+        with span("tool", tool.name) as fields:
+            result = original(*args, **kwargs)
+            fields["bytes"] = len(str(result).encode("utf-8"))
+            return result
+
+    # construct() rather than copy(update=...), which drops fields that were never set
+    return type(tool).construct(**dict(tool.__dict__, func=traced))
+
+
+class LLMSpanHandler(BaseCallbackHandler):
+    """LangChain callback recording each LLM call as an "llm" span with its token estimate."""
+
+    def __init__(self, name=""):
+        self.name = name
+        self._started = {}  # run_id -> (perf_counter, prompt tokens)
+        self._lock = threading.Lock()
+
+    def on_llm_start(self, serialized, prompts, run_id=None, **kwargs):
+        self._start(run_id, sum(estimate_tokens(p) for p in prompts))
+
+    def on_chat_model_start(self, serialized, messages, run_id=None, **kwargs):
+        self._start(run_id, sum(estimate_tokens(str(m.content)) for batch in messages for m in batch))
+
+    def _start(self, run_id, prompt_tokens):
+        with self._lock:
+            self._started[run_id] = (time.perf_counter(), prompt_tokens)
+
+    def on_llm_end(self, response, run_id=None, **kwargs):
+        with self._lock:
+            started, prompt_tokens = self._started.pop(run_id, (None, 0))
+        if started is None:
+            return
+        text = "".join(g.text for batch in response.generations for g in batch)
+        completion_tokens = estimate_tokens(text)
+        record("llm", time.perf_counter() - started, self.name, bytes=len(text.encode("utf-8")),
+               tokens=prompt_tokens + completion_tokens,
+               prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+    def on_llm_error(self, error, run_id=None, **kwargs):
+        with self._lock:
+            started, _ = self._started.pop(run_id, (None, 0))
+        if started is not None:
+            record("llm", time.perf_counter() - started, self.name, error=type(error).__name__)
+
+
+def render_prometheus():
+    return "\n\n".join(h.render() for h in (stage_seconds, stage_bytes, stage_tokens)) + "\n"
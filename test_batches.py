@@ -0,0 +1,11 @@
+from batches import Batch, BatchRegistry
+
+
+def test_item_limit_fits_the_job_queue():
+    assert BatchRegistry(max_items=30, max_jobs=20).max_items == 20
+    assert BatchRegistry(max_items=10, max_jobs=20).max_items == 10
+
+
+def test_symbol_topics_are_not_merged():
+    batch = Batch([("C++", "short"), ("C#", "short"), ("c++ ", "Short")], "zip", finalize=None)
+    assert [(topic, indexes) for topic, _, indexes in batch.unique_items()] == [("C++", [0, 2]), ("C#", [1])]
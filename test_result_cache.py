@@ -0,0 +1,13 @@
+from result_cache import ResultCache, normalize_topic
+
+
+def test_symbols_keep_topics_apart():
+    topics = ["C", "C++", "C#", "F", "F#"]
+    assert len({normalize_topic(topic) for topic in topics}) == len(topics)
+
+
+def test_trivial_variants_share_a_key(tmp_path):
+    cache = ResultCache(cache_dir=str(tmp_path))
+    assert normalize_topic("  What is  Photosynthesis? ") == normalize_topic("what is photosynthesis")
+    assert cache.make_key("C++", "short") == cache.make_key(" c++ ", "Short")
+    assert cache.make_key("C++", "short") != cache.make_key("C#", "short")
@@ -0,0 +1,20 @@
+from search_cache import SearchCache, normalize_query
+
+
+def test_language_symbols_are_different_queries():
+    queries = ["C++ generics", "C# generics", "C generics"]
+    assert len({normalize_query(query) for query in queries}) == len(queries)
+    assert normalize_query("  c++   Generics ") == normalize_query("C++ generics")
+
+
+def test_symbol_queries_are_fetched_separately():
+    cache = SearchCache()
+    fetched = []
+
+    def fetch(query):
+        fetched.append(query)
+        return f"results for {query}"
+
+    assert cache.get_or_fetch("C++ generics", fetch) == "results for C++ generics"
+    assert cache.get_or_fetch("C# generics", fetch) == "results for C# generics"
+    assert fetched == ["C++ generics", "C# generics"]
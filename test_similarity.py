@@ -0,0 +1,30 @@
+from result_cache import ResultCache
+from similarity import SimilarNotes, topics_contrast
+
+
+def test_contrasting_topics_are_never_reused(tmp_path):
+    cache = ResultCache(cache_dir=str(tmp_path))
+    notes = SimilarNotes(cache, reuse_threshold=0.5, seed_threshold=0.5)
+    for topic, other in [("Organic chemistry", "Inorganic chemistry"), ("World War I", "World War II"),
+                         ("Type 1 diabetes", "Type 2 diabetes"), ("Microeconomics", "Macroeconomics")]:
+        cache.put(topic, "short", f"# {topic}", None)
+        notes.add(topic, "short", "full")
+        match = notes.find(other, "short", "full")
+        assert match is None or not notes.can_reuse(other, *match)
+
+
+def test_rephrased_topics_are_reused(tmp_path):
+    cache = ResultCache(cache_dir=str(tmp_path))
+    notes = SimilarNotes(cache)
+    cache.put("Photosynthesis", "short", "# Photosynthesis", None)
+    notes.add("Photosynthesis", "short", "full")
+    assert notes.can_reuse("intro to photosynthesis", *notes.find("intro to photosynthesis", "short", "full"))
+    assert not topics_contrast("The French Revolution", "French revolution, explained")
+
+
+def test_find_does_not_count_as_cache_traffic(tmp_path):
+    cache = ResultCache(cache_dir=str(tmp_path))
+    notes = SimilarNotes(cache)
+    cache.put("Photosynthesis", "short", "# Photosynthesis", None)
+    notes.find("photosynthesis basics", "short", "full")
+    assert (cache.hits, cache.misses) == (0, 0)
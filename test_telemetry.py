@@ -0,0 +1,44 @@
+import re
+
+import telemetry
+
+SAMPLE_RE = re.compile(r'^(\w+)\{(.*)\} (\S+)$')
+
+
+def parse_samples(text):
+    """{(metric name, frozenset of label pairs): value} for every sample line of a Prometheus text page."""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        name, labels, value = SAMPLE_RE.match(line).groups()
+        pairs = frozenset(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', labels))
+        samples[(name, pairs)] = float(value)
+    return samples
+
+
+def test_rendered_histogram_parses_back_exactly():
+    histogram = telemetry.Histogram("test_bytes", "Bytes.", telemetry.BYTES_BUCKETS)
+    for value in (500, 2_000_000, 12_345_678, 22_691_356):
+        histogram.observe(value, "pdf_render", "")
+    histogram.observe(0.1, "pdf_render", "small")
+
+    samples = parse_samples(histogram.render())
+    labels = {("stage", "pdf_render"), ("name", "")}
+    bounds = {float(dict(pairs)["le"]) for name, pairs in samples if name == "test_bytes_bucket" and pairs > labels
+              and dict(pairs)["le"] != "+Inf"}
+    assert bounds == {float(b) for b in telemetry.BYTES_BUCKETS}
+    assert samples[("test_bytes_bucket", frozenset(labels | {("le", "1048576")}))] == 1
+    assert samples[("test_bytes_bucket", frozenset(labels | {("le", "16777216")}))] == 3
+    assert samples[("test_bytes_bucket", frozenset(labels | {("le", "+Inf")}))] == 4
+    assert samples[("test_bytes_sum", frozenset(labels))] == 37_037_534
+    assert samples[("test_bytes_count", frozenset(labels))] == 4
+    assert samples[("test_bytes_sum", frozenset({("stage", "pdf_render"), ("name", "small")}))] == 0.1
+
+
+def test_metrics_page_has_every_bucket_bound():
+    telemetry.record("image_download", 0.0123456789, "ok", bytes=3_000_000, tokens=12345)
+    samples = parse_samples(telemetry.render_prometheus())
+    for histogram in (telemetry.stage_seconds, telemetry.stage_bytes, telemetry.stage_tokens):
+        rendered = {dict(pairs)["le"] for name, pairs in samples if name == f"{histogram.name}_bucket"}
+        assert {float(le) for le in rendered if le != "+Inf"} == {float(b) for b in histogram.buckets}
@@ -0,0 +1,54 @@
+import threading
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Gemini responses from langchain_google_genai carry no usage metadata, so fall back to
+# the usual ~4 characters per token estimate when the provider does not report counts
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // CHARS_PER_TOKEN) if text else 0
+
+
+class TokenUsageHandler(BaseCallbackHandler):
+    """LangChain callback that counts LLM calls and prompt/completion tokens across threads."""
+
+    def __init__(self):
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+
+    @property
+    def total_tokens(self):
+        return self.prompt_tokens + self.completion_tokens
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self._record_prompt(sum(estimate_tokens(p) for p in prompts))
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self._record_prompt(sum(estimate_tokens(str(m.content)) for batch in messages for m in batch))
+
+    def on_llm_end(self, response, **kwargs):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if usage.get("completion_tokens"):
+            tokens = usage["completion_tokens"]
+        else:
+            tokens = sum(estimate_tokens(g.text) for batch in response.generations for g in batch)
+        with self._lock:
+            self.completion_tokens += tokens
+
+    def _record_prompt(self, tokens):
+        with self._lock:
+            self.llm_calls += 1
+            self.prompt_tokens += tokens
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "llm_calls": self.llm_calls,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "total_tokens": self.prompt_tokens + self.completion_tokens,
+            }